@@ -3,9 +3,19 @@
 import { useState, useRef, useEffect } from "react";
 import Sidebar from "@/components/Sidebar";
 import ProgressBar from "@/components/ProgressBar";
-import { Message, ChatResponse, PatientState } from "@/types/api";
+import {
+  Message,
+  ChatResponse,
+  PatientState,
+  StreamTokenEvent,
+  StreamPhaseEvent,
+  StreamErrorEvent,
+  StreamRedFlagEvent,
+} from "@/types/api";
 
 const API_BASE_URL = process.env.NEXT_PUBLIC_API_URL || "http://localhost:8000";
+// A reply that takes longer than this is abandoned and offered for resending
+const REPLY_TIMEOUT_MS = 90_000;
 
 export default function Home() {
   const [sessionId, setSessionId] = useState<string | null>(null);
@@ -15,6 +25,8 @@ export default function Home() {
   const [state, setState] = useState<PatientState>({});
   const [phase, setPhase] = useState<string>("Not started");
   const [isComplete, setIsComplete] = useState(false);
+  // The user message awaiting a reply; kept after a failure so it can be resent with the same key
+  const [pendingMessage, setPendingMessage] = useState<Message | null>(null);
   const messagesEndRef = useRef<HTMLDivElement>(null);
   const inputRef = useRef<HTMLInputElement>(null);
 
@@ -65,60 +77,173 @@ export default function Home() {
     }
   };
 
+  // Parse one "event: x\ndata: {...}" frame from the SSE stream
+  const parseSseFrame = (frame: string) => {
+    let event = "message";
+    const dataLines: string[] = [];
+    for (const line of frame.split("\n")) {
+      if (line.startsWith("event:")) {
+        event = line.slice(6).trim();
+      } else if (line.startsWith("data:")) {
+        dataLines.push(line.slice(5).trim());
+      }
+    }
+    if (dataLines.length === 0) return null;
+    return { event, data: JSON.parse(dataLines.join("\n")) };
+  };
+
   const sendMessage = async () => {
-    if (!inputMessage.trim() || !sessionId || isLoading) return;
+    if (!inputMessage.trim() || !sessionId || isLoading || pendingMessage) return;
 
+    // The key is created once per message and reused by every resend of it
     const userMessage: Message = {
       role: "user",
       content: inputMessage,
+      idempotency_key: crypto.randomUUID(),
     };
 
     setMessages((prev) => [...prev, userMessage]);
     setInputMessage("");
+    await postMessage(userMessage);
+  };
+
+  const resendMessage = async () => {
+    if (!pendingMessage || isLoading) return;
+    await postMessage(pendingMessage);
+  };
+
+  const postMessage = async (userMessage: Message) => {
+    setPendingMessage(userMessage);
     setIsLoading(true);
     inputRef.current?.focus();
 
+    const controller = new AbortController();
+    const timeout = setTimeout(() => controller.abort(), REPLY_TIMEOUT_MS);
+
     try {
-      const response = await fetch(`${API_BASE_URL}/api/chat/reply`, {
+      const response = await fetch(`${API_BASE_URL}/api/chat/reply/stream`, {
         method: "POST",
         headers: {
           "Content-Type": "application/json",
+          Accept: "text/event-stream",
         },
         body: JSON.stringify({
           session_id: sessionId,
-          message: inputMessage,
+          message: userMessage.content,
+          // Lets the backend recognise a resubmission of this same message
+          idempotency_key: userMessage.idempotency_key,
         }),
+        signal: controller.signal,
       });
 
-      if (!response.ok) {
-        throw new Error("Failed to send message");
-      }
-
-      const data: ChatResponse = await response.json();
-
-      if (data.assistant_message) {
+      if (response.status === 503) {
+        const retryAfter = response.headers.get("Retry-After") ?? "a few";
         setMessages((prev) => [
           ...prev,
           {
             role: "assistant" as const,
-            content: data.assistant_message as string,
+            content: `We're helping a lot of patients right now. Please resend your message in ${retryAfter} seconds.`,
           },
         ]);
+        return;
+      }
+      if (!response.ok || !response.body) {
+        throw new Error("Failed to send message");
       }
 
-      setState(data.state);
-      setPhase(data.phase);
-      setIsComplete(data.is_complete);
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = "";
+      let streamedText = "";
+      let streamingId: string | null = null;
+
+      const handleFrame = (frame: string) => {
+        const parsed = parseSseFrame(frame);
+        if (!parsed) return;
+
+        if (parsed.event === "token") {
+          const token = parsed.data as StreamTokenEvent;
+          if (token.id !== streamingId) {
+            // A new assistant message started streaming
+            streamingId = token.id;
+            streamedText = token.content;
+            setIsLoading(false);
+            setMessages((prev) => [
+              ...prev,
+              { role: "assistant" as const, content: streamedText },
+            ]);
+          } else {
+            streamedText += token.content;
+            const text = streamedText;
+            setMessages((prev) => [
+              ...prev.slice(0, -1),
+              { role: "assistant" as const, content: text },
+            ]);
+          }
+        } else if (parsed.event === "phase") {
+          const update = parsed.data as StreamPhaseEvent;
+          if (update.phase !== "Unknown") {
+            setPhase(update.phase);
+          }
+        } else if (parsed.event === "red_flag") {
+          const flagged = parsed.data as StreamRedFlagEvent;
+          const labels = flagged.red_flags.map((flag) => flag.label.toLowerCase()).join(", ");
+          setMessages((prev) => [
+            ...prev,
+            {
+              role: "assistant" as const,
+              content: `You mentioned ${labels}. If this is happening right now, please tell the clinic staff immediately.`,
+            },
+          ]);
+        } else if (parsed.event === "done") {
+          const data = parsed.data as ChatResponse;
+          // The closing message on completion is not streamed, so add it separately
+          if (data.assistant_message && data.assistant_message !== streamedText) {
+            setMessages((prev) => [
+              ...prev,
+              {
+                role: "assistant" as const,
+                content: data.assistant_message as string,
+              },
+            ]);
+          }
+          setState(data.state);
+          setPhase(data.phase);
+          setIsComplete(data.is_complete);
+          setPendingMessage(null);
+        } else if (parsed.event === "error") {
+          throw new Error((parsed.data as StreamErrorEvent).detail);
+        }
+      };
+
+      while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        let boundary = buffer.indexOf("\n\n");
+        while (boundary !== -1) {
+          handleFrame(buffer.slice(0, boundary));
+          buffer = buffer.slice(boundary + 2);
+          boundary = buffer.indexOf("\n\n");
+        }
+      }
+      if (buffer.trim()) {
+        handleFrame(buffer);
+      }
     } catch (error) {
       console.error("Error sending message:", error);
+      const timedOut = error instanceof DOMException && error.name === "AbortError";
       setMessages((prev) => [
         ...prev,
         {
           role: "assistant" as const,
-          content: "Sorry, there was an error processing your message.",
+          content: timedOut
+            ? "Sorry, that took too long. Please resend your message."
+            : "Sorry, there was an error processing your message. Please resend it.",
         },
       ]);
     } finally {
+      clearTimeout(timeout);
       setIsLoading(false);
       inputRef.current?.focus();
     }
@@ -138,6 +263,7 @@ export default function Home() {
     setState({});
     setPhase("Not started");
     setIsComplete(false);
+    setPendingMessage(null);
   };
 
   return (
@@ -232,6 +358,17 @@ export default function Home() {
         {/* Input Area */}
         {sessionId && !isComplete && (
           <div className="border-t border-gray-200 dark:border-gray-800 p-4 bg-white dark:bg-gray-900">
+            {pendingMessage && !isLoading && (
+              <div className="max-w-4xl mx-auto mb-2 flex items-center justify-between gap-2 text-sm text-amber-800 dark:text-amber-200">
+                <span>Your last message was not answered yet.</span>
+                <button
+                  onClick={resendMessage}
+                  className="px-4 py-2 font-medium border border-amber-400 rounded-lg hover:bg-amber-50 dark:hover:bg-amber-900/20 transition-colors"
+                >
+                  Resend
+                </button>
+              </div>
+            )}
             <div className="max-w-4xl mx-auto flex gap-2">
               <input
                 type="text"
@@ -246,7 +383,7 @@ export default function Home() {
               <button
                 onClick={sendMessage}
                 onMouseDown={(e) => e.preventDefault()}
-                disabled={isLoading || !inputMessage.trim()}
+                disabled={isLoading || !!pendingMessage || !inputMessage.trim()}
                 className="px-6 py-3 bg-blue-600 hover:bg-blue-700 text-white font-medium rounded-lg transition-colors disabled:opacity-50 disabled:cursor-not-allowed"
               >
                 Send
@@ -15,6 +15,12 @@ export interface TriageSummary {
   reason_for_urgency: string;
 }
 
+export interface RedFlag {
+  id: string;
+  label: string;
+  phrase: string;
+}
+
 export interface PatientState {
   patient_name?: string;
   patient_age?: number;
@@ -25,6 +31,22 @@ export interface PatientState {
   additional_symptom_info?: string[];
   medical_history?: MedHistoryFact[];
   generated_summary?: TriageSummary;
+  red_flags?: RedFlag[];
+}
+
+export interface UsageCounts {
+  input_tokens: number;
+  cached_tokens: number;
+  output_tokens: number;
+  total_tokens: number;
+  llm_calls: number;
+  iterations: number;
+  cost_usd: number;
+}
+
+export interface SessionUsage {
+  phases: Record<string, UsageCounts>;
+  total: UsageCounts;
 }
 
 export interface StartResponse {
@@ -33,11 +55,19 @@ export interface StartResponse {
   state: PatientState;
   phase: string;
   is_complete: boolean;
+  usage?: SessionUsage;
 }
 
 export interface ChatRequest {
   session_id: string;
   message: string;
+  idempotency_key?: string;
+}
+
+export interface QueueTicket {
+  ticket_number: number;
+  position: number;
+  urgency: string;
 }
 
 export interface ChatResponse {
@@ -46,10 +76,36 @@ export interface ChatResponse {
   state: PatientState;
   phase: string;
   is_complete: boolean;
+  expedited?: boolean;
+  queue?: QueueTicket | null;
+  usage?: SessionUsage;
 }
 
 export interface Message {
   role: "user" | "assistant";
   content: string;
+  // User messages only: sent with every attempt, so a resend is recognised as the same message
+  idempotency_key?: string;
+}
+
+
+// Server-Sent Events emitted by POST /api/chat/reply/stream
+export interface StreamTokenEvent {
+  id: string | null;
+  node: string;
+  content: string;
 }
 
+export interface StreamPhaseEvent {
+  node: string;
+  phase: string;
+}
+
+export interface StreamErrorEvent {
+  detail: string;
+}
+
+export interface StreamRedFlagEvent {
+  node: string;
+  red_flags: RedFlag[];
+}
@@ -0,0 +1,61 @@
+"""Compare two benchmark result files.
+
+    cd src && python -m benchmark.compare baseline.json candidate.json
+
+Works for both load test (benchmark.run) and startup (benchmark.startup) results.
+"""
+import json
+import sys
+
+def _delta(before: float, after: float) -> str:
+    if not before:
+        return "n/a"
+    return f"{(after - before) / before * 100:+.1f}%"
+
+def compare_tables(title: str, before: dict, after: dict):
+    print(f"\n{title:<44} {'p50 ms':>18} {'p95 ms':>18} {'p99 ms':>18}")
+    for name in sorted(set(before) | set(after)):
+        if name not in before or name not in after:
+            print(f"{name:<44} only in {'candidate' if name in after else 'baseline'}")
+            continue
+        cells = []
+        for key in ("p50_ms", "p95_ms", "p99_ms"):
+            b, a = before[name][key], after[name][key]
+            cells.append(f"{a:>9.1f} {_delta(b, a):>8}")
+        print(f"{name:<44} {' '.join(cells)}")
+
+def main(argv=None):
+    argv = argv if argv is not None else sys.argv[1:]
+    if len(argv) != 2:
+        print("usage: python -m benchmark.compare BASELINE.json CANDIDATE.json")
+        return 2
+    with open(argv[0]) as f:
+        before = json.load(f)
+    with open(argv[1]) as f:
+        after = json.load(f)
+
+    for label, path in (
+        ("requests/sec", ("throughput", "requests_per_second")),
+        ("peak RSS MB", ("peak_rss_mb",)),
+        ("$/session", ("usage", "cost_per_session_usd")),
+        ("tokens/session", ("usage", "tokens_per_session")),
+    ):
+        b, a = before, after
+        for key in path:
+            b, a = b.get(key, {}), a.get(key, {})
+        if b == {} or a == {}:
+            continue
+        print(f"{label:<14} {b:>10} -> {a:<10} {_delta(b, a)}")
+    if "startup" in before and "startup" in after:
+        compare_tables("Startup stage", before["startup"], after["startup"])
+        for module, loaded in after.get("loaded_by_import", {}).items():
+            was = before.get("loaded_by_import", {}).get(module)
+            if was is not None and was != loaded:
+                print(f"{module} loaded by import main: {'yes' if was else 'no'} -> {'yes' if loaded else 'no'}")
+        return 0
+    compare_tables("Endpoint", before["endpoints"], after["endpoints"])
+    compare_tables("Node", before["nodes"], after["nodes"])
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
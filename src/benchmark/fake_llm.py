@@ -0,0 +1,200 @@
+import asyncio
+import random
+import time
+import httpx
+import openai
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage
+from langchain_core.messages.utils import count_tokens_approximately
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.runnables import RunnableLambda
+from pydantic import ConfigDict, Field, PrivateAttr
+
+from llm_orchestration.llm_cache import current_node
+
+# Deterministic stand-in for the OpenAI chat model. Free-text calls return a fixed
+# question per node; structured calls are answered from the scripted persona turn
+# matching the patient's last message (see personas.py).
+
+NODE_REPLIES = {
+    "ask_patient_info": "Hello, I'm ClinicAssist. May I have your name, age and sex?",
+    "ask_symptoms": "What symptoms are you experiencing, and when did they start?",
+    "ask_medhist": "Do you have any allergies, long-term conditions or regular medications?",
+    "acknowledgement": "Thank you, the doctor will see you shortly.",
+}
+DEFAULT_REPLY = "Could you tell me a little more about that?"
+
+
+class LatencyModel:
+    """Seeded latency distribution, parsed from "fixed:S", "uniform:LO:HI",
+    "normal:MEAN:SD" or "lognormal:MEDIAN:SIGMA" (seconds), or "off"."""
+
+    def __init__(self, spec: str = "off", seed: int = 0):
+        self.spec = spec
+        parts = spec.split(":")
+        self.kind = parts[0]
+        self.params = [float(p) for p in parts[1:]]
+        self._rng = random.Random(seed)
+        expected = {"off": 0, "fixed": 1, "uniform": 2, "normal": 2, "lognormal": 2}
+        if self.kind not in expected or len(self.params) != expected[self.kind]:
+            raise ValueError(f"Invalid latency spec: {spec!r}")
+
+    def sample(self) -> float:
+        if self.kind == "fixed":
+            return self.params[0]
+        if self.kind == "uniform":
+            return self._rng.uniform(*self.params)
+        if self.kind == "normal":
+            return max(0.0, self._rng.gauss(*self.params))
+        if self.kind == "lognormal":
+            median, sigma = self.params
+            return median * self._rng.lognormvariate(0, sigma)
+        return 0.0
+
+
+class FakeChatModel(BaseChatModel):
+    """Chat model with configurable latency and scripted structured outputs."""
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    model_name: str = "gpt-4.1"  # reported to callbacks, so usage is priced like the real model
+    text_latency: LatencyModel = Field(default_factory=LatencyModel)
+    structured_latency: LatencyModel = Field(default_factory=LatencyModel)
+    # Maps the patient's message text to (persona, turn)
+    script: dict = Field(default_factory=dict)
+    calls: dict = Field(default_factory=dict)
+    # Share of structured outputs that fail validation, or report a low confidence (tier fallbacks)
+    invalid_rate: float = 0.0
+    low_confidence_rate: float = 0.0
+    # Share of calls that fail with a transient connection error after their latency (retries)
+    error_rate: float = 0.0
+    seed: int = 0
+    _rng: random.Random = PrivateAttr(default=None)
+
+    def model_post_init(self, __context):
+        self._rng = random.Random(self.seed)
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat-model"
+
+    def _count(self, kind: str):
+        key = f"{current_node()}:{kind}"
+        self.calls[key] = self.calls.get(key, 0) + 1
+
+    def _latency(self, schema) -> float:
+        return (self.structured_latency if schema is not None else self.text_latency).sample()
+
+    def _message(self, messages, schema=None) -> AIMessage:
+        if schema is None:
+            self._count("text")
+            content = NODE_REPLIES.get(current_node(), DEFAULT_REPLY)
+        else:
+            self._count(schema.__name__)
+            if self.invalid_rate and self._rng.random() < self.invalid_rate:
+                content = "{}"
+            else:
+                content = self.structured_response(schema, messages).model_dump_json()
+        input_tokens = count_tokens_approximately(messages)
+        output_tokens = count_tokens_approximately([AIMessage(content=content)])
+        return AIMessage(
+            content=content,
+            usage_metadata={
+                "input_tokens": input_tokens,
+                "output_tokens": output_tokens,
+                "total_tokens": input_tokens + output_tokens,
+            },
+        )
+
+    def _maybe_fail(self):
+        if self.error_rate and self._rng.random() < self.error_rate:
+            self._count("error")
+            raise openai.APIConnectionError(request=httpx.Request("POST", "https://fake-chat-model/v1/chat/completions"))
+
+    def _generate(self, messages, stop=None, run_manager=None, schema=None, **kwargs) -> ChatResult:
+        time.sleep(self._latency(schema))
+        self._maybe_fail()
+        return ChatResult(generations=[ChatGeneration(message=self._message(messages, schema))])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, schema=None, **kwargs) -> ChatResult:
+        await asyncio.sleep(self._latency(schema))
+        self._maybe_fail()
+        return ChatResult(generations=[ChatGeneration(message=self._message(messages, schema))])
+
+    async def _astream(self, messages, stop=None, run_manager=None, schema=None, **kwargs):
+        # Latency is the time to first token; the rest of the reply follows immediately
+        await asyncio.sleep(self._latency(schema))
+        self._maybe_fail()
+        message = self._message(messages, schema)
+        words = message.content.split(" ")
+        for i, word in enumerate(words):
+            last = i == len(words) - 1
+            token = word if last else word + " "
+            # Usage arrives with the final chunk, as with stream_usage on the real client
+            usage = message.usage_metadata if last else None
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token, usage_metadata=usage))
+            if run_manager:
+                await run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+
+    def with_structured_output(self, schema, **kwargs):
+        # Goes through the model like the real thing, so callbacks see the call and its tokens
+        return self.bind(schema=schema) | RunnableLambda(lambda message: schema.model_validate_json(message.content))
+
+    def structured_response(self, schema, messages):
+        persona, turn = self._lookup(messages)
+        data = {"is_sufficient": True, "reason": None, "next_question": None}
+        if turn is not None:
+            data.update(turn.extraction)
+            data["is_sufficient"] = turn.sufficient
+            if not turn.sufficient:
+                data["reason"] = "More detail needed"
+                data["next_question"] = DEFAULT_REPLY
+        if "facts" in schema.model_fields:
+            data["facts"] = medhist_facts(turn.extraction) if turn is not None else []
+        if schema.__name__ == "TriageSummary":
+            data = dict(persona.triage) if persona is not None else dict(DEFAULT_TRIAGE)
+        if self.low_confidence_rate and self._rng.random() < self.low_confidence_rate:
+            data["confidence"] = 0.1
+        fields = {name: data.get(name) for name in schema.model_fields}
+        return schema.model_validate(fields)
+
+    def _lookup(self, messages) -> tuple:
+        for m in reversed(messages):
+            if isinstance(m, HumanMessage):
+                return self.script.get(m.content, (None, None))
+        return None, None
+
+
+def medhist_facts(extraction: dict) -> list:
+    """Medical history facts scripted for a turn: a `facts` list, or a single fact's fields."""
+    if "facts" in extraction:
+        return extraction["facts"]
+    return [extraction] if "category" in extraction else []
+
+
+DEFAULT_TRIAGE = {
+    "probable_diagnosis": "Unspecified",
+    "reason_for_diagnosis": "Benchmark default",
+    "urgency": "NON-URGENT",
+    "reason_for_urgency": "Benchmark default",
+}
+
+
+def install_fake_llm(model: FakeChatModel, use_cache: bool = False, fast_model: FakeChatModel = None):
+    """Replace the shared `llm` before the graph modules import it.
+
+    Must run before `main` or any `llm_orchestration.part*` module is imported,
+    since they bind `llm` (and its structured variants) at import time. The fast
+    tier uses `fast_model` if given, else the same model.
+    """
+    import llm_orchestration.llm as llm_module
+    from llm_orchestration.llm_cache import ResponseCache
+
+    cache = llm_module.response_cache if use_cache else ResponseCache(None)
+    fast_model = fast_model or model
+    # Cache keys carry the fake model's type, so fake replies never answer for the real model
+    llm_module.llm = llm_module.build_llm({
+        "strong": (model, f"{model._llm_type}:{model.model_name}"),
+        "fast": (fast_model, f"{fast_model._llm_type}:{fast_model.model_name}"),
+    }, cache)
@@ -0,0 +1,148 @@
+from dataclasses import dataclass, field
+
+# Scripted patients covering all four phases. Each turn is one patient reply plus
+# what the fake model "extracts" from it; `sufficient=False` makes the sufficiency
+# check (or fused turn) ask a follow-up, so the persona needs a further reply.
+
+@dataclass
+class Turn:
+    message: str
+    extraction: dict = field(default_factory=dict)
+    sufficient: bool = True
+
+@dataclass
+class Persona:
+    name: str
+    patient_info: list
+    symptoms: list
+    medhist: list
+    triage: dict
+
+    def replies(self) -> list:
+        return [*self.patient_info, *self.symptoms, *self.medhist]
+
+
+PERSONAS = [
+    Persona(
+        name="short_cold",
+        patient_info=[Turn("John Tan, 45, male")],
+        symptoms=[
+            Turn(
+                "I've had a runny nose and sore throat since yesterday",
+                {"main_symptoms": ["runny nose", "sore throat"], "symptom_onset": "yesterday"},
+            ),
+        ],
+        medhist=[
+            Turn("No allergies and I don't take any medication", {
+                "category": "allergy", "question": "Do you have any allergies?", "answer": "No",
+            }),
+        ],
+        triage={
+            "probable_diagnosis": "Upper respiratory tract infection",
+            "reason_for_diagnosis": "Runny nose and sore throat for one day",
+            "urgency": "NON-URGENT",
+            "reason_for_urgency": "Mild symptoms in a healthy adult",
+        },
+    ),
+    Persona(
+        name="chest_pain_followups",
+        # Demographics the rule-based parser cannot place, so the LLM extraction runs
+        patient_info=[Turn(
+            "hi im mary, turning 62 this year, female",
+            {"name": "Mary", "age": 62, "sex": "F"},
+        )],
+        symptoms=[
+            Turn("My chest feels tight", {"main_symptoms": ["chest tightness"]}, sufficient=False),
+            Turn(
+                "It started two hours ago and I get winded more easily",
+                {"symptom_onset": "2 hours ago", "associated_symptoms": ["breathlessness"]},
+                sufficient=False,
+            ),
+            Turn(
+                "It gets worse when I walk and eases when I sit down",
+                {"additional_symptom_info": ["worse on exertion", "relieved by rest"]},
+            ),
+        ],
+        medhist=[
+            Turn("I have high blood pressure", {
+                "category": "past_condition", "question": "Do you have any long-term conditions?",
+                "answer": "Hypertension",
+            }, sufficient=False),
+            Turn("I take amlodipine every morning", {
+                "category": "medication", "question": "Do you take any regular medication?",
+                "answer": "Amlodipine daily",
+            }),
+        ],
+        triage={
+            "probable_diagnosis": "Possible angina",
+            "reason_for_diagnosis": "Exertional chest tightness with shortness of breath",
+            "urgency": "EMERGENCY",
+            "reason_for_urgency": "Chest pain in an older patient with hypertension",
+        },
+    ),
+    Persona(
+        name="child_fever",
+        patient_info=[
+            Turn("It's for my son", {}),
+            Turn("Ethan Lim, 4, boy"),
+        ],
+        symptoms=[
+            Turn(
+                "He has had a fever and a cough for three days",
+                {"main_symptoms": ["fever", "cough"], "symptom_onset": "3 days ago"},
+                sufficient=False,
+            ),
+            Turn(
+                "The fever goes up to 38.5 and he is eating less",
+                {"additional_symptom_info": ["max temperature 38.5C"], "associated_symptoms": ["poor appetite"]},
+            ),
+        ],
+        medhist=[
+            Turn("He is allergic to penicillin", {
+                "category": "allergy", "question": "Does he have any allergies?", "answer": "Penicillin",
+            }, sufficient=False),
+            Turn("His vaccinations are up to date", {
+                "category": "immunization", "question": "Are his vaccinations up to date?", "answer": "Yes",
+            }),
+        ],
+        triage={
+            "probable_diagnosis": "Viral respiratory infection",
+            "reason_for_diagnosis": "Fever and cough for three days in a child",
+            "urgency": "SEMI-URGENT",
+            "reason_for_urgency": "Persistent fever with reduced intake",
+        },
+    ),
+    Persona(
+        name="multi_fact_history",
+        patient_info=[Turn("Ahmad Ismail, 58, male")],
+        symptoms=[
+            Turn(
+                "I've had burning when I pee for two days",
+                {"main_symptoms": ["dysuria"], "symptom_onset": "2 days ago"},
+            ),
+        ],
+        # Several facts in one reply, all recorded from a single extraction
+        medhist=[
+            Turn("I'm on metformin, allergic to penicillin and had my appendix out", {"facts": [
+                {"category": "medication", "question": "Do you take any regular medication?", "answer": "Metformin"},
+                {"category": "allergy", "question": "Do you have any allergies?", "answer": "Penicillin"},
+                {"category": "surgery", "question": "Have you had any surgery?", "answer": "Appendectomy"},
+            ]}),
+        ],
+        triage={
+            "probable_diagnosis": "Urinary tract infection",
+            "reason_for_diagnosis": "Dysuria for two days in a diabetic patient",
+            "urgency": "SEMI-URGENT",
+            "reason_for_urgency": "Diabetes raises the risk of complicated infection",
+        },
+    ),
+]
+
+
+def build_script(personas: list) -> dict:
+    """Map each patient message to its (persona, turn) for the fake model."""
+    script = {}
+    for persona in personas:
+        for turn in persona.replies():
+            script[turn.message] = (persona, turn)
+    return script
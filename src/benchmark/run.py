@@ -0,0 +1,274 @@
+"""Offline load test of the FastAPI + LangGraph stack.
+
+Drives /api/chat/start and /api/chat/reply in-process with scripted personas, a fake
+chat model and a local checkpointer, so no OpenAI key or Postgres is needed.
+
+    cd src && python -m benchmark.run --sessions 60 --concurrency 10 \\
+        --text-latency lognormal:0.8:0.3 --structured-latency lognormal:1.2:0.3 --output bench.json
+
+Add --tiering off to run every node on the strong model, and --fast-*-latency to give the
+fast tier its own latency, to compare model tiers.
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import platform
+import sys
+import time
+from collections import Counter, defaultdict
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+
+# The real clients are never built (install_fake_llm replaces them), but keep a key set
+os.environ.setdefault("OPENAI_API_KEY", "benchmark-fake-key")
+
+import httpx
+from langgraph.checkpoint.memory import InMemorySaver
+
+from benchmark.fake_llm import FakeChatModel, LatencyModel, install_fake_llm
+from benchmark.personas import PERSONAS, build_script
+from benchmark.stats import NodeTimer, peak_rss_mb, summarize
+
+@asynccontextmanager
+async def local_checkpointer(kind: str, path: str):
+    if kind == "memory":
+        yield InMemorySaver()
+        return
+    try:
+        from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+    except ImportError:
+        raise SystemExit("--checkpointer sqlite needs the langgraph-checkpoint-sqlite package")
+    async with AsyncSqliteSaver.from_conn_string(path) as saver:
+        yield saver
+
+async def post_stream(client: httpx.AsyncClient, path: str, payload: dict, samples: dict) -> dict:
+    """POST to the SSE endpoint; records time to first token and returns the `done` payload."""
+    started = time.perf_counter()
+    event, body, first_token = None, None, None
+    async with client.stream("POST", path, json=payload) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: "):
+                if event == "token" and first_token is None:
+                    first_token = time.perf_counter() - started
+                elif event == "done":
+                    body = json.loads(line[len("data: "):])
+                elif event == "error":
+                    raise RuntimeError(json.loads(line[len("data: "):])["detail"])
+    if first_token is not None:
+        samples[f"POST {path} (first token)"].append(first_token)
+    if body is None:
+        raise RuntimeError("stream ended without a done event")
+    return body
+
+async def run_session(client: httpx.AsyncClient, persona, stream: bool, samples: dict, usage: list) -> bool:
+    """Play one persona through the whole intake; True if it reached completion."""
+    session_started = time.perf_counter()
+
+    started = time.perf_counter()
+    response = await client.post("/api/chat/start")
+    response.raise_for_status()
+    samples["POST /api/chat/start"].append(time.perf_counter() - started)
+    body = response.json()
+    session_id = body["session_id"]
+
+    reply_path = "/api/chat/reply/stream" if stream else "/api/chat/reply"
+    for turn in persona.replies():
+        if body["is_complete"]:
+            raise RuntimeError(f"completed before the persona's last reply ({persona.name})")
+        payload = {"session_id": session_id, "message": turn.message}
+        started = time.perf_counter()
+        if stream:
+            body = await post_stream(client, reply_path, payload, samples)
+        else:
+            response = await client.post(reply_path, json=payload)
+            response.raise_for_status()
+            body = response.json()
+        samples[f"POST {reply_path}"].append(time.perf_counter() - started)
+
+    if not body["is_complete"]:
+        raise RuntimeError(f"still in '{body['phase']}' after the persona's last reply ({persona.name})")
+    samples["session"].append(time.perf_counter() - session_started)
+    usage.append(body["usage"]["total"])
+    return True
+
+async def run_benchmark(args) -> dict:
+    personas = [p for p in PERSONAS if not args.personas or p.name in args.personas.split(",")]
+    model = FakeChatModel(
+        text_latency=LatencyModel(args.text_latency, seed=args.seed),
+        structured_latency=LatencyModel(args.structured_latency, seed=args.seed + 1),
+        script=build_script(personas),
+        error_rate=args.error_rate,
+        seed=args.seed + 5,
+    )
+    os.environ["LLM_TIERING"] = "true" if args.tiering == "on" else "false"
+    os.environ["LLM_MAX_CONCURRENCY"] = str(args.llm_max_concurrency)
+    os.environ["LLM_MAX_QUEUE_DEPTH"] = str(args.llm_max_queue_depth)
+    os.environ["LLM_TOKENS_PER_MINUTE"] = str(args.llm_tokens_per_minute)
+    os.environ["LLM_HEDGING"] = "true" if args.hedging else "false"
+    os.environ["LLM_MAX_RETRIES"] = str(args.llm_max_retries)
+    if args.llm_deadline:
+        os.environ["LLM_DEADLINE_SECONDS"] = str(args.llm_deadline)
+    from llm_orchestration.model_tiers import MODEL_BY_TIER, tier_stats
+    fast_model = FakeChatModel(
+        model_name=MODEL_BY_TIER["fast"],
+        text_latency=LatencyModel(args.fast_text_latency or args.text_latency, seed=args.seed + 2),
+        structured_latency=LatencyModel(args.fast_structured_latency or args.structured_latency, seed=args.seed + 3),
+        script=model.script,
+        invalid_rate=args.fast_invalid_rate,
+        low_confidence_rate=args.fast_low_confidence_rate,
+        error_rate=args.error_rate,
+        seed=args.seed + 4,
+    )
+    install_fake_llm(model, use_cache=args.llm_cache, fast_model=fast_model)
+
+    # Imported only now, so the graph nodes bind the fake model
+    import main as api
+    from llm_orchestration.admission import llm_scheduler
+    from llm_orchestration.resilience import resilience_stats
+    from llm_orchestration.clinical_assistant_graph import build_clinical_assistant_graph
+
+    timer = NodeTimer()
+    samples = defaultdict(list)
+    errors = Counter()
+    session_usage = []
+    completed = 0
+
+    async with local_checkpointer(args.checkpointer, args.sqlite_path) as saver:
+        graph = build_clinical_assistant_graph(saver, fused_turns=args.fused_turns)
+        api.clinical_assistant_graph = graph.with_config(callbacks=[timer])
+
+        transport = httpx.ASGITransport(app=api.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+            session_indices = iter(range(args.sessions))
+
+            async def worker():
+                nonlocal completed
+                for i in session_indices:
+                    try:
+                        await run_session(client, personas[i % len(personas)], args.stream, samples, session_usage)
+                        completed += 1
+                    except Exception as e:
+                        errors[f"{type(e).__name__}: {e}"] += 1
+
+            quiet = open(os.devnull, "w") if not args.verbose else None
+            with contextlib.redirect_stdout(quiet) if quiet else contextlib.nullcontext():
+                wall_started = time.perf_counter()
+                await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+                wall_seconds = time.perf_counter() - wall_started
+            if quiet:
+                quiet.close()
+
+    session_samples = samples.pop("session", [])
+    request_count = sum(len(v) for k, v in samples.items() if not k.endswith("(first token)"))
+    config = {k: v for k, v in vars(args).items() if k != "output"}
+    return {
+        "config": config,
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "wall_seconds": round(wall_seconds, 3),
+        "sessions": {
+            "total": args.sessions,
+            "completed": completed,
+            "failed": args.sessions - completed,
+            "errors": dict(errors),
+        },
+        "throughput": {
+            "requests_per_second": round(request_count / wall_seconds, 2) if wall_seconds else 0.0,
+            "sessions_per_second": round(completed / wall_seconds, 3) if wall_seconds else 0.0,
+        },
+        "endpoints": {name: summarize(values) for name, values in sorted(samples.items())},
+        "session_latency": summarize(session_samples),
+        "nodes": {node: summarize(values) for node, values in sorted(timer.samples.items())},
+        "llm_calls": dict(sorted((Counter(model.calls) + Counter(fast_model.calls)).items())),
+        "llm_calls_by_tier": {"strong": dict(sorted(model.calls.items())), "fast": dict(sorted(fast_model.calls.items()))},
+        "usage": {
+            "tokens_per_session": round(sum(u["total_tokens"] for u in session_usage) / completed, 1) if completed else 0.0,
+            "cost_per_session_usd": round(sum(u["cost_usd"] for u in session_usage) / completed, 6) if completed else 0.0,
+        },
+        "model_tiers": tier_stats.snapshot(),
+        "llm_scheduler": llm_scheduler.snapshot(),
+        "llm_resilience": resilience_stats.snapshot(),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+def print_report(result: dict):
+    def rows(title, table):
+        print(f"\n{title:<44} {'count':>7} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10}")
+        for name, s in table.items():
+            print(f"{name:<44} {s['count']:>7} {s['p50_ms']:>10.1f} {s['p95_ms']:>10.1f} {s['p99_ms']:>10.1f}")
+
+    sessions = result["sessions"]
+    print(
+        f"{sessions['completed']}/{sessions['total']} sessions in {result['wall_seconds']}s "
+        f"at concurrency {result['config']['concurrency']}: "
+        f"{result['throughput']['requests_per_second']} req/s, peak RSS {result['peak_rss_mb']} MB"
+    )
+    for error, count in sessions["errors"].items():
+        print(f"  {count} x {error}")
+    scheduler = result["llm_scheduler"]
+    print(
+        f"LLM scheduler: {scheduler['queued']} of {scheduler['admitted']} calls queued, "
+        f"avg wait {scheduler['avg_wait_seconds'] * 1000:.1f} ms, max {scheduler['max_wait_seconds'] * 1000:.1f} ms, "
+        f"{scheduler['rejected']} requests rejected"
+    )
+    fallbacks = sum(sum(n["fallbacks"].values()) for n in result["model_tiers"]["nodes"].values())
+    print(
+        f"Tiering {'on' if result['model_tiers']['tiering'] else 'off'}: "
+        f"${result['usage']['cost_per_session_usd']:.4f} and {result['usage']['tokens_per_session']} tokens per session, "
+        f"{fallbacks} fallbacks to the strong model"
+    )
+    resilience = result["llm_resilience"]["nodes"].values()
+    total = lambda key: sum(n.get(key, 0) for n in resilience)
+    print(
+        f"LLM resilience: {total('retries')} retries, {total('hedges')} hedges ({total('hedges_won')} won), "
+        f"{total('deadline_misses')} deadline misses, {total('failures')} calls failed after retries"
+    )
+    rows("Endpoint", {**result["endpoints"], "full session": result["session_latency"]})
+    rows("Node", result["nodes"])
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline ClinicAssist load test with a fake LLM.")
+    parser.add_argument("--sessions", type=int, default=30, help="Number of patient sessions to run")
+    parser.add_argument("--concurrency", type=int, default=5, help="Sessions in flight at once")
+    parser.add_argument("--personas", default="", help="Comma-separated persona names (default: all)")
+    parser.add_argument("--text-latency", default="off", help='Free-text call latency, e.g. "lognormal:0.8:0.3"')
+    parser.add_argument("--structured-latency", default="off", help='Structured call latency, e.g. "fixed:1.2"')
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--tiering", choices=["on", "off"], default="on", help="Per-node model tiers, or the strong model everywhere")
+    parser.add_argument("--fast-text-latency", help="Free-text latency of the fast tier (default: --text-latency)")
+    parser.add_argument("--fast-structured-latency", help="Structured latency of the fast tier (default: --structured-latency)")
+    parser.add_argument("--fast-invalid-rate", type=float, default=0.0, help="Share of fast-tier structured outputs that fail validation")
+    parser.add_argument("--fast-low-confidence-rate", type=float, default=0.0, help="Share of fast-tier verdicts with low confidence")
+    parser.add_argument("--llm-max-concurrency", type=int, default=32, help="LLM calls in flight (scheduler limit)")
+    parser.add_argument("--llm-max-queue-depth", type=int, default=0, help="Queued LLM calls before requests get 503 (0: never)")
+    parser.add_argument("--llm-tokens-per-minute", type=int, default=0, help="Scheduler token budget (0: unlimited)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of LLM calls failing with a transient connection error")
+    parser.add_argument("--hedging", action="store_true", help="Hedge structured calls slower than their node's p95")
+    parser.add_argument("--llm-max-retries", type=int, default=2, help="Retries per LLM call after transient errors")
+    parser.add_argument("--llm-deadline", type=float, help="Per-call deadline in seconds (default: LLM_DEADLINE_SECONDS)")
+    parser.add_argument("--checkpointer", choices=["memory", "sqlite"], default="memory")
+    parser.add_argument("--sqlite-path", default=":memory:")
+    parser.add_argument("--fused-turns", action="store_true", help="Build the graph with fused Phase 2/3 turns")
+    parser.add_argument("--stream", action="store_true", help="Use /api/chat/reply/stream instead of /api/chat/reply")
+    parser.add_argument("--llm-cache", action="store_true", help="Keep the LLM response cache enabled")
+    parser.add_argument("--verbose", action="store_true", help="Keep the nodes' console output")
+    parser.add_argument("--output", help="Write the results as JSON to this path")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    result = asyncio.run(run_benchmark(args))
+    print_report(result)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"\nResults written to {args.output}")
+    return 0 if result["sessions"]["failed"] == 0 else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,120 @@
+"""Cold-start benchmark: how long a fresh worker process takes to import and get ready.
+
+Each run starts a new interpreter and times importing `main`, building the LLM clients
+and building the graph (with an in-memory checkpointer, so no Postgres is needed).
+It also reports which of the modules `main` is meant to load lazily were pulled in by the import.
+
+    cd src && python -m benchmark.startup --runs 10 --output startup.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+
+from benchmark.stats import summarize
+
+CHILD = """
+import json, sys, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+deferred = {m: m in sys.modules for m in %r}
+from llm_orchestration.llm import get_llm
+get_llm()
+llm_built = time.perf_counter()
+from langgraph.checkpoint.memory import InMemorySaver
+from llm_orchestration.clinical_assistant_graph import build_clinical_assistant_graph
+build_clinical_assistant_graph(InMemorySaver())
+graph_built = time.perf_counter()
+print(json.dumps({
+    "import main": imported - started,
+    "build LLM clients": llm_built - imported,
+    "build graph": graph_built - llm_built,
+    "deferred": deferred,
+}))
+"""
+
+# Imported inside the functions or lifespan that use them, so `import main` should not load them
+DEFERRED_MODULES = (
+    "langgraph.checkpoint.postgres",  # checkpointer, export, migrate
+    "pyarrow",                        # Parquet export
+    "openai",                         # error classification in resilience
+    "langchain_openai",               # built by get_llm
+)
+CHILD = CHILD % (DEFERRED_MODULES,)
+
+# Modules reported by -X importtime, largest cumulative first
+TOP_IMPORTS = 15
+
+def run_once(env: dict) -> dict:
+    started = time.perf_counter()
+    out = subprocess.run(
+        [sys.executable, "-W", "ignore", "-c", CHILD], env=env, capture_output=True, text=True, check=True
+    )
+    timings = json.loads(out.stdout.strip().splitlines()[-1])
+    timings["process total"] = time.perf_counter() - started
+    return timings
+
+def top_imports(env: dict) -> list:
+    out = subprocess.run(
+        [sys.executable, "-W", "ignore", "-X", "importtime", "-c", "import main"],
+        env=env, capture_output=True, text=True, check=True,
+    )
+    rows = []
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, module = line[len("import time:"):].split("|")
+        depth = len(module) - len(module.lstrip())
+        if depth <= 3:  # main and its direct imports
+            rows.append({"module": module.strip(), "cumulative_ms": round(int(cumulative) / 1000, 1)})
+    return sorted(rows, key=lambda r: -r["cumulative_ms"])[:TOP_IMPORTS]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure ClinicAssist import and startup time.")
+    parser.add_argument("--runs", type=int, default=10, help="Fresh processes to time")
+    parser.add_argument("--output", help="Write the results as JSON to this path")
+    args = parser.parse_args(argv)
+
+    # Clients are built but never called
+    env = {**os.environ, "OPENAI_API_KEY": os.environ.get("OPENAI_API_KEY", "benchmark-fake-key")}
+    samples = defaultdict(list)
+    deferred = {}
+    for _ in range(args.runs):
+        timings = run_once(env)
+        deferred = timings.pop("deferred")
+        for stage, seconds in timings.items():
+            samples[stage].append(seconds)
+
+    result = {
+        "config": {"runs": args.runs},
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "startup": {stage: summarize(values) for stage, values in samples.items()},
+        "top_imports": top_imports(env),
+        "loaded_by_import": deferred,
+    }
+
+    print(f"\n{'Stage':<44} {'count':>7} {'p50 ms':>10} {'p95 ms':>10} {'max ms':>10}")
+    for stage, s in result["startup"].items():
+        print(f"{stage:<44} {s['count']:>7} {s['p50_ms']:>10.1f} {s['p95_ms']:>10.1f} {s['max_ms']:>10.1f}")
+    print(f"\n{'Import (main and direct imports)':<44} {'cumulative ms':>14}")
+    for row in result["top_imports"]:
+        print(f"{row['module']:<44} {row['cumulative_ms']:>14.1f}")
+    print(f"\n{'Deferred module':<44} {'loaded by import main':>22}")
+    for module, loaded in deferred.items():
+        print(f"{module:<44} {'yes' if loaded else 'no':>22}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"\nResults written to {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
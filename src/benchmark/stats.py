@@ -0,0 +1,60 @@
+import math
+import resource
+import sys
+import time
+from collections import defaultdict
+from langchain_core.callbacks import BaseCallbackHandler
+
+def percentile(sorted_values: list, q: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(q / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+def summarize(samples: list) -> dict:
+    """Latency summary in milliseconds."""
+    values = sorted(samples)
+    return {
+        "count": len(values),
+        "mean_ms": round(sum(values) / len(values) * 1000, 3) if values else 0.0,
+        "p50_ms": round(percentile(values, 50) * 1000, 3),
+        "p95_ms": round(percentile(values, 95) * 1000, 3),
+        "p99_ms": round(percentile(values, 99) * 1000, 3),
+        "max_ms": round(values[-1] * 1000, 3) if values else 0.0,
+    }
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+class NodeTimer(BaseCallbackHandler):
+    """Wall time of each graph node run, taken from the node's own chain callbacks.
+
+    Nodes that interrupt (human_*) end in on_chain_error and are timed as well.
+    """
+
+    run_inline = True
+
+    def __init__(self):
+        self._started = {}
+        self.samples = defaultdict(list)
+
+    def on_chain_start(self, serialized, inputs, *, run_id, metadata=None, **kwargs):
+        node = (metadata or {}).get("langgraph_node")
+        if node is not None and kwargs.get("name") == node:
+            self._started[run_id] = (node, time.perf_counter())
+
+    def _finish(self, run_id):
+        entry = self._started.pop(run_id, None)
+        if entry is not None:
+            node, started_at = entry
+            self.samples[node].append(time.perf_counter() - started_at)
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._finish(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._finish(run_id)
@@ -0,0 +1,61 @@
+import os
+from psycopg.rows import dict_row
+from psycopg_pool import AsyncConnectionPool
+
+from dotenv import load_dotenv
+load_dotenv()
+
+def pool_settings() -> dict:
+    """Read checkpointer pool sizing from the environment."""
+    return {
+        "min_size": int(os.getenv("CHECKPOINT_POOL_MIN_SIZE", "2")),
+        "max_size": int(os.getenv("CHECKPOINT_POOL_MAX_SIZE", "10")),
+        "timeout": float(os.getenv("CHECKPOINT_POOL_TIMEOUT", "30")),        # seconds to wait for a free connection
+        "max_idle": float(os.getenv("CHECKPOINT_POOL_MAX_IDLE", "600")),     # close idle connections after this
+        "max_lifetime": float(os.getenv("CHECKPOINT_POOL_MAX_LIFETIME", "3600")),  # recycle connections after this
+    }
+
+def create_checkpointer_pool(db_url: str) -> AsyncConnectionPool:
+    """Build the connection pool backing AsyncPostgresSaver.
+
+    Connections are health-checked on checkout, so a dropped connection is
+    replaced instead of failing the request that picked it up.
+    """
+    return AsyncConnectionPool(
+        conninfo=db_url,
+        open=False,
+        check=AsyncConnectionPool.check_connection,
+        # AsyncPostgresSaver expects autocommit + dict rows, same as from_conn_string
+        kwargs={"autocommit": True, "prepare_threshold": 0, "row_factory": dict_row},
+        name="checkpointer",
+        **pool_settings(),
+    )
+
+def build_checkpointer(pool: AsyncConnectionPool):
+    from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver  # only needed once the lifespan opens the pool
+    return AsyncPostgresSaver(conn=pool)
+
+def pool_stats(pool: AsyncConnectionPool) -> dict:
+    """Snapshot of pool saturation and wait times for sizing per worker."""
+    stats = pool.get_stats()
+    size = stats.get("pool_size", 0)
+    available = stats.get("pool_available", 0)
+    requests_waiting = stats.get("requests_waiting", 0)
+    requests_num = stats.get("requests_num", 0)
+    wait_ms = stats.get("requests_wait_ms", 0)
+    return {
+        "min_size": pool.min_size,
+        "max_size": pool.max_size,
+        "pool_size": size,
+        "in_use": size - available,
+        "available": available,
+        "saturation": (size - available) / pool.max_size if pool.max_size else 0.0,
+        "requests_waiting": requests_waiting,
+        "requests_num": requests_num,
+        "requests_queued": stats.get("requests_queued", 0),
+        "requests_errors": stats.get("requests_errors", 0),
+        "requests_timeouts": stats.get("requests_timeouts", 0),
+        "total_wait_ms": wait_ms,
+        "avg_wait_ms": wait_ms / requests_num if requests_num else 0.0,
+        "connections_lost": stats.get("connections_lost", 0),
+    }
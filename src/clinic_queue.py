@@ -0,0 +1,225 @@
+import heapq
+import itertools
+from datetime import datetime, timezone
+from typing import Optional
+from psycopg.types.json import Jsonb
+from psycopg_pool import AsyncConnectionPool
+
+from models import URGENCY_RANK
+
+# Completed sessions waiting to be seen: most urgent first, then by arrival. Only waiting
+# rows are indexed, so the index holds the current queue rather than every patient ever seen.
+SETUP_SQL = """
+CREATE TABLE IF NOT EXISTS clinic_queue (
+    thread_id TEXT PRIMARY KEY,
+    ticket_number BIGSERIAL UNIQUE,
+    urgency TEXT NOT NULL,
+    urgency_rank INT NOT NULL,
+    arrived_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    status TEXT NOT NULL DEFAULT 'waiting',
+    called_at TIMESTAMPTZ,
+    payload JSONB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS clinic_queue_waiting_idx
+    ON clinic_queue (urgency_rank DESC, arrived_at, ticket_number) WHERE status = 'waiting';
+"""
+
+QUEUE_COLUMNS = "thread_id, ticket_number, urgency, urgency_rank, arrived_at, payload"
+QUEUE_ORDER = "urgency_rank DESC, arrived_at, ticket_number"
+# Rows ahead of (rank, arrived_at, ticket) in queue order
+AHEAD_OF = "(urgency_rank > %s OR (urgency_rank = %s AND (arrived_at, ticket_number) < (%s, %s)))"
+
+def queue_urgency(payload: dict) -> str:
+    """Urgency a patient queues at; a red flag from the intake screen always queues as EMERGENCY."""
+    if payload.get("red_flags"):
+        return "EMERGENCY"
+    urgency = (payload.get("generated_summary") or {}).get("urgency")
+    return urgency if urgency in URGENCY_RANK else "NON-URGENT"
+
+def sort_key(entry: dict) -> tuple:
+    return (-entry["urgency_rank"], entry["arrived_at"], entry["ticket_number"])
+
+def public_entry(entry: dict) -> dict:
+    return {
+        "session_id": entry["thread_id"],
+        "ticket_number": entry["ticket_number"],
+        "urgency": entry["urgency"],
+        "arrived_at": entry["arrived_at"].isoformat(),
+        "waiting_seconds": round((datetime.now(timezone.utc) - entry["arrived_at"]).total_seconds()),
+        "patient": entry["payload"],
+    }
+
+class ClinicQueue:
+    """Patients waiting for a clinician, in Postgres or, without a pool, in memory.
+
+    With a pool, Postgres is the queue and every call goes to it; nothing is cached per worker.
+    Enqueue is one insert. Calling the next patient reads the head of the waiting index and
+    claims it with SKIP LOCKED, so two clinicians never get the same patient. A patient's
+    position is a count of the waiting rows ahead of them, an index range scan that grows with
+    that count rather than with the whole table.
+
+    Without a pool (the benchmark) the queue is a heap: O(log n) enqueue and next-patient, and
+    a position is a pass over the waiting patients.
+    """
+
+    def __init__(self, pool: Optional[AsyncConnectionPool]):
+        self.pool = pool
+        self._heap = []  # in-memory queue only: (sort key..., thread_id); called entries are skipped lazily
+        self._waiting = {}  # in-memory queue only: thread_id -> entry
+        self._tickets = itertools.count(1)
+        self.stats = {"enqueued": 0, "called": 0}
+
+    async def setup(self):
+        if self.pool is not None:
+            async with self.pool.connection() as conn:
+                await conn.execute(SETUP_SQL)
+
+    def _push(self, entry: dict):
+        self._waiting[entry["thread_id"]] = entry
+        heapq.heappush(self._heap, (*sort_key(entry), entry["thread_id"]))
+
+    def _prune(self):
+        while self._heap and self._heap[0][-1] not in self._waiting:
+            heapq.heappop(self._heap)
+
+    async def enqueue(self, thread_id: str, payload: dict) -> dict:
+        """Queue a completed session (once) and return its ticket and position.
+
+        `payload` is the session's extracted view, shown to the clinician who calls the patient.
+        """
+        urgency = queue_urgency(payload)
+        if self.pool is None:
+            entry = self._waiting.get(thread_id)
+            if entry is None:
+                entry = {
+                    "thread_id": thread_id,
+                    "ticket_number": next(self._tickets),
+                    "urgency": urgency,
+                    "urgency_rank": URGENCY_RANK[urgency],
+                    "arrived_at": datetime.now(timezone.utc),
+                    "payload": payload,
+                }
+                self._push(entry)
+                self.stats["enqueued"] += 1
+            return await self.ticket(thread_id)
+
+        async with self.pool.connection() as conn:
+            cur = await conn.execute(
+                "INSERT INTO clinic_queue (thread_id, urgency, urgency_rank, payload) VALUES (%s, %s, %s, %s) "
+                f"ON CONFLICT (thread_id) DO NOTHING RETURNING {QUEUE_COLUMNS}",
+                (thread_id, urgency, URGENCY_RANK[urgency], Jsonb(payload)),
+            )
+            if await cur.fetchone() is not None:
+                self.stats["enqueued"] += 1
+        return await self.ticket(thread_id)
+
+    async def ticket(self, thread_id: str) -> Optional[dict]:
+        """A queued session's ticket and current position (0 once called), or None if not queued."""
+        if self.pool is None:
+            entry = self._waiting.get(thread_id)
+            if entry is None:
+                return None
+            key = sort_key(entry)
+            ahead = sum(1 for other in self._waiting.values() if sort_key(other) < key)
+            return {"ticket_number": entry["ticket_number"], "position": ahead + 1, "urgency": entry["urgency"]}
+
+        async with self.pool.connection() as conn:
+            cur = await conn.execute(
+                "SELECT ticket_number, urgency, urgency_rank, arrived_at, status FROM clinic_queue WHERE thread_id = %s",
+                (thread_id,),
+            )
+            entry = await cur.fetchone()
+            if entry is None:
+                return None
+            if entry["status"] != "waiting":
+                return {"ticket_number": entry["ticket_number"], "position": 0, "urgency": entry["urgency"]}
+            rank = entry["urgency_rank"]
+            cur = await conn.execute(
+                f"SELECT count(*) AS ahead FROM clinic_queue WHERE status = 'waiting' AND {AHEAD_OF}",
+                (rank, rank, entry["arrived_at"], entry["ticket_number"]),
+            )
+            ahead = (await cur.fetchone())["ahead"]
+        return {"ticket_number": entry["ticket_number"], "position": ahead + 1, "urgency": entry["urgency"]}
+
+    async def pop(self) -> Optional[dict]:
+        """Call the next patient: remove them from the queue and return their entry."""
+        if self.pool is None:
+            self._prune()
+            if not self._heap:
+                return None
+            entry = self._waiting.pop(heapq.heappop(self._heap)[-1])
+        else:
+            async with self.pool.connection() as conn:
+                cur = await conn.execute(
+                    "UPDATE clinic_queue SET status = 'called', called_at = now() WHERE thread_id = ("
+                    f"  SELECT thread_id FROM clinic_queue WHERE status = 'waiting' ORDER BY {QUEUE_ORDER}"
+                    "  LIMIT 1 FOR UPDATE SKIP LOCKED"
+                    f") RETURNING {QUEUE_COLUMNS}"
+                )
+                entry = await cur.fetchone()
+            if entry is None:
+                return None
+        self.stats["called"] += 1
+        return public_entry(entry)
+
+    async def peek(self, limit: int = 1) -> list:
+        """The next `limit` patients, without calling them."""
+        if self.pool is None:
+            self._prune()
+            if limit == 1:
+                keys = self._heap[:1]
+            else:
+                keys = heapq.nsmallest(limit, (k for k in self._heap if k[-1] in self._waiting))
+            return [public_entry(self._waiting[k[-1]]) for k in keys]
+        async with self.pool.connection() as conn:
+            cur = await conn.execute(
+                f"SELECT {QUEUE_COLUMNS} FROM clinic_queue WHERE status = 'waiting' ORDER BY {QUEUE_ORDER} LIMIT %s",
+                (limit,),
+            )
+            rows = await cur.fetchall()
+        return [public_entry(row) for row in rows]
+
+    async def page(self, after: Optional[int] = None, limit: int = 50) -> dict:
+        """Waiting patients in queue order, keyset-paged by the last ticket_number seen."""
+        if self.pool is None:
+            entries = sorted(self._waiting.values(), key=sort_key)
+            if after is not None:
+                cursor = next((sort_key(e) for e in entries if e["ticket_number"] == after), None)
+                entries = [e for e in entries if cursor is None or sort_key(e) > cursor]
+            waiting = len(self._waiting)
+            rows = entries[:limit]
+        else:
+            async with self.pool.connection() as conn:
+                if after is None:
+                    cur = await conn.execute(
+                        f"SELECT {QUEUE_COLUMNS} FROM clinic_queue WHERE status = 'waiting' "
+                        f"ORDER BY {QUEUE_ORDER} LIMIT %s",
+                        (limit,),
+                    )
+                else:
+                    cur = await conn.execute(
+                        f"SELECT {QUEUE_COLUMNS} FROM clinic_queue q, "
+                        "(SELECT urgency_rank AS r, arrived_at AS a, ticket_number AS t FROM clinic_queue "
+                        " WHERE ticket_number = %s) c "
+                        "WHERE q.status = 'waiting' AND (q.urgency_rank < c.r OR (q.urgency_rank = c.r "
+                        "AND (q.arrived_at, q.ticket_number) > (c.a, c.t))) "
+                        f"ORDER BY {QUEUE_ORDER} LIMIT %s",
+                        (after, limit),
+                    )
+                rows = await cur.fetchall()
+                cur = await conn.execute("SELECT count(*) AS waiting FROM clinic_queue WHERE status = 'waiting'")
+                waiting = (await cur.fetchone())["waiting"]
+        return {
+            "waiting": waiting,
+            "patients": [public_entry(row) for row in rows],
+            "next_after": rows[-1]["ticket_number"] if len(rows) == limit else None,
+        }
+
+    def snapshot(self) -> dict:
+        snapshot = {**self.stats, "backend": "memory" if self.pool is None else "postgres"}
+        if self.pool is None:
+            snapshot["waiting"] = len(self._waiting)
+        return snapshot
+
+def create_clinic_queue(pool: Optional[AsyncConnectionPool]) -> ClinicQueue:
+    return ClinicQueue(pool)
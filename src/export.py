@@ -0,0 +1,318 @@
+import argparse
+import asyncio
+import io
+import json
+import os
+import sys
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import AsyncIterator, Optional
+from psycopg import AsyncConnection
+from psycopg.rows import dict_row
+from psycopg_pool import AsyncConnectionPool
+
+from models import URGENCY_RANK
+from llm_orchestration.clinical_assistant_graph import thread_config
+
+from dotenv import load_dotenv
+load_dotenv()
+
+# Streams completed sessions out of session_archive for reporting. It is the same record of
+# completed sessions re-triage reads, and migrate.py backfills it with sessions that completed
+# before archiving existed. Each record is the archived extract_view payload plus the transcript
+# from the session's final checkpoint. Rows are read through a server-side cursor in
+# (completed_at, thread_id) order, one batch at a time, so an export holds one batch in memory
+# however many sessions it covers. The last record's "<completed_at>,<session_id>" is the cursor
+# to resume after.
+SETUP_SQL = """
+CREATE INDEX IF NOT EXISTS session_archive_completed_idx ON session_archive (completed_at, thread_id);
+"""
+
+EXPORT_FORMATS = {"ndjson": "application/x-ndjson", "parquet": "application/vnd.apache.parquet"}
+
+class ExportUnavailable(Exception):
+    """Raised when the requested export format needs an optional dependency that is missing."""
+
+@dataclass
+class ExportFilters:
+    since: Optional[datetime] = None        # completed at or after
+    until: Optional[datetime] = None        # completed before
+    urgency: Optional[list] = None          # triage urgencies to include
+    after: Optional[tuple] = None           # (completed_at, thread_id) of the last record already exported
+
+def parse_timestamp(value: str) -> datetime:
+    """ISO date or timestamp; naive values are taken as UTC."""
+    parsed = datetime.fromisoformat(value)
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+def format_cursor(record: dict) -> str:
+    return f"{record['completed_at']},{record['session_id']}"
+
+def parse_cursor(cursor: str) -> tuple:
+    completed_at, _, thread_id = cursor.partition(",")
+    if not thread_id:
+        raise ValueError(f"Invalid export cursor {cursor!r}, expected '<completed_at>,<session_id>'")
+    return parse_timestamp(completed_at), thread_id
+
+def export_filters(since: str = None, until: str = None, urgency: str = None, after: str = None) -> ExportFilters:
+    """Filters from their string forms (API query or CLI); raises ValueError on bad input."""
+    urgencies = None
+    if urgency:
+        urgencies = [u.strip().upper() for u in urgency.split(",") if u.strip()]
+        unknown = [u for u in urgencies if u not in URGENCY_RANK]
+        if unknown:
+            raise ValueError(f"Unknown urgency {', '.join(unknown)}; expected one of {', '.join(URGENCY_RANK)}")
+    return ExportFilters(
+        since=parse_timestamp(since) if since else None,
+        until=parse_timestamp(until) if until else None,
+        urgency=urgencies,
+        after=parse_cursor(after) if after else None,
+    )
+
+def export_query(filters: ExportFilters) -> tuple:
+    """SELECT over session_archive with only the conditions in use, so the range scan uses the index."""
+    conditions, params = [], {}
+    if filters.since is not None:
+        conditions.append("completed_at >= %(since)s")
+        params["since"] = filters.since
+    if filters.until is not None:
+        conditions.append("completed_at < %(until)s")
+        params["until"] = filters.until
+    if filters.after is not None:
+        conditions.append("(completed_at, thread_id) > (%(after_at)s, %(after_id)s)")
+        params["after_at"], params["after_id"] = filters.after
+    if filters.urgency:
+        conditions.append("payload->'generated_summary'->>'urgency' = ANY(%(urgency)s)")
+        params["urgency"] = filters.urgency
+    sql = "SELECT thread_id, completed_at, payload, usage FROM session_archive"
+    if conditions:
+        sql += f" WHERE {' AND '.join(conditions)}"
+    sql += " ORDER BY completed_at, thread_id"
+    return sql, params
+
+def transcript(values: Optional[dict]) -> Optional[list]:
+    """Patient and assistant turns, or None if the session's checkpoints were purged."""
+    if values is None:
+        return None
+    return [{"role": m.type, "content": m.content} for m in values.get("messages", [])]
+
+def export_record(row: dict, values: Optional[dict], include_transcript: bool) -> dict:
+    record = {"session_id": row["thread_id"], "completed_at": row["completed_at"].isoformat(), **row["payload"]}
+    if include_transcript:
+        record["transcript"] = transcript(values)
+    record["usage"] = row["usage"]
+    return record
+
+async def export_batches(conn: AsyncConnection, filters: ExportFilters, include_transcript: bool = True,
+                         batch_size: int = 200) -> AsyncIterator[list]:
+    """Batches of export records, read through a server-side cursor on `conn`.
+
+    `conn` should not come from the checkpointer pool: it is held for the whole export.
+    Transcripts are read from the final checkpoints over the same connection.
+    """
+    from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver  # kept off the API's import path
+    saver = AsyncPostgresSaver(conn)
+    sql, params = export_query(filters)
+    async with conn.transaction():
+        async with conn.cursor(name="session_export", row_factory=dict_row) as cur:
+            cur.itersize = batch_size
+            await cur.execute(sql, params)
+            while rows := await cur.fetchmany(batch_size):
+                batch = []
+                for row in rows:
+                    values = None
+                    if include_transcript:
+                        checkpoint = await saver.aget_tuple(thread_config(row["thread_id"]))
+                        values = checkpoint.checkpoint["channel_values"] if checkpoint else None
+                    batch.append(export_record(row, values, include_transcript))
+                yield batch
+
+def ndjson_chunk(batch: list) -> bytes:
+    return "".join(json.dumps(record, default=str) + "\n" for record in batch).encode()
+
+def load_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError as e:
+        raise ExportUnavailable("Parquet export needs pyarrow (pip install .[export])") from e
+    return pyarrow, pyarrow.parquet
+
+# Parquet columns: record fields are flattened, nested ones (history, summary, transcript) kept as JSON
+LIST_COLUMNS = ("main_symptoms", "associated_symptoms", "additional_symptom_info")
+JSON_COLUMNS = ("medical_history", "generated_summary", "red_flags", "transcript", "usage")
+
+def parquet_schema(pa):
+    return pa.schema([
+        ("session_id", pa.string()),
+        ("completed_at", pa.timestamp("us", tz="UTC")),
+        ("patient_name", pa.string()),
+        ("patient_age", pa.int64()),
+        ("patient_sex", pa.string()),
+        ("symptom_onset", pa.string()),
+        *[(column, pa.list_(pa.string())) for column in LIST_COLUMNS],
+        ("urgency", pa.string()),
+        ("probable_diagnosis", pa.string()),
+        *[(column, pa.string()) for column in JSON_COLUMNS],
+    ])
+
+def parquet_row(record: dict) -> dict:
+    summary = record.get("generated_summary") or {}
+    row = {
+        "session_id": record["session_id"],
+        "completed_at": datetime.fromisoformat(record["completed_at"]),
+        "patient_name": record.get("patient_name"),
+        "patient_age": record.get("patient_age"),
+        "patient_sex": record.get("patient_sex"),
+        "symptom_onset": record.get("symptom_onset"),
+        "urgency": summary.get("urgency"),
+        "probable_diagnosis": summary.get("probable_diagnosis"),
+    }
+    for column in LIST_COLUMNS:
+        row[column] = record.get(column)
+    for column in JSON_COLUMNS:
+        row[column] = json.dumps(record[column], default=str) if record.get(column) is not None else None
+    return row
+
+class ChunkSink(io.RawIOBase):
+    """Write-only file that hands back what was written since the last drain."""
+
+    def __init__(self):
+        self._chunks = []
+        self._written = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._written += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._written
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+class ParquetEncoder:
+    """Encodes batches as row groups of one Parquet file, returning the bytes each adds."""
+
+    def __init__(self):
+        self.pa, self.pq = load_pyarrow()
+        self.schema = parquet_schema(self.pa)
+        self.sink = ChunkSink()
+        self.writer = self.pq.ParquetWriter(self.sink, self.schema)
+
+    def encode(self, batch: list) -> bytes:
+        table = self.pa.Table.from_pylist([parquet_row(record) for record in batch], schema=self.schema)
+        self.writer.write_table(table)
+        return self.sink.drain()
+
+    def close(self) -> bytes:
+        self.writer.close()
+        return self.sink.drain()
+
+async def export_stream(conn: AsyncConnection, filters: ExportFilters, fmt: str = "ndjson",
+                        include_transcript: bool = True, batch_size: int = 200) -> AsyncIterator[bytes]:
+    """The export as a stream of NDJSON or Parquet bytes, one chunk per batch."""
+    started, exported = time.perf_counter(), 0
+    encoder = ParquetEncoder() if fmt == "parquet" else None
+    async for batch in export_batches(conn, filters, include_transcript, batch_size):
+        exported += len(batch)
+        # Encoding is CPU-bound; keep it off the event loop serving chat traffic
+        if encoder is None:
+            yield await asyncio.to_thread(ndjson_chunk, batch)
+        else:
+            yield await asyncio.to_thread(encoder.encode, batch)
+    if encoder is not None:
+        yield encoder.close()
+    print(f"Exported {exported} session(s) as {fmt} in {time.perf_counter() - started:.1f}s")
+
+def export_batch_size() -> int:
+    return int(os.getenv("EXPORT_BATCH_SIZE", "200"))
+
+def create_export_pool(db_url: str) -> AsyncConnectionPool:
+    """Connections for exports, apart from the checkpointer pool so a long export never holds a
+    connection chat requests are waiting for. Its size caps concurrent exports per worker."""
+    return AsyncConnectionPool(
+        conninfo=db_url,
+        open=False,
+        check=AsyncConnectionPool.check_connection,
+        kwargs={"autocommit": True, "prepare_threshold": 0, "row_factory": dict_row},
+        name="export",
+        min_size=0,
+        max_size=int(os.getenv("EXPORT_POOL_MAX_SIZE", "2")),
+    )
+
+async def setup_export(pool: AsyncConnectionPool):
+    async with pool.connection() as conn:
+        await conn.execute(SETUP_SQL)
+
+def resume_cursor(path: str) -> Optional[str]:
+    """Cursor after the last complete record of an NDJSON export file; a partial last line is cut off."""
+    last, complete_bytes = None, 0
+    with open(path, "rb") as f:
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            if line.strip():
+                last = line
+            complete_bytes += len(line)
+    os.truncate(path, complete_bytes)
+    return format_cursor(json.loads(last)) if last else None
+
+async def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export completed triage sessions as NDJSON or Parquet")
+    parser.add_argument("--format", choices=EXPORT_FORMATS, default="ndjson")
+    parser.add_argument("--output", help="file to write; NDJSON goes to stdout if omitted")
+    parser.add_argument("--since", help="only sessions completed at or after this ISO date/timestamp")
+    parser.add_argument("--until", help="only sessions completed before this ISO date/timestamp")
+    parser.add_argument("--urgency", help="comma-separated urgencies to include, e.g. URGENT,EMERGENCY")
+    parser.add_argument("--after", metavar="CURSOR", help="continue after this '<completed_at>,<session_id>'")
+    parser.add_argument("--resume", action="store_true", help="append to an NDJSON --output after its last record")
+    parser.add_argument("--no-transcript", action="store_true", help="leave out the transcripts")
+    parser.add_argument("--batch-size", type=int, default=export_batch_size())
+    args = parser.parse_args(argv)
+    if args.format == "parquet" and not args.output:
+        parser.error("--format parquet needs --output")
+    if args.resume and (args.format != "ndjson" or not args.output):
+        parser.error("--resume needs an NDJSON --output")
+
+    after = args.after
+    if args.resume and os.path.exists(args.output):
+        after = resume_cursor(args.output) or after
+        print(f"Resuming after {after}", file=sys.stderr)
+    try:
+        filters = export_filters(args.since, args.until, args.urgency, after)
+    except ValueError as e:
+        parser.error(str(e))
+
+    from migrate import check_schema  # migrate imports this module's setup
+    from checkpointer import create_checkpointer_pool
+    async with create_checkpointer_pool(os.environ["DATABASE_URL"]) as pool:
+        await check_schema(pool)
+    mode = "ab" if args.resume else "wb"
+    out = open(args.output, mode) if args.output else sys.stdout.buffer
+    last = None
+    try:
+        async with create_export_pool(os.environ["DATABASE_URL"]) as export_pool, export_pool.connection() as conn:
+            encoder = ParquetEncoder() if args.format == "parquet" else None
+            async for batch in export_batches(conn, filters, not args.no_transcript, args.batch_size):
+                out.write(encoder.encode(batch) if encoder else ndjson_chunk(batch))
+                out.flush()
+                last = format_cursor(batch[-1])
+            if encoder is not None:
+                out.write(encoder.close())
+    finally:
+        if out is not sys.stdout.buffer:
+            out.close()
+        if last:
+            print(f"Last exported cursor: {last}", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(asyncio.run(main()))
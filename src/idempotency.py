@@ -0,0 +1,67 @@
+from collections import OrderedDict
+from typing import Optional
+from psycopg.types.json import Jsonb
+from psycopg_pool import AsyncConnectionPool
+
+# Stored replies for ChatRequest.idempotency_key: a retried or double-submitted reply
+# returns the original ChatResponse instead of resuming the graph a second time.
+SETUP_SQL = """
+CREATE TABLE IF NOT EXISTS chat_idempotency (
+    session_id TEXT NOT NULL,
+    idempotency_key TEXT NOT NULL,
+    response JSONB NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (session_id, idempotency_key)
+);
+CREATE INDEX IF NOT EXISTS chat_idempotency_created_at_idx ON chat_idempotency (created_at);
+"""
+
+class IdempotencyStore:
+    """Replies by (session_id, idempotency_key), in Postgres or, without a pool, in memory."""
+
+    def __init__(self, pool: Optional[AsyncConnectionPool], max_local_entries: int = 1000):
+        self.pool = pool
+        self.max_local_entries = max_local_entries
+        self._local = OrderedDict()
+        self.stats = {"replays": 0, "stored": 0}
+
+    async def setup(self):
+        if self.pool is not None:
+            async with self.pool.connection() as conn:
+                await conn.execute(SETUP_SQL)
+
+    async def get(self, session_id: str, key: str) -> Optional[dict]:
+        if self.pool is None:
+            response = self._local.get((session_id, key))
+        else:
+            async with self.pool.connection() as conn:
+                cur = await conn.execute(
+                    "SELECT response FROM chat_idempotency WHERE session_id = %s AND idempotency_key = %s",
+                    (session_id, key),
+                )
+                row = await cur.fetchone()
+                response = row["response"] if row else None
+        if response is not None:
+            self.stats["replays"] += 1
+        return response
+
+    async def put(self, session_id: str, key: str, response: dict):
+        self.stats["stored"] += 1
+        if self.pool is None:
+            self._local[(session_id, key)] = response
+            while len(self._local) > self.max_local_entries:
+                self._local.popitem(last=False)
+            return
+        async with self.pool.connection() as conn:
+            await conn.execute(
+                "INSERT INTO chat_idempotency (session_id, idempotency_key, response) VALUES (%s, %s, %s) "
+                "ON CONFLICT DO NOTHING",
+                (session_id, key, Jsonb(response)),
+            )
+
+async def purge_idempotency_keys(pool: AsyncConnectionPool, ttl_seconds: float) -> int:
+    async with pool.connection() as conn:
+        cur = await conn.execute(
+            "DELETE FROM chat_idempotency WHERE created_at < now() - make_interval(secs => %s)", (ttl_seconds,)
+        )
+        return cur.rowcount
@@ -0,0 +1,232 @@
+import asyncio
+import heapq
+import itertools
+import math
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from langchain_core.messages.utils import count_tokens_approximately
+
+from llm_orchestration.llm_cache import current_node
+from llm_orchestration.instrumentation import LLM_IN_FLIGHT, LLM_QUEUE_DEPTH, LLM_QUEUE_WAIT, LLM_REJECTIONS
+
+from dotenv import load_dotenv
+load_dotenv()
+
+# Lower runs first. Patient-facing turns and triage go ahead of extraction and sufficiency
+# checks; calls outside a graph node (bulk re-triage) and pre-warming run last.
+PRIORITIES = {"interactive": 0, "extraction": 1, "background": 2}
+PRIORITY_BY_NODE = {
+    "ask_patient_info": "interactive",
+    "ask_symptoms": "interactive",
+    "ask_medhist": "interactive",
+    "symptoms_turn": "interactive",
+    "medhist_turn": "interactive",
+    "triage_summary": "interactive",
+    "acknowledgement": "interactive",
+    "extract_patient_info": "extraction",
+    "extract_symptoms": "extraction",
+    "extract_medhist": "extraction",
+}
+
+# Set for work nobody is waiting on, e.g. the session pool pre-warming sessions
+_background: ContextVar = ContextVar("llm_background", default=False)
+
+@contextmanager
+def background_priority():
+    token = _background.set(True)
+    try:
+        yield
+    finally:
+        _background.reset(token)
+
+def priority_for(node: str) -> str:
+    if _background.get():
+        return "background"
+    return PRIORITY_BY_NODE.get(node, "background")
+
+
+class LLMBusy(Exception):
+    """Raised when the LLM queue is too deep to take on a new request."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Assistant is busy, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+class LLMScheduler:
+    """Process-wide admission control for chat model calls.
+
+    At most `max_concurrency` calls run at once and, when `tokens_per_minute` is set, their
+    estimated tokens are drawn from a bucket refilled at that rate. Calls that cannot start
+    wait in a priority queue (FIFO within a priority). Requests are turned away up front by
+    `check_admission` once `max_queue_depth` calls are waiting.
+    """
+
+    def __init__(self, max_concurrency: int, tokens_per_minute: int, max_queue_depth: int):
+        self.max_concurrency = max_concurrency
+        self.tokens_per_minute = tokens_per_minute
+        self.max_queue_depth = max_queue_depth
+        self._in_flight = 0
+        self._waiters = []  # heap of (priority, seq, tokens, future, label)
+        self._seq = itertools.count()
+        self._tokens = float(tokens_per_minute)
+        self._refilled_at = time.monotonic()
+        self._timer = None
+        self._durations = deque(maxlen=100)
+        self.stats = {"admitted": 0, "queued": 0, "rejected": 0, "wait_seconds_total": 0.0, "max_wait_seconds": 0.0}
+
+    def queue_depth(self) -> int:
+        return sum(1 for *_, future, _ in self._waiters if not future.done())
+
+    def retry_after(self) -> int:
+        """Seconds until the current queue has likely drained, from recent call durations."""
+        average = sum(self._durations) / len(self._durations) if self._durations else 2.0
+        return max(1, math.ceil(self.queue_depth() * average / self.max_concurrency))
+
+    def check_admission(self):
+        """Turn a new request away (LLMBusy) when the queue is already past its threshold."""
+        if self.max_queue_depth and self.queue_depth() >= self.max_queue_depth:
+            self.stats["rejected"] += 1
+            LLM_REJECTIONS.inc()
+            raise LLMBusy(self.retry_after())
+
+    def _refill(self):
+        now = time.monotonic()
+        if self.tokens_per_minute:
+            self._tokens = min(
+                self.tokens_per_minute, self._tokens + (now - self._refilled_at) * self.tokens_per_minute / 60
+            )
+        self._refilled_at = now
+
+    def _can_start(self, tokens: int) -> bool:
+        if self._in_flight >= self.max_concurrency:
+            return False
+        # A call larger than the whole bucket waits for a full bucket rather than forever
+        return not self.tokens_per_minute or self._tokens >= min(tokens, self.tokens_per_minute)
+
+    def _start(self, tokens: int):
+        self._in_flight += 1
+        if self.tokens_per_minute:
+            self._tokens -= tokens
+        LLM_IN_FLIGHT.set(self._in_flight)
+
+    def _dispatch(self):
+        """Start queued calls in priority order while capacity and tokens allow."""
+        self._refill()
+        while self._waiters:
+            _, _, tokens, future, label = self._waiters[0]
+            if future.done():  # cancelled while waiting
+                heapq.heappop(self._waiters)
+                LLM_QUEUE_DEPTH.labels(label).dec()
+                continue
+            if not self._can_start(tokens):
+                break
+            heapq.heappop(self._waiters)
+            LLM_QUEUE_DEPTH.labels(label).dec()
+            self._start(tokens)
+            future.set_result(None)
+        # Blocked on tokens only: wake up once the head of the queue can afford its call
+        if self._waiters and self.tokens_per_minute and self._in_flight < self.max_concurrency and self._timer is None:
+            deficit = min(self._waiters[0][2], self.tokens_per_minute) - self._tokens
+            delay = max(deficit * 60 / self.tokens_per_minute, 0.01)
+            self._timer = asyncio.get_running_loop().call_later(delay, self._on_timer)
+
+    def _on_timer(self):
+        self._timer = None
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, priority: str, tokens: int):
+        queued_at = time.monotonic()
+        self._refill()
+        if not self._waiters and self._can_start(tokens):
+            self._start(tokens)
+        else:
+            future = asyncio.get_running_loop().create_future()
+            heapq.heappush(self._waiters, (PRIORITIES[priority], next(self._seq), tokens, future, priority))
+            LLM_QUEUE_DEPTH.labels(priority).inc()
+            self.stats["queued"] += 1
+            self._dispatch()
+            try:
+                await future
+            except asyncio.CancelledError:
+                if future.done() and not future.cancelled():
+                    # Granted just as the caller went away: hand the slot on
+                    self._release()
+                else:
+                    self._dispatch()
+                raise
+        waited = time.monotonic() - queued_at
+        LLM_QUEUE_WAIT.labels(priority).observe(waited)
+        self.stats["admitted"] += 1
+        self.stats["wait_seconds_total"] += waited
+        self.stats["max_wait_seconds"] = max(self.stats["max_wait_seconds"], waited)
+
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self._durations.append(time.monotonic() - started)
+            self._release()
+
+    def _release(self):
+        self._in_flight -= 1
+        LLM_IN_FLIGHT.set(self._in_flight)
+        self._dispatch()
+
+    def snapshot(self) -> dict:
+        self._refill()
+        admitted = self.stats["admitted"]
+        return {
+            **self.stats,
+            "avg_wait_seconds": self.stats["wait_seconds_total"] / admitted if admitted else 0.0,
+            "in_flight": self._in_flight,
+            "queue_depth": self.queue_depth(),
+            "tokens_available": round(self._tokens) if self.tokens_per_minute else None,
+            "max_concurrency": self.max_concurrency,
+            "tokens_per_minute": self.tokens_per_minute or None,
+            "max_queue_depth": self.max_queue_depth,
+        }
+
+def create_llm_scheduler() -> LLMScheduler:
+    """Build the scheduler from LLM_* settings.
+
+    The limits are for the whole deployment; with LLM_SCHEDULER_WORKERS=N each worker
+    process enforces 1/N of them.
+    """
+    workers = max(1, int(os.getenv("LLM_SCHEDULER_WORKERS", "1")))
+    return LLMScheduler(
+        max_concurrency=max(1, int(os.getenv("LLM_MAX_CONCURRENCY", "32")) // workers),
+        tokens_per_minute=int(os.getenv("LLM_TOKENS_PER_MINUTE", "0")) // workers,
+        max_queue_depth=int(os.getenv("LLM_MAX_QUEUE_DEPTH", "64")),
+    )
+
+llm_scheduler = create_llm_scheduler()
+
+# Expected completion length, added to the prompt size when drawing from the token budget
+OUTPUT_TOKENS_ESTIMATE = int(os.getenv("LLM_OUTPUT_TOKENS_ESTIMATE", "300"))
+
+
+class AdmittedRunnable:
+    """Wraps a chat model (or structured-output runnable) so each call goes through the scheduler."""
+
+    def __init__(self, runnable, scheduler: LLMScheduler):
+        self.runnable = runnable
+        self.scheduler = scheduler
+
+    async def ainvoke(self, messages, config=None, **kwargs):
+        tokens = count_tokens_approximately(messages) + OUTPUT_TOKENS_ESTIMATE
+        async with self.scheduler.slot(priority_for(current_node()), tokens):
+            return await self.runnable.ainvoke(messages, config, **kwargs)
+
+    def invoke(self, messages, config=None, **kwargs):
+        return self.runnable.invoke(messages, config, **kwargs)
+
+    def with_structured_output(self, schema, **kwargs):
+        return AdmittedRunnable(self.runnable.with_structured_output(schema, **kwargs), self.scheduler)
+
+    def __getattr__(self, name):
+        return getattr(self.runnable, name)
@@ -1,33 +1,56 @@
 from langgraph.graph import StateGraph, START, END
 from langgraph.checkpoint.memory import InMemorySaver
 
-from models import AgentState
+from models import AgentState, PHASE_BY_NODE
 from llm_orchestration.part1_patient_demo import ask_patient_info, extract_patient_info, human_patient_info_node, route_after_patient_info
-from llm_orchestration.part2_symptom_collect import ask_symptoms, extract_symptoms, human_symptoms_node, route_after_symptoms
-from llm_orchestration.part3_medhist_collect import ask_medhist, extract_medhist, route_after_med_history, human_medhist_node
-from llm_orchestration.part4_triaging import triage_summary, acknowledgement
-
-def build_clinical_assistant_graph(checkpointer):
+from llm_orchestration.part2_symptom_collect import ask_symptoms, extract_symptoms, human_symptoms_node, route_after_symptoms, symptoms_turn, route_after_symptoms_turn
+from llm_orchestration.part3_medhist_collect import ask_medhist, extract_medhist, route_after_med_history, human_medhist_node, medhist_turn, route_after_medhist_turn
+from llm_orchestration.part4_triaging import triage_summary, acknowledgement, route_red_flags
+from llm_orchestration.instrumentation import GraphMetricsHandler, TimedCheckpointer
+from llm_orchestration.usage import UsageHandler, track_usage, track_router_usage
+
+def build_clinical_assistant_graph(checkpointer, fused_turns: bool = False):
+    """Build the intake graph.
+
+    With fused_turns=True, Phases 2 and 3 handle each patient reply with a single
+    structured call (extract + sufficiency verdict + next question) instead of
+    separate extract, sufficiency-check and ask calls.
+    """
     clinical_assistant_builder = StateGraph(AgentState)
 
+    def add_node(name, node):
+        # Each node's LLM usage and patient turns are merged into its state update (see usage.py)
+        clinical_assistant_builder.add_node(name, track_usage(name, PHASE_BY_NODE[name], node))
+
+    def add_conditional_edges(source, path, path_map):
+        clinical_assistant_builder.add_conditional_edges(
+            source, track_router_usage(PHASE_BY_NODE[source], path), path_map
+        )
+
     # Add Phase 1 nodes
-    clinical_assistant_builder.add_node("ask_patient_info", ask_patient_info)
-    clinical_assistant_builder.add_node("extract_patient_info", extract_patient_info)
-    clinical_assistant_builder.add_node("human_patient_info_node", human_patient_info_node)
+    add_node("ask_patient_info", ask_patient_info)
+    add_node("extract_patient_info", extract_patient_info)
+    add_node("human_patient_info_node", human_patient_info_node)
 
     # Add Phase 2 nodes
-    clinical_assistant_builder.add_node("ask_symptoms", ask_symptoms)
-    clinical_assistant_builder.add_node("extract_symptoms", extract_symptoms)
-    clinical_assistant_builder.add_node("human_symptoms_node", human_symptoms_node)
+    add_node("ask_symptoms", ask_symptoms)
+    add_node("human_symptoms_node", human_symptoms_node)
+    if fused_turns:
+        add_node("symptoms_turn", symptoms_turn)
+    else:
+        add_node("extract_symptoms", extract_symptoms)
 
     # Add Phase 3 nodes
-    clinical_assistant_builder.add_node("ask_medhist", ask_medhist)
-    clinical_assistant_builder.add_node("extract_medhist", extract_medhist)
-    clinical_assistant_builder.add_node("human_medhist_node", human_medhist_node)
+    add_node("ask_medhist", ask_medhist)
+    add_node("human_medhist_node", human_medhist_node)
+    if fused_turns:
+        add_node("medhist_turn", medhist_turn)
+    else:
+        add_node("extract_medhist", extract_medhist)
 
     # Add Phase 4 nodes
-    clinical_assistant_builder.add_node("triage_summary", triage_summary)
-    clinical_assistant_builder.add_node("acknowledgement", acknowledgement)
+    add_node("triage_summary", triage_summary)
+    add_node("acknowledgement", acknowledgement)
 
     # Phase 1 flow
     clinical_assistant_builder.add_edge(START, "ask_patient_info")
@@ -35,7 +58,7 @@ def build_clinical_assistant_graph(checkpointer):
     clinical_assistant_builder.add_edge("human_patient_info_node", "extract_patient_info")
 
     # Conditional edge: Phase 1 → Phase 2 or loop
-    clinical_assistant_builder.add_conditional_edges(
+    add_conditional_edges(
         "extract_patient_info",
         route_after_patient_info,
         {
@@ -44,43 +67,80 @@ def build_clinical_assistant_graph(checkpointer):
         }
     )
 
+    # Patient replies in Phases 2 and 3 are screened for red flags, which skip straight to triage
+    def add_reply_edges(human_node, next_node):
+        add_conditional_edges(
+            human_node,
+            route_red_flags(next_node),
+            {next_node: next_node, "triage_summary": "triage_summary"}
+        )
+
     # Phase 2 flow
     clinical_assistant_builder.add_edge("ask_symptoms", "human_symptoms_node")
-    clinical_assistant_builder.add_edge("human_symptoms_node", "extract_symptoms")
-
-    # Conditional edge: Phase 2 → Phase 3 or loop
-    clinical_assistant_builder.add_conditional_edges(
-        "extract_symptoms",
-        route_after_symptoms,
-        {
-            "ask_symptoms": "ask_symptoms",  # Loop back if incomplete
-            "ask_medhist": "ask_medhist"                         # End when complete (or Phase 3 later)
-        }
-    )
+    if fused_turns:
+        add_reply_edges("human_symptoms_node", "symptoms_turn")
+
+        # Conditional edge: Phase 2 → Phase 3, or wait for the answer to the fused-turn question
+        add_conditional_edges(
+            "symptoms_turn",
+            route_after_symptoms_turn,
+            {
+                "human_symptoms_node": "human_symptoms_node",  # Question already asked
+                "ask_symptoms": "ask_symptoms",                # No question produced, ask explicitly
+                "ask_medhist": "ask_medhist"
+            }
+        )
+    else:
+        add_reply_edges("human_symptoms_node", "extract_symptoms")
+
+        # Conditional edge: Phase 2 → Phase 3 or loop
+        add_conditional_edges(
+            "extract_symptoms",
+            route_after_symptoms,
+            {
+                "ask_symptoms": "ask_symptoms",  # Loop back if incomplete
+                "ask_medhist": "ask_medhist"                         # End when complete (or Phase 3 later)
+            }
+        )
 
     # Phase 3 flow
     clinical_assistant_builder.add_edge("ask_medhist", "human_medhist_node")
-    clinical_assistant_builder.add_edge("human_medhist_node", "extract_medhist")
+    if fused_turns:
+        add_reply_edges("human_medhist_node", "medhist_turn")
+
+        # Conditional edge: Phase 3 → triage, or wait for the answer to the fused-turn question
+        add_conditional_edges(
+            "medhist_turn",
+            route_after_medhist_turn,
+            {
+                "human_medhist_node": "human_medhist_node",  # Question already asked
+                "ask_medhist": "ask_medhist",                # No question produced, ask explicitly
+                "triage_summary": "triage_summary"
+            }
+        )
+    else:
+        add_reply_edges("human_medhist_node", "extract_medhist")
+
+        # Conditional edge: Phase 3 → END or loop
+        add_conditional_edges(
+            "extract_medhist",
+            route_after_med_history,
+            {
+                "ask_medhist": "ask_medhist",  # Loop back if incomplete
+                "triage_summary": "triage_summary"                         # End when complete (or Phase 3 later)
+            }
+        )
 
     # Phase 4 flow
     clinical_assistant_builder.add_edge("triage_summary", "acknowledgement")
     clinical_assistant_builder.add_edge("acknowledgement", END)
 
-    # Conditional edge: Phase 3 → END or loop
-    clinical_assistant_builder.add_conditional_edges(
-        "extract_medhist",
-        route_after_med_history,
-        {
-            "ask_medhist": "ask_medhist",  # Loop back if incomplete
-            "triage_summary": "triage_summary"                         # End when complete (or Phase 3 later)
-        }
-    )
-
     # checkpointer = InMemorySaver()
 
+    # Every node run, LLM call and checkpoint read/write is recorded (see instrumentation.py and usage.py)
     return clinical_assistant_builder.compile(
-        checkpointer=checkpointer,
-    )
+        checkpointer=TimedCheckpointer(checkpointer) if checkpointer is not None else None,
+    ).with_config(callbacks=[GraphMetricsHandler(PHASE_BY_NODE), UsageHandler()])
 
 def thread_config(thread_id: str):
     return {"configurable": {"thread_id": thread_id}}
\ No newline at end of file
@@ -0,0 +1,96 @@
+import os
+from langchain_core.messages import SystemMessage, HumanMessage
+from langchain_core.messages.utils import count_tokens_approximately
+from langgraph.constants import TAG_NOSTREAM
+from models import AgentState
+from prompts import CONVERSATION_SUMMARY_PROMPT
+from llm_orchestration.llm import llm
+
+from dotenv import load_dotenv
+load_dotenv()
+
+# Per-node transcript policy: (token budget, whether dropped turns are covered by the rolling summary).
+# A budget of None sends the whole transcript. Nodes with use_summary=False already get the
+# extracted structured fields in their context, which stand in for the dropped turns.
+CONTEXT_POLICIES = {
+    "ask_patient_info": (1000, False),
+    "extract_patient_info": (600, False),
+    "ask_symptoms": (2000, True),
+    "extract_symptoms": (600, False),
+    "check_symptom_sufficiency": (2000, True),
+    "symptoms_turn": (2000, True),
+    "extract_medhist": (600, False),
+    "check_medhist_sufficiency": (1500, True),
+    "medhist_turn": (1500, True),
+    "triage_summary": (None, False),
+    "acknowledgement": (500, False),
+}
+
+# Turns older than this many tokens are folded into the rolling summary...
+SUMMARY_HORIZON_TOKENS = int(os.getenv("CONTEXT_SUMMARY_HORIZON_TOKENS", "1500"))
+# ...but only once at least this many tokens have piled up, so the summary call is amortized
+SUMMARY_MIN_TOKENS = int(os.getenv("CONTEXT_SUMMARY_MIN_TOKENS", "500"))
+
+def token_budget(node: str):
+    """Transcript token budget for a node; CONTEXT_TOKEN_BUDGET_<NODE> overrides the default."""
+    override = os.getenv(f"CONTEXT_TOKEN_BUDGET_{node.upper()}")
+    if override is not None:
+        return None if override.lower() in ("", "none", "full") else int(override)
+    return CONTEXT_POLICIES.get(node, (None, False))[0]
+
+def window_start(messages: list, budget) -> int:
+    """Index of the oldest message that fits in the budget, counting back from the newest."""
+    if budget is None:
+        return 0
+    used = 0
+    start = len(messages)
+    while start > 0:
+        cost = count_tokens_approximately([messages[start - 1]])
+        # Always keep the latest message, even if it alone exceeds the budget
+        if used + cost > budget and start < len(messages):
+            break
+        used += cost
+        start -= 1
+    return start
+
+def select_context(state: AgentState, node: str) -> tuple[list, str]:
+    """Return the transcript window for a node and a note covering the turns left out."""
+    messages = state.get("messages", [])
+    _, use_summary = CONTEXT_POLICIES.get(node, (None, False))
+    start = window_start(messages, token_budget(node))
+
+    if not use_summary:
+        return messages[start:], ""
+
+    # Never drop turns that the rolling summary does not cover yet
+    start = min(start, state.get("summarized_upto") or 0)
+    summary = state.get("conversation_summary")
+    note = f"Summary of earlier conversation: {summary}" if start > 0 and summary else ""
+    return messages[start:], note
+
+async def update_rolling_summary(state: AgentState) -> dict:
+    """Fold turns beyond the summary horizon into `conversation_summary`.
+
+    Returns state updates (empty when there is nothing worth summarizing yet).
+    """
+    messages = state.get("messages", [])
+    summarized_upto = state.get("summarized_upto") or 0
+    horizon = window_start(messages, SUMMARY_HORIZON_TOKENS)
+    pending = messages[summarized_upto:horizon]
+    if not pending or count_tokens_approximately(pending) < SUMMARY_MIN_TOKENS:
+        return {}
+
+    print("Compacting transcript")
+    transcript = "\n".join(
+        f"{'Patient' if isinstance(m, HumanMessage) else 'Assistant'}: {m.content}" for m in pending
+    )
+    msgs = [
+        SystemMessage(content=CONVERSATION_SUMMARY_PROMPT),
+        HumanMessage(content=(
+            f"Existing summary: {state.get('conversation_summary') or 'none'}\n\n"
+            f"New conversation turns:\n{transcript}"
+        )),
+    ]
+    # Runs inside patient-facing ask nodes; keep the summary out of the streamed reply
+    resp = await llm.ainvoke(msgs, {"tags": [TAG_NOSTREAM]})
+    return {"conversation_summary": resp.content, "summarized_upto": horizon}
@@ -0,0 +1,104 @@
+import re
+from typing import Optional
+from models import PatientInfoPartial
+
+# Rule-based fast path for Phase 1 replies such as "John Tan, 45, male".
+# It only answers when every part of the reply is accounted for; anything else
+# returns None so extract_patient_info falls back to the LLM. A name is only taken
+# after an explicit cue ("my name is ...") or as part of a full name/age/sex reply:
+# merge_patient_info never overwrites a name, so a wrong guess would stick.
+
+SEX_LEXICON = {
+    "m": "M", "male": "M", "man": "M", "boy": "M", "guy": "M", "gentleman": "M",
+    "f": "F", "female": "F", "woman": "F", "girl": "F", "lady": "F",
+}
+
+# Words that never appear in a name; a segment containing one is not a bare name
+NON_NAME_WORDS = {
+    "hi", "hello", "hey", "yes", "no", "ok", "okay", "sure", "not", "don't", "dont", "unknown",
+    "thanks", "thank", "you", "please", "sorry", "what", "why", "how", "who", "the", "a", "an",
+    "is", "am", "are", "my", "me", "i", "old", "years", "year", "age", "sex", "gender", "name",
+    "and", "or", "but", "here", "there", "good", "fine", "well", "morning", "afternoon", "evening",
+    "pain", "sick", "fever", "cough", "headache", "help",
+} | set(SEX_LEXICON)
+
+NAME_CUE = re.compile(r"^(?:hi,?\s+|hello,?\s+)?(?:my\s+name\s+is|my\s+name's|name\s+is|name\s*:)\s*")
+SELF_CUE = re.compile(r"^(?:i\s+am|i'm|im)\s+(?:an?\s+)?")
+AGE_CUE = re.compile(r"^(?:age\s*(?:is|:)?|aged)\s*")
+SEX_CUE = re.compile(r"^(?:sex|gender)\s*(?:is|:)?\s*")
+
+AGE = re.compile(r"^(\d{1,3})\s*(?:years?\s*old|years?|yrs?\s*old|yrs?|y/?o|y\.o\.?)?$")
+AGE_SEX = re.compile(r"^(\d{1,3})\s*(?:years?\s*old|yrs?\s*old|y/?o)?\s*(m|f|male|female)$")
+SEX_AGE = re.compile(r"^(m|f|male|female)\s*,?\s*(\d{1,3})$")
+NAME_WORD = re.compile(r"^[a-z][a-z'\-]*$")
+
+SEGMENT_SPLIT = re.compile(r"\s*(?:[,;/\n]|\s-\s|\.\s|\band\b)\s*")
+
+fast_path_stats = {"hits": 0, "fallbacks": 0}
+
+def _valid_age(value: str) -> Optional[int]:
+    age = int(value)
+    return age if 0 <= age <= 120 else None
+
+def _parse_name(segment: str, original: str, cued: bool) -> Optional[str]:
+    words = segment.split()
+    if not 1 <= len(words) <= 4:
+        return None
+    if not all(NAME_WORD.match(w) and w not in NON_NAME_WORDS for w in words):
+        return None
+    # Without an explicit cue, only trust names the patient capitalized
+    if not cued and not all(w[0].isupper() for w in original.split()):
+        return None
+    return " ".join(w.capitalize() for w in words)
+
+def _classify(segment: str, original: str, fields: dict) -> bool:
+    """Assign one reply segment to a field; False if it cannot be classified confidently."""
+    found = {}
+    # "I am Diabetic" or "call me maybe" must not become a name; "I'm 45" is still an age
+    match = NAME_CUE.match(segment)
+    name_cued = match is not None
+    self_cued = False
+    if match is None:
+        self_cued = SELF_CUE.match(segment) is not None
+        match = SELF_CUE.match(segment) or AGE_CUE.match(segment) or SEX_CUE.match(segment)
+    if match:
+        original = original[match.end():]
+        segment = segment[match.end():]
+
+    if m := AGE_SEX.match(segment):
+        found = {"age": _valid_age(m.group(1)), "sex": SEX_LEXICON[m.group(2)]}
+    elif m := SEX_AGE.match(segment):
+        found = {"sex": SEX_LEXICON[m.group(1)], "age": _valid_age(m.group(2))}
+    elif m := AGE.match(segment):
+        found = {"age": _valid_age(m.group(1))}
+    elif segment in SEX_LEXICON:
+        found = {"sex": SEX_LEXICON[segment]}
+    elif not self_cued and (name := _parse_name(segment, original, name_cued)):
+        found = {"name": name}
+        if name_cued:
+            fields["name_cued"] = True
+
+    if not found or any(v is None for v in found.values()):
+        return False
+    for key, value in found.items():
+        if key in fields and fields[key] != value:
+            return False  # Conflicting values, e.g. two different ages
+        fields[key] = value
+    return True
+
+def parse_patient_info(text: str) -> Optional[PatientInfoPartial]:
+    """Parse name/age/sex from a patient reply, or return None if the reply is ambiguous."""
+    original_segments = [s for s in SEGMENT_SPLIT.split(text.strip().rstrip(".!")) if s]
+    if not original_segments or len(original_segments) > 4:
+        return None
+
+    fields = {}
+    for original in original_segments:
+        if not _classify(original.lower(), original, fields):
+            return None
+    if not fields:
+        return None
+    # An uncued name is only trusted alongside age and sex ("John Tan, 45, male")
+    if "name" in fields and not fields.get("name_cued") and not ("age" in fields and "sex" in fields):
+        return None
+    return PatientInfoPartial(name=fields.get("name"), age=fields.get("age"), sex=fields.get("sex"))
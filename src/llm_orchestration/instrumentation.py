@@ -0,0 +1,211 @@
+import os
+import time
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.exceptions import OutputParserException
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.errors import GraphInterrupt
+from prometheus_client import Counter, Gauge, Histogram
+from pydantic import ValidationError
+
+from dotenv import load_dotenv
+load_dotenv()
+
+# OpenTelemetry is optional: spans are only emitted when the API is installed and
+# OTEL_TRACING_ENABLED=true (export is configured by the usual OTEL_* SDK settings).
+try:
+    from opentelemetry import trace
+except ImportError:
+    trace = None
+
+TRACING_ENABLED = trace is not None and os.getenv("OTEL_TRACING_ENABLED", "false").lower() == "true"
+tracer = trace.get_tracer("clinicassist") if TRACING_ENABLED else None
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30, 60)
+
+NODE_DURATION = Histogram(
+    "clinicassist_node_duration_seconds", "Wall time of graph node runs", ["node", "phase"], buckets=LATENCY_BUCKETS
+)
+NODE_RUNS = Counter(
+    "clinicassist_node_runs_total", "Graph node runs by outcome (ok, interrupt, error)", ["node", "phase", "outcome"]
+)
+LLM_DURATION = Histogram(
+    "clinicassist_llm_duration_seconds", "Latency of chat model calls", ["node", "phase"], buckets=LATENCY_BUCKETS
+)
+LLM_CALLS = Counter("clinicassist_llm_calls_total", "Chat model calls", ["node", "phase"])
+LLM_ERRORS = Counter("clinicassist_llm_errors_total", "Chat model calls that raised", ["node", "phase"])
+LLM_TOKENS = Counter("clinicassist_llm_tokens_total", "Tokens by kind (prompt, completion)", ["node", "phase", "kind"])
+STRUCTURED_OUTPUT_FAILURES = Counter(
+    "clinicassist_structured_output_failures_total",
+    "Structured LLM outputs that failed to parse or validate, including fast-tier outputs retried on the strong tier",
+    ["node", "phase"],
+)
+LLM_FALLBACKS = Counter(
+    "clinicassist_llm_fallbacks_total",
+    "Fast-tier structured calls repeated on the strong tier, by reason (invalid_output, low_confidence)",
+    ["node", "reason"],
+)
+LLM_QUEUE_DEPTH = Gauge("clinicassist_llm_queue_depth", "Chat model calls waiting for admission", ["priority"])
+LLM_IN_FLIGHT = Gauge("clinicassist_llm_in_flight", "Chat model calls admitted and running")
+LLM_QUEUE_WAIT = Histogram(
+    "clinicassist_llm_queue_wait_seconds", "Time chat model calls waited for admission", ["priority"],
+    buckets=LATENCY_BUCKETS,
+)
+LLM_REJECTIONS = Counter("clinicassist_llm_rejections_total", "Requests turned away because the LLM queue was full")
+LLM_RETRIES = Counter("clinicassist_llm_retries_total", "Chat model calls retried after a transient error", ["node"])
+LLM_HEDGES = Counter(
+    "clinicassist_llm_hedges_total", "Hedged duplicate requests by outcome (won, lost)", ["node", "outcome"]
+)
+LLM_DEADLINE_MISSES = Counter(
+    "clinicassist_llm_deadline_misses_total", "Chat model calls abandoned at their node's deadline", ["node"]
+)
+CHECKPOINT_DURATION = Histogram(
+    "clinicassist_checkpoint_duration_seconds", "Checkpointer read/write latency", ["operation"]
+)
+
+
+class GraphMetricsHandler(BaseCallbackHandler):
+    """Records node and LLM metrics (and optional spans) from a graph run's callbacks.
+
+    Node runs are the chain runs named after their own `langgraph_node`; LLM calls are
+    attributed to the node whose metadata they inherit.
+    """
+
+    run_inline = True
+
+    def __init__(self, phase_by_node: dict):
+        self.phase_by_node = phase_by_node
+        self._nodes = {}
+        self._llm_calls = {}
+        # Open node spans by task namespace, so LLM spans nest under their node
+        self._node_spans = {}
+
+    def _labels(self, metadata) -> tuple:
+        node = (metadata or {}).get("langgraph_node", "unknown")
+        return node, self.phase_by_node.get(node, "Unknown")
+
+    def on_chain_start(self, serialized, inputs, *, run_id, metadata=None, **kwargs):
+        node, phase = self._labels(metadata)
+        if kwargs.get("name") != node:
+            return
+        span = None
+        task_ns = (metadata or {}).get("langgraph_checkpoint_ns")
+        if tracer is not None:
+            span = tracer.start_span(f"node {node}", attributes={"graph.node": node, "graph.phase": phase})
+            self._node_spans[task_ns] = span
+        self._nodes[run_id] = (node, phase, task_ns, span, time.perf_counter())
+
+    def _end_node(self, run_id, outcome: str, error=None):
+        entry = self._nodes.pop(run_id, None)
+        if entry is None:
+            return
+        node, phase, task_ns, span, started_at = entry
+        NODE_DURATION.labels(node, phase).observe(time.perf_counter() - started_at)
+        NODE_RUNS.labels(node, phase, outcome).inc()
+        if isinstance(error, (OutputParserException, ValidationError)):
+            STRUCTURED_OUTPUT_FAILURES.labels(node, phase).inc()
+        if span is not None:
+            self._node_spans.pop(task_ns, None)
+            if outcome == "error":
+                span.record_exception(error)
+                span.set_status(trace.Status(trace.StatusCode.ERROR))
+            span.end()
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._end_node(run_id, "ok")
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._end_node(run_id, "interrupt" if isinstance(error, GraphInterrupt) else "error", error)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, metadata=None, **kwargs):
+        node, phase = self._labels(metadata)
+        span = None
+        if tracer is not None:
+            parent = self._node_spans.get((metadata or {}).get("langgraph_checkpoint_ns"))
+            context = trace.set_span_in_context(parent) if parent is not None else None
+            span = tracer.start_span("llm.call", context=context, attributes={"graph.node": node})
+        self._llm_calls[run_id] = (node, phase, span, time.perf_counter())
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        entry = self._llm_calls.pop(run_id, None)
+        if entry is None:
+            return
+        node, phase, span, started_at = entry
+        LLM_DURATION.labels(node, phase).observe(time.perf_counter() - started_at)
+        LLM_CALLS.labels(node, phase).inc()
+        usage = {}
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or usage
+        LLM_TOKENS.labels(node, phase, "prompt").inc(usage.get("input_tokens", 0))
+        LLM_TOKENS.labels(node, phase, "completion").inc(usage.get("output_tokens", 0))
+        if span is not None:
+            span.set_attribute("llm.prompt_tokens", usage.get("input_tokens", 0))
+            span.set_attribute("llm.completion_tokens", usage.get("output_tokens", 0))
+            span.end()
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        entry = self._llm_calls.pop(run_id, None)
+        if entry is None:
+            return
+        node, phase, span, started_at = entry
+        LLM_DURATION.labels(node, phase).observe(time.perf_counter() - started_at)
+        LLM_CALLS.labels(node, phase).inc()
+        LLM_ERRORS.labels(node, phase).inc()
+        if span is not None:
+            span.record_exception(error)
+            span.set_status(trace.Status(trace.StatusCode.ERROR))
+            span.end()
+
+
+class TimedCheckpointer(BaseCheckpointSaver):
+    """Wraps any checkpointer and records read/write latency per operation."""
+
+    def __init__(self, inner: BaseCheckpointSaver):
+        super().__init__(serde=inner.serde)
+        self.inner = inner
+
+    @property
+    def config_specs(self):
+        return self.inner.config_specs
+
+    def get_next_version(self, current, channel):
+        return self.inner.get_next_version(current, channel)
+
+    async def aget_tuple(self, config):
+        with CHECKPOINT_DURATION.labels("get").time():
+            return await self.inner.aget_tuple(config)
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        with CHECKPOINT_DURATION.labels("put").time():
+            return await self.inner.aput(config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config, writes, task_id, task_path=""):
+        with CHECKPOINT_DURATION.labels("put_writes").time():
+            return await self.inner.aput_writes(config, writes, task_id, task_path)
+
+    async def alist(self, config, *, filter=None, before=None, limit=None):
+        async for item in self.inner.alist(config, filter=filter, before=before, limit=limit):
+            yield item
+
+    async def adelete_thread(self, thread_id):
+        with CHECKPOINT_DURATION.labels("delete").time():
+            return await self.inner.adelete_thread(thread_id)
+
+    def get_tuple(self, config):
+        with CHECKPOINT_DURATION.labels("get").time():
+            return self.inner.get_tuple(config)
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        with CHECKPOINT_DURATION.labels("put").time():
+            return self.inner.put(config, checkpoint, metadata, new_versions)
+
+    def put_writes(self, config, writes, task_id, task_path=""):
+        with CHECKPOINT_DURATION.labels("put_writes").time():
+            return self.inner.put_writes(config, writes, task_id, task_path)
+
+    def list(self, config, *, filter=None, before=None, limit=None):
+        return self.inner.list(config, filter=filter, before=before, limit=limit)
+
+    def delete_thread(self, thread_id):
+        with CHECKPOINT_DURATION.labels("delete").time():
+            return self.inner.delete_thread(thread_id)
@@ -1,5 +1,69 @@
-from langchain.chat_models import init_chat_model
+import functools
+from llm_orchestration.prompt_cache import prompt_cache_stats
+from llm_orchestration.llm_cache import CachedRunnable, ResponseCache, create_response_cache
+from llm_orchestration.model_tiers import MODEL_BY_TIER, TieredRunnable
+from llm_orchestration.admission import AdmittedRunnable, llm_scheduler
+from llm_orchestration.resilience import ResilientRunnable
 from dotenv import load_dotenv
 load_dotenv()
 
-llm = init_chat_model(model="gpt-4.1", temperature=0)
\ No newline at end of file
+MODEL = MODEL_BY_TIER["strong"]
+
+response_cache = create_response_cache()
+
+def build_llm(models: dict, cache: ResponseCache = response_cache) -> TieredRunnable:
+    """models maps each tier to (chat model, model name); every tier goes through the response cache,
+    and cache misses through the resilience layer (deadline, retries, hedging) and the LLM scheduler.
+
+    The benchmark builds its fake models through here too, so it measures the production stack.
+    """
+    return TieredRunnable({
+        tier: CachedRunnable(ResilientRunnable(AdmittedRunnable(model, llm_scheduler)), cache, name)
+        for tier, (model, name) in models.items()
+    })
+
+@functools.cache
+def get_llm() -> TieredRunnable:
+    """The one factory for the chat model clients, built on first use.
+
+    Importing the provider SDKs is most of the service's import time, so it happens here
+    rather than when the graph modules are imported.
+    """
+    from langchain.chat_models import init_chat_model
+    return build_llm({
+        # Retries are handled by ResilientRunnable, within each node's deadline
+        tier: (init_chat_model(model=name, temperature=0, max_retries=0, callbacks=[prompt_cache_stats]), name)
+        for tier, name in MODEL_BY_TIER.items()
+    })
+
+def llm_ready() -> bool:
+    return get_llm.cache_info().currsize > 0
+
+
+class LazyLLM:
+    """Stands in for a client until its first call; structured variants stay lazy too."""
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._runnable = None
+
+    def resolve(self):
+        if self._runnable is None:
+            self._runnable = self._factory()
+        return self._runnable
+
+    async def ainvoke(self, messages, config=None, **kwargs):
+        return await self.resolve().ainvoke(messages, config, **kwargs)
+
+    def invoke(self, messages, config=None, **kwargs):
+        return self.resolve().invoke(messages, config, **kwargs)
+
+    def with_structured_output(self, schema, **kwargs):
+        return LazyLLM(lambda: self.resolve().with_structured_output(schema, **kwargs))
+
+    def __getattr__(self, name):
+        return getattr(self.resolve(), name)
+
+# Every node goes through the cache and picks its model tier per call (see model_tiers.py);
+# `llm.with_structured_output(...)` returns a tiered, cached runnable too
+llm = LazyLLM(get_llm)
@@ -0,0 +1,230 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import time
+from collections import OrderedDict, defaultdict
+from threading import Lock
+from typing import Optional
+from langchain_core.messages import messages_from_dict, message_to_dict
+
+from dotenv import load_dotenv
+load_dotenv()
+
+# The trailing context message carries a per-second timestamp (see prompts.CONTEXT_PROMPT);
+# it must not be part of the key or identical prompts would never hit.
+VOLATILE_LINES = re.compile(r"^The time now is .*$", re.M)
+
+def current_node() -> str:
+    """Name of the graph node making the call, or "unknown" outside a graph run."""
+    try:
+        from langgraph.config import get_config
+        return get_config().get("metadata", {}).get("langgraph_node", "unknown")
+    except RuntimeError:
+        return "unknown"
+
+def normalize_messages(messages) -> list:
+    normalized = []
+    for m in messages:
+        content = m.content if isinstance(m.content, str) else json.dumps(m.content, sort_keys=True)
+        content = VOLATILE_LINES.sub("", content)
+        normalized.append((m.type, " ".join(content.split())))
+    return normalized
+
+def cache_key(model: str, schema: Optional[str], messages) -> str:
+    payload = json.dumps({"model": model, "schema": schema, "messages": normalize_messages(messages)})
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class LRUCacheBackend:
+    """In-memory LRU with TTL, bounded by entry count."""
+
+    def __init__(self, max_entries: int = 1000, ttl: float = 3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, created_at = entry
+            if self.ttl and time.time() - created_at > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str):
+        with self._lock:
+            self._entries[key] = (value, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteCacheBackend:
+    """On-disk cache with TTL, bounded by entry count (least recently used evicted first)."""
+
+    def __init__(self, path: str, max_entries: int = 10000, ttl: float = 86400):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS llm_cache_accessed_at ON llm_cache (accessed_at)")
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, created_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            value, created_at = row
+            if self.ttl and now - created_at > self.ttl:
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute("UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            return value
+
+    def set(self, key: str, value: str):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, value, now, now),
+            )
+            if self.ttl:
+                self._conn.execute("DELETE FROM llm_cache WHERE created_at < ?", (now - self.ttl,))
+            self._conn.execute(
+                "DELETE FROM llm_cache WHERE key IN ("
+                "SELECT key FROM llm_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+
+
+class ResponseCache:
+    """Response cache shared by every node, with per-node hit/miss stats and opt-out."""
+
+    def __init__(self, backend, disabled_nodes=()):
+        self.backend = backend
+        self.disabled_nodes = set(disabled_nodes)
+        self._stats = defaultdict(lambda: {"hits": 0, "misses": 0})
+
+    def enabled_for(self, node: str) -> bool:
+        return self.backend is not None and node not in self.disabled_nodes
+
+    def get(self, node: str, key: str) -> Optional[str]:
+        value = self.backend.get(key)
+        self._stats[node]["hits" if value is not None else "misses"] += 1
+        return value
+
+    def set(self, key: str, value: str):
+        self.backend.set(key, value)
+
+    def snapshot(self) -> dict:
+        nodes = {node: dict(stats) for node, stats in self._stats.items()}
+        for stats in nodes.values():
+            total = stats["hits"] + stats["misses"]
+            stats["hit_ratio"] = stats["hits"] / total if total else 0.0
+        return {
+            "backend": type(self.backend).__name__ if self.backend is not None else None,
+            "entries": len(self.backend) if self.backend is not None else 0,
+            "disabled_nodes": sorted(self.disabled_nodes),
+            "nodes": nodes,
+        }
+
+
+def create_response_cache() -> ResponseCache:
+    """Build the cache from LLM_CACHE_* environment settings."""
+    kind = os.getenv("LLM_CACHE_BACKEND", "memory").lower()
+    ttl = float(os.getenv("LLM_CACHE_TTL", "3600"))
+    max_entries = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1000"))
+    disabled = [n.strip() for n in os.getenv("LLM_CACHE_DISABLED_NODES", "").split(",") if n.strip()]
+
+    if kind == "sqlite":
+        backend = SQLiteCacheBackend(os.getenv("LLM_CACHE_PATH", "llm_cache.sqlite"), max_entries, ttl)
+    elif kind == "memory":
+        backend = LRUCacheBackend(max_entries, ttl)
+    else:
+        backend = None
+    return ResponseCache(backend, disabled)
+
+
+class CachedRunnable:
+    """Wraps a chat model or a `with_structured_output` runnable with the response cache."""
+
+    def __init__(self, runnable, cache: ResponseCache, model_name: str, schema=None):
+        self.runnable = runnable
+        self.cache = cache
+        self.model_name = model_name
+        self.schema = schema
+        self.schema_key = (
+            hashlib.sha256(json.dumps(schema.model_json_schema(), sort_keys=True).encode()).hexdigest()
+            if schema is not None else None
+        )
+
+    def _dump(self, result) -> str:
+        if self.schema is not None:
+            return result.model_dump_json()
+        data = message_to_dict(result)
+        data["data"]["id"] = None
+        return json.dumps(data)
+
+    def _load(self, value: str):
+        if self.schema is not None:
+            return self.schema.model_validate_json(value)
+        # Fresh message without an id, so add_messages treats it as a new message
+        return messages_from_dict([json.loads(value)])[0]
+
+    async def ainvoke(self, messages, config=None, **kwargs):
+        node = current_node()
+        if not self.cache.enabled_for(node):
+            return await self.runnable.ainvoke(messages, config, **kwargs)
+
+        key = cache_key(self.model_name, self.schema_key, messages)
+        cached = self.cache.get(node, key)
+        if cached is not None:
+            return self._load(cached)
+
+        result = await self.runnable.ainvoke(messages, config, **kwargs)
+        self.cache.set(key, self._dump(result))
+        return result
+
+    def invoke(self, messages, config=None, **kwargs):
+        node = current_node()
+        if not self.cache.enabled_for(node):
+            return self.runnable.invoke(messages, config, **kwargs)
+
+        key = cache_key(self.model_name, self.schema_key, messages)
+        cached = self.cache.get(node, key)
+        if cached is not None:
+            return self._load(cached)
+
+        result = self.runnable.invoke(messages, config, **kwargs)
+        self.cache.set(key, self._dump(result))
+        return result
+
+    def with_structured_output(self, schema, **kwargs):
+        return CachedRunnable(self.runnable.with_structured_output(schema, **kwargs), self.cache, self.model_name, schema)
+
+    def __getattr__(self, name):
+        return getattr(self.runnable, name)
@@ -0,0 +1,137 @@
+import os
+from collections import defaultdict
+from langchain_core.exceptions import OutputParserException
+from pydantic import ValidationError
+
+from llm_orchestration.llm_cache import current_node
+from models import PHASE_BY_NODE
+from llm_orchestration.instrumentation import LLM_FALLBACKS, STRUCTURED_OUTPUT_FAILURES
+
+from dotenv import load_dotenv
+load_dotenv()
+
+# Model per tier. Nodes run on the fast tier unless mapped otherwise; calls made outside a
+# graph node (e.g. bulk re-triage) use the strong tier.
+MODEL_BY_TIER = {
+    "fast": os.getenv("LLM_MODEL_FAST", "gpt-4.1-mini"),
+    "strong": os.getenv("LLM_MODEL_STRONG", "gpt-4.1"),
+}
+DEFAULT_TIER = "fast"
+NODE_TIERS = {
+    "triage_summary": "strong",
+}
+
+# Structured outputs carrying a `confidence` below this are re-asked on the strong tier
+MIN_CONFIDENCE = float(os.getenv("LLM_FALLBACK_MIN_CONFIDENCE", "0.6"))
+
+def tiering_enabled() -> bool:
+    return os.getenv("LLM_TIERING", "true").lower() == "true"
+
+def tier_for(node: str) -> str:
+    """Tier a node's calls run on; LLM_TIER_<NODE>=fast|strong overrides the default.
+
+    With LLM_TIERING=false every call uses the strong tier.
+    """
+    if not tiering_enabled() or node == "unknown":
+        return "strong"
+    override = os.getenv(f"LLM_TIER_{node.upper()}")
+    if override in MODEL_BY_TIER:
+        return override
+    return NODE_TIERS.get(node, DEFAULT_TIER)
+
+def model_for(node: str) -> str:
+    return MODEL_BY_TIER[tier_for(node)]
+
+
+class TierStats:
+    """Calls per node and tier, and fast-tier fallbacks by reason."""
+
+    def __init__(self):
+        self._nodes = defaultdict(lambda: {"calls": defaultdict(int), "fallbacks": defaultdict(int)})
+
+    def call(self, node: str, tier: str):
+        self._nodes[node]["calls"][tier] += 1
+
+    def fallback(self, node: str, reason: str):
+        self._nodes[node]["fallbacks"][reason] += 1
+        LLM_FALLBACKS.labels(node, reason).inc()
+        if reason == "invalid_output":
+            # The strong-tier retry absorbs the error, so the node run never sees it
+            STRUCTURED_OUTPUT_FAILURES.labels(node, PHASE_BY_NODE.get(node, "Unknown")).inc()
+
+    def snapshot(self) -> dict:
+        nodes = {}
+        for node, stats in self._nodes.items():
+            fast_calls = stats["calls"].get("fast", 0)
+            fallbacks = sum(stats["fallbacks"].values())
+            nodes[node] = {
+                "tier": tier_for(node),
+                "calls": dict(stats["calls"]),
+                "fallbacks": dict(stats["fallbacks"]),
+                "fallback_rate": fallbacks / fast_calls if fast_calls else 0.0,
+            }
+        return {"tiering": tiering_enabled(), "models": MODEL_BY_TIER, "min_confidence": MIN_CONFIDENCE, "nodes": nodes}
+
+tier_stats = TierStats()
+
+
+class TieredRunnable:
+    """Routes each call to the calling node's tier (one cached client per tier).
+
+    A fast-tier structured call whose output fails validation, or reports a `confidence`
+    below MIN_CONFIDENCE, is repeated once on the strong tier.
+    """
+
+    def __init__(self, tiers: dict, structured: bool = False):
+        self.tiers = tiers
+        self.structured = structured
+
+    def for_node(self, node: str):
+        return self.tiers[tier_for(node)]
+
+    def _low_confidence(self, result) -> bool:
+        confidence = getattr(result, "confidence", None)
+        return confidence is not None and confidence < MIN_CONFIDENCE
+
+    async def ainvoke(self, messages, config=None, **kwargs):
+        node = current_node()
+        tier = tier_for(node)
+        tier_stats.call(node, tier)
+        if tier == "strong" or not self.structured:
+            return await self.tiers[tier].ainvoke(messages, config, **kwargs)
+        try:
+            result = await self.tiers[tier].ainvoke(messages, config, **kwargs)
+            if not self._low_confidence(result):
+                return result
+            reason = "low_confidence"
+        except (OutputParserException, ValidationError):
+            reason = "invalid_output"
+        tier_stats.fallback(node, reason)
+        tier_stats.call(node, "strong")
+        return await self.tiers["strong"].ainvoke(messages, config, **kwargs)
+
+    def invoke(self, messages, config=None, **kwargs):
+        node = current_node()
+        tier = tier_for(node)
+        tier_stats.call(node, tier)
+        if tier == "strong" or not self.structured:
+            return self.tiers[tier].invoke(messages, config, **kwargs)
+        try:
+            result = self.tiers[tier].invoke(messages, config, **kwargs)
+            if not self._low_confidence(result):
+                return result
+            reason = "low_confidence"
+        except (OutputParserException, ValidationError):
+            reason = "invalid_output"
+        tier_stats.fallback(node, reason)
+        tier_stats.call(node, "strong")
+        return self.tiers["strong"].invoke(messages, config, **kwargs)
+
+    def with_structured_output(self, schema, **kwargs):
+        return TieredRunnable(
+            {tier: runnable.with_structured_output(schema, **kwargs) for tier, runnable in self.tiers.items()},
+            structured=True,
+        )
+
+    def __getattr__(self, name):
+        return getattr(self.tiers["strong"], name)
@@ -1,16 +1,17 @@
 from models import AgentState, PatientInfoPartial
-from prompts import BASE_PROMPT, PATIENT_INFO_ASKING_PROMPT, PATIENT_INFO_EXTRACTION_PROMPT
-from langchain_core.messages import SystemMessage, HumanMessage
+from prompts import PATIENT_INFO_ASKING_PROMPT, PATIENT_INFO_EXTRACTION_PROMPT, build_prompt
+from langchain_core.messages import HumanMessage
 from langgraph.types import interrupt
 from llm_orchestration.llm import llm
-from utils import get_current_time
+from llm_orchestration.context_manager import select_context
+from llm_orchestration.demographics_parser import parse_patient_info, fast_path_stats
 
 from dotenv import load_dotenv
 load_dotenv()
 
 extract_llm = llm.with_structured_output(PatientInfoPartial)
 
-def ask_patient_info(state: AgentState) -> AgentState: 
+async def ask_patient_info(state: AgentState) -> AgentState: 
     print("Asking patient info")
     missing = []
     if state.get("patient_name") is None: missing.append("name")
@@ -22,38 +23,35 @@ def ask_patient_info(state: AgentState) -> AgentState:
     if state.get("patient_age") is not None: known_bits.append(f"age={state['patient_age']}")
     if state.get("patient_sex") is not None: known_bits.append(f"sex={state['patient_sex']}")
 
-    steering = (
-        "You are collecting basic patient demographic information for triage.\n"
+    context = (
         f"Known so far: {', '.join(known_bits) if known_bits else 'none'}.\n"
-        f"Missing (in order): {', '.join(missing) if missing else 'none'}.\n"
-        "- If anything is missing, ask ONLY for the first missing field with one concise question.\n"
-        "- Keep it friendly and brief."
+        f"Missing (in order): {', '.join(missing) if missing else 'none'}."
     )
 
-    msgs = [
-        SystemMessage(content=BASE_PROMPT),
-        SystemMessage(content=PATIENT_INFO_ASKING_PROMPT.format(current_time=get_current_time())),
-        SystemMessage(content=steering),
-        *state["messages"],
-    ]
-    resp = llm.invoke(msgs)
+    window, _ = select_context(state, "ask_patient_info")
+    msgs = build_prompt(PATIENT_INFO_ASKING_PROMPT, window, context)
+    resp = await llm.ainvoke(msgs)
 
     return {"messages": [resp]}
 
-def extract_patient_info(state: AgentState) -> AgentState:
+async def extract_patient_info(state: AgentState) -> AgentState:
     print("Extracting patient info")
-    messages = state.get("messages", [])
+    # Try the rule-based parser on the latest reply before paying for an LLM call
+    human_msgs = [m for m in state.get("messages", []) if isinstance(m, HumanMessage)]
+    parsed = parse_patient_info(human_msgs[-1].content) if human_msgs else None
+    if parsed is not None:
+        fast_path_stats["hits"] += 1
+        return merge_patient_info(state, parsed)
+    fast_path_stats["fallbacks"] += 1
+
+    messages, _ = select_context(state, "extract_patient_info")
     # human_only = [m for m in state.get("messages", []) if isinstance(m, HumanMessage)]
-    msgs = [
-        SystemMessage(content=BASE_PROMPT),
-        SystemMessage(content=(
-            PATIENT_INFO_EXTRACTION_PROMPT.format(current_time=get_current_time()) +
-            "\nOnly extract info stated by the patient. If not present, leave that field null. Use the right capitalization for names (eg. Jon Ang instead of jon ang)."
-        )),
-        *messages,
-    ]
-    parsed: PatientInfoPartial = extract_llm.invoke(msgs)
+    msgs = build_prompt(PATIENT_INFO_EXTRACTION_PROMPT, messages)
+    parsed: PatientInfoPartial = await extract_llm.ainvoke(msgs)
+    return merge_patient_info(state, parsed)
 
+def merge_patient_info(state: AgentState, parsed: PatientInfoPartial) -> dict:
+    """Fill in demographic fields that are still missing"""
     updates = {}
     if parsed.name is not None and state.get("patient_name") is None:
         updates["patient_name"] = parsed.name.upper()
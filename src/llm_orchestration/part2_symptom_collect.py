@@ -1,27 +1,28 @@
-from models import AgentState, SymptomsPartial, SymptomSufficiencyCheck
-from prompts import BASE_PROMPT, SYMPTOMS_ASKING_PROMPT, SYMPTOMS_EXTRACTION_PROMPT, SYMPTOMS_SUFFICIENCY_CHECK_PROMPT
-from langchain_core.messages import SystemMessage, HumanMessage
+from models import AgentState, SymptomsPartial, SymptomSufficiencyCheck, SymptomsTurn
+from prompts import SYMPTOMS_ASKING_PROMPT, SYMPTOMS_EXTRACTION_PROMPT, SYMPTOMS_SUFFICIENCY_CHECK_PROMPT, SYMPTOMS_TURN_PROMPT, build_prompt
+from langchain_core.messages import HumanMessage, AIMessage
 from langgraph.types import interrupt
-from utils import get_current_time
 from llm_orchestration.llm import llm
+from llm_orchestration.context_manager import select_context, update_rolling_summary
+from llm_orchestration.red_flags import detect_red_flags
+from llm_orchestration.symptom_index import merge_info, merge_terms, symptom_ids
 
 from dotenv import load_dotenv
 load_dotenv()
 
 symptoms_llm = llm.with_structured_output(SymptomsPartial)
 symptom_sufficiency_llm = llm.with_structured_output(SymptomSufficiencyCheck)
+symptoms_turn_llm = llm.with_structured_output(SymptomsTurn)
 
-def ask_symptoms(state: AgentState) -> AgentState:
+async def ask_symptoms(state: AgentState) -> AgentState:
     print("Asking symptoms")
-    msgs = [
-        SystemMessage(content=BASE_PROMPT),
-        SystemMessage(content=SYMPTOMS_ASKING_PROMPT.format(current_time=get_current_time())),
-        *state["messages"],
-    ]
-    resp = llm.invoke(msgs)
-    return {"messages": [resp]}
+    summary_updates = await update_rolling_summary(state)
+    window, summary_note = select_context({**state, **summary_updates}, "ask_symptoms")
+    msgs = build_prompt(SYMPTOMS_ASKING_PROMPT, window, summary_note)
+    resp = await llm.ainvoke(msgs)
+    return {"messages": [resp], **summary_updates}
 
-def extract_symptoms(state: AgentState) -> AgentState:
+async def extract_symptoms(state: AgentState) -> AgentState:
     print("Extracting symptoms")
     # Get current state to pass as context
     extracted_symptoms = {
@@ -31,40 +32,34 @@ def extract_symptoms(state: AgentState) -> AgentState:
         "additional_symptom_info": state.get("additional_symptom_info") or []
     }
     
-    # Get ALL messages for context
-    all_messages = state.get("messages", [])
-    
-    # Get only RECENT messages (e.g., last 2 messages)
+    # Get only RECENT messages within the node's token budget
     # This prevents re-extracting old info while maintaining context
-    recent_messages = all_messages[-4:] if len(all_messages) > 1 else all_messages
+    recent_messages, _ = select_context(state, "extract_symptoms")
+    
+    msgs = build_prompt(
+        SYMPTOMS_EXTRACTION_PROMPT,
+        recent_messages,
+        f"Extracted information so far: {extracted_symptoms}",
+    )
     
-    msgs = [
-        SystemMessage(content=BASE_PROMPT),
-        SystemMessage(content=(
-            SYMPTOMS_EXTRACTION_PROMPT.format(
-                current_time=get_current_time(), 
-                extracted_symptoms=extracted_symptoms
-            ) +
-            "\nOnly extract NEW info from the patient's most recent message(s). "
-            "Do not re-extract information already in extracted_symptoms above."
-        )),
-        *recent_messages,  # All recent messages
-    ]
+    parsed: SymptomsPartial = await symptoms_llm.ainvoke(msgs)
+    updates = merge_symptoms(state, parsed)
+    
+    print("Extracted symptoms: ", updates)
     
-    parsed: SymptomsPartial = symptoms_llm.invoke(msgs)
+    return updates
+
+def merge_symptoms(state: AgentState, parsed: SymptomsPartial) -> dict:
+    """Merge newly extracted symptom fields into the existing state"""
     updates = {}
     
-    # MAIN SYMPTOMS - merge lists with deduplication
-    if parsed.main_symptoms is not None and len(parsed.main_symptoms) > 0:
-        existing = state.get("main_symptoms") or []
-        # Normalize and deduplicate (case-insensitive)
-        existing_lower = [s.lower() for s in existing]
-        new_symptoms = [
-            s for s in parsed.main_symptoms 
-            if s.lower() not in existing_lower
-        ]
-        if new_symptoms:
-            updates["main_symptoms"] = existing + new_symptoms
+    # MAIN SYMPTOMS - canonicalize and deduplicate by symptom id ("head ache" == "headache")
+    existing_main = state.get("main_symptoms") or []
+    main = existing_main
+    if parsed.main_symptoms:
+        main = merge_terms(existing_main, parsed.main_symptoms)
+        if main != existing_main:
+            updates["main_symptoms"] = main
     
     # ONSET - allow updates (corrections)
     if parsed.symptom_onset is not None:
@@ -72,42 +67,49 @@ def extract_symptoms(state: AgentState) -> AgentState:
         if parsed.symptom_onset not in existing:
             updates["symptom_onset"] = parsed.symptom_onset
     
-    # ASSOCIATED SYMPTOMS - merge with deduplication
-    if parsed.associated_symptoms is not None and len(parsed.associated_symptoms) > 0:
+    # ASSOCIATED SYMPTOMS - same, skipping anything already recorded as a main symptom
+    if parsed.associated_symptoms:
         existing = state.get("associated_symptoms") or []
-        existing_lower = [s.lower() for s in existing]
-        new_associated = [
-            s for s in parsed.associated_symptoms 
-            if s.lower() not in existing_lower
-        ]
-        if new_associated:
-            updates["associated_symptoms"] = existing + new_associated
+        associated = merge_terms(existing, parsed.associated_symptoms, exclude=symptom_ids(main))
+        if associated != existing:
+            updates["associated_symptoms"] = associated
     
-    # ADDITIONAL INFO - append new info (don't deduplicate as details may vary)
-    if parsed.additional_symptom_info is not None and len(parsed.additional_symptom_info) > 0:
+    # ADDITIONAL INFO - fold near-duplicate details together, bounded in size
+    if parsed.additional_symptom_info:
         existing = state.get("additional_symptom_info") or []
-        # For additional info, we append (may have related but different details)
-        updates["additional_symptom_info"] = existing + parsed.additional_symptom_info
-    
-    print("Extracted symptoms: ", updates)
+        info = merge_info(existing, parsed.additional_symptom_info)
+        if info != existing:
+            updates["additional_symptom_info"] = info
     
     return updates
 
-def check_symptom_sufficiency(dict: dict):
-    msgs = [
-        SystemMessage(content=BASE_PROMPT),
-        SystemMessage(content=SYMPTOMS_SUFFICIENCY_CHECK_PROMPT),
-        *dict["messages"],
-    ]
-    resp = symptom_sufficiency_llm.invoke(msgs)
+async def check_symptom_sufficiency(dict: dict):
+    window, summary_note = select_context(dict, "check_symptom_sufficiency")
+    extracted_symptoms = {
+        "main_symptoms": dict.get("main_symptoms") or [],
+        "symptom_onset": dict.get("symptom_onset"),
+        "associated_symptoms": dict.get("associated_symptoms") or [],
+        "additional_symptom_info": dict.get("additional_symptom_info") or []
+    }
+    msgs = build_prompt(
+        SYMPTOMS_SUFFICIENCY_CHECK_PROMPT,
+        window,
+        f"Extracted information so far: {extracted_symptoms}\n{summary_note}",
+    )
+    resp = await symptom_sufficiency_llm.ainvoke(msgs)
     
     return resp
 
 def human_symptoms_node(state: AgentState) -> AgentState:
     user_input = interrupt("Waiting for symptoms")
-    return {"messages": [HumanMessage(content=user_input)]}
+    updates = {"messages": [HumanMessage(content=user_input)]}
+    flags = detect_red_flags(user_input)
+    if flags:
+        print("Red flags detected: ", [f["id"] for f in flags])
+        updates["red_flags"] = (state.get("red_flags") or []) + flags
+    return updates
 
-def route_after_symptoms(state: AgentState) -> str:
+async def route_after_symptoms(state: AgentState) -> str:
     """Check if Phase 2 is complete, route to Phase 3 or loop back"""
     has_main = state.get("main_symptoms") and len(state["main_symptoms"]) > 0
     has_onset = state.get("symptom_onset") is not None
@@ -117,11 +119,52 @@ def route_after_symptoms(state: AgentState) -> str:
         return "ask_symptoms"
     
     # Check LLM sufficiency assessment
-    check = check_symptom_sufficiency(state)
+    check = await check_symptom_sufficiency(state)
     
     if check.is_sufficient:
         # Phase 2 complete → move to ask_medhist 
         return "ask_medhist"
     else:
         # Need more details → loop back
-        return "ask_symptoms"
\ No newline at end of file
+        return "ask_symptoms"
+
+async def symptoms_turn(state: AgentState) -> AgentState:
+    """Fused Phase 2 turn: extract, check sufficiency and ask the next question in one LLM call"""
+    print("Symptoms turn (fused)")
+    summary_updates = await update_rolling_summary(state)
+    window, summary_note = select_context({**state, **summary_updates}, "symptoms_turn")
+    extracted_symptoms = {
+        "main_symptoms": state.get("main_symptoms") or [],
+        "symptom_onset": state.get("symptom_onset"),
+        "associated_symptoms": state.get("associated_symptoms") or [],
+        "additional_symptom_info": state.get("additional_symptom_info") or []
+    }
+
+    msgs = build_prompt(
+        SYMPTOMS_TURN_PROMPT,
+        window,
+        f"Extracted information so far: {extracted_symptoms}\n{summary_note}",
+    )
+
+    parsed: SymptomsTurn = await symptoms_turn_llm.ainvoke(msgs)
+    updates = {**merge_symptoms(state, parsed), **summary_updates}
+    print("Extracted symptoms: ", updates)
+
+    # Core fields are still required regardless of the LLM verdict
+    merged = {**state, **updates}
+    has_main = merged.get("main_symptoms") and len(merged["main_symptoms"]) > 0
+    has_onset = merged.get("symptom_onset") is not None
+    updates["symptoms_sufficient"] = bool(has_main and has_onset and parsed.is_sufficient)
+
+    if not updates["symptoms_sufficient"] and parsed.next_question:
+        updates["messages"] = [AIMessage(content=parsed.next_question)]
+    return updates
+
+def route_after_symptoms_turn(state: AgentState) -> str:
+    """Route on the fused-turn verdict: Phase 3, wait for the patient, or ask explicitly"""
+    if state.get("symptoms_sufficient"):
+        return "ask_medhist"
+    if isinstance(state["messages"][-1], AIMessage):
+        # Next question was generated in the same call
+        return "human_symptoms_node"
+    return "ask_symptoms"
\ No newline at end of file
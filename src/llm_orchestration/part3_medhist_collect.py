@@ -1,83 +1,100 @@
-from models import AgentState, MedHistoryFact, MedHistorySufficiencyCheck
-from prompts import BASE_PROMPT, MEDICAL_HISTORY_EXTRACTION_PROMPT, MEDICAL_HISTORY_ASKING_PROMPT, MEDICAL_HISTORY_SUFFICIENCY_CHECK_PROMPT
-from langchain_core.messages import SystemMessage, HumanMessage
+from models import AgentState, MedHistoryFact, MedHistoryFacts, MedHistorySufficiencyCheck, MedHistoryTurn
+from prompts import MEDICAL_HISTORY_EXTRACTION_PROMPT, MEDICAL_HISTORY_ASKING_PROMPT, MEDICAL_HISTORY_SUFFICIENCY_CHECK_PROMPT, MEDICAL_HISTORY_TURN_PROMPT, build_prompt
+import re
+from langchain_core.messages import HumanMessage, AIMessage
 from typing import List
-from utils import get_current_time
 from langgraph.types import interrupt
 from llm_orchestration.llm import llm
+from llm_orchestration.context_manager import select_context, update_rolling_summary
+from llm_orchestration.red_flags import detect_red_flags
 
 from dotenv import load_dotenv
 load_dotenv()
 
-medhist_llm = llm.with_structured_output(MedHistoryFact)
+medhist_llm = llm.with_structured_output(MedHistoryFacts)
 medhist_sufficiency_llm = llm.with_structured_output(MedHistorySufficiencyCheck)
+medhist_turn_llm = llm.with_structured_output(MedHistoryTurn)
 
 def format_medhist_facts(facts: List[MedHistoryFact]) -> str:
     return "\n".join([f"{fact.category}: {fact.question} - {fact.answer} {f'({fact.additional_details})' if fact.additional_details else ''}" for fact in facts])
 
-def extract_medhist(state: AgentState) -> AgentState:
+# Words that do not tell two history questions apart ("Do you have any allergies?" vs "Any allergies?")
+QUESTION_STOPWORDS = {
+    "a", "an", "the", "do", "does", "did", "you", "your", "he", "she", "his", "her", "they", "their",
+    "have", "has", "had", "any", "are", "is", "was", "were", "take", "taking", "currently", "ever", "of", "to",
+}
+
+def normalize_question(question: str) -> str:
+    words = re.findall(r"[a-z0-9]+", question.lower())
+    return " ".join(w for w in words if w not in QUESTION_STOPWORDS) or " ".join(words)
+
+def fact_key(fact: MedHistoryFact) -> tuple:
+    return (fact.category, normalize_question(fact.question))
+
+def merge_medhist(state: AgentState, facts: List[MedHistoryFact]) -> dict:
+    """Merge newly extracted facts into medical_history in a single update.
+
+    Facts are keyed by category and normalized question. A fact matching an existing one
+    replaces it when the answer or details changed (a correction) and is dropped otherwise.
+    """
+    merged = list(state.get("medical_history") or [])
+    index = {fact_key(fact): i for i, fact in enumerate(merged)}
+    changed = False
+    for fact in facts:
+        if not fact.question or not fact.answer:
+            continue
+        key = fact_key(fact)
+        if key not in index:
+            index[key] = len(merged)
+            merged.append(fact)
+            changed = True
+        elif (merged[index[key]].answer, merged[index[key]].additional_details) != (fact.answer, fact.additional_details):
+            merged[index[key]] = fact
+            changed = True
+    return {"medical_history": merged} if changed else {}
+
+def medhist_context(state: AgentState, summary_note: str = "") -> str:
+    """Volatile context for Phase 3 prompts, placed after the transcript"""
+    extracted_patient_info = {
+        "name": state.get("patient_name"),
+        "age": state.get("patient_age"),
+        "sex": state.get("patient_sex")
+    }
+    extracted_symptoms = {
+        "main_symptoms": state.get("main_symptoms") or [],
+        "symptom_onset": state.get("symptom_onset"),
+        "associated_symptoms": state.get("associated_symptoms") or [],
+        "additional_symptom_info": state.get("additional_symptom_info") or []
+    }
+    return (
+        f"Patient Info: {extracted_patient_info}\n"
+        f"Symptoms: {extracted_symptoms}\n"
+        f"Already captured information: {format_medhist_facts(state.get('medical_history', []))}\n"
+        f"{summary_note}"
+    )
+
+async def extract_medhist(state: AgentState) -> AgentState:
     print("Extracting medical history")
-    existing_facts = state.get("medical_history", [])
-
-    facts_summary = format_medhist_facts(existing_facts)
-    recent_messages = state.get("messages", [])[-4:]
-
-    msgs = [
-        SystemMessage(content=BASE_PROMPT),
-        SystemMessage(content=MEDICAL_HISTORY_EXTRACTION_PROMPT.format(
-            current_time=get_current_time(),
-            extracted_patient_info={
-                "name": state["patient_name"],
-                "age": state["patient_age"],
-                "sex": state["patient_sex"]
-            },
-            extracted_symptoms={
-                "main_symptoms": state["main_symptoms"],
-                "symptom_onset": state["symptom_onset"],
-                "associated_symptoms": state["associated_symptoms"],
-                "additional_symptom_info": state["additional_symptom_info"]
-            },
-            extracted_medical_history=facts_summary
-        )),
-        *recent_messages,
-    ]
-
-    parsed = medhist_llm.invoke(msgs)
-    updates = {}
-    if parsed.category is not None and parsed.question is not None and parsed.answer is not None:
-        updates["medical_history"] = existing_facts + [parsed]
-    
+    recent_messages, _ = select_context(state, "extract_medhist")
+
+    msgs = build_prompt(MEDICAL_HISTORY_EXTRACTION_PROMPT, recent_messages, medhist_context(state))
+
+    parsed: MedHistoryFacts = await medhist_llm.ainvoke(msgs)
+    updates = merge_medhist(state, parsed.facts)
+    print(f"Extracted {len(parsed.facts)} medical history fact(s)")
+
     return updates
 
-def ask_medhist(state: AgentState) -> AgentState:
+async def ask_medhist(state: AgentState) -> AgentState:
     print("Asking medical history")
-    existing_facts = state.get("medical_history", [])
-
-    facts_summary = format_medhist_facts(existing_facts)
-
-    msgs = [
-        SystemMessage(content=BASE_PROMPT),
-        SystemMessage(content=MEDICAL_HISTORY_ASKING_PROMPT.format(
-            current_time=get_current_time(),
-            extracted_patient_info={
-                "name": state["patient_name"],
-                "age": state["patient_age"],
-                "sex": state["patient_sex"]
-            },
-            extracted_symptoms={
-                "main_symptoms": state["main_symptoms"],
-                "symptom_onset": state["symptom_onset"],
-                "associated_symptoms": state["associated_symptoms"],
-                "additional_symptom_info": state["additional_symptom_info"]
-            },
-            extracted_medical_history=facts_summary
-        ))
-    ]
-
-    resp = llm.invoke(msgs)
-    return {"messages": [resp]}
-
-def route_after_med_history(state):
+    # Keep the rolling summary fresh for check_medhist_sufficiency, which as a router cannot write state
+    summary_updates = await update_rolling_summary(state)
+    msgs = build_prompt(MEDICAL_HISTORY_ASKING_PROMPT, [], medhist_context(state))
+
+    resp = await llm.ainvoke(msgs)
+    return {"messages": [resp], **summary_updates}
+
+async def route_after_med_history(state):
     facts = state.get("medical_history", [])
     
     # Check mandatory items
@@ -88,25 +105,47 @@ def route_after_med_history(state):
     #     return "ask_medhist"  # Keep asking
     
     # LLM sufficiency check for everything else
-    check = check_medhist_sufficiency(state)
+    check = await check_medhist_sufficiency(state)
     return "triage_summary" if check.is_sufficient else "ask_medhist"
 
-def check_medhist_sufficiency(state):
+async def check_medhist_sufficiency(state):
     print("Checking medical history sufficiency")
-    facts = state.get("medical_history", [])
-    
-    msgs = [
-        SystemMessage(content=BASE_PROMPT),
-        SystemMessage(content=MEDICAL_HISTORY_SUFFICIENCY_CHECK_PROMPT.format(
-            extracted_medical_history=format_medhist_facts(facts)
-        )),
-        *state["messages"],
-    ]
-
-    resp = medhist_sufficiency_llm.invoke(msgs)
+    window, summary_note = select_context(state, "check_medhist_sufficiency")
+    msgs = build_prompt(MEDICAL_HISTORY_SUFFICIENCY_CHECK_PROMPT, window, medhist_context(state, summary_note))
+
+    resp = await medhist_sufficiency_llm.ainvoke(msgs)
     print(resp)
     return resp
 
 def human_medhist_node(state: AgentState) -> AgentState:
     user_input = interrupt("Waiting for medical history")
-    return {"messages": [HumanMessage(content=user_input)]}
\ No newline at end of file
+    updates = {"messages": [HumanMessage(content=user_input)]}
+    flags = detect_red_flags(user_input)
+    if flags:
+        print("Red flags detected: ", [f["id"] for f in flags])
+        updates["red_flags"] = (state.get("red_flags") or []) + flags
+    return updates
+
+async def medhist_turn(state: AgentState) -> AgentState:
+    """Fused Phase 3 turn: extract, check sufficiency and ask the next question in one LLM call"""
+    print("Medical history turn (fused)")
+    summary_updates = await update_rolling_summary(state)
+    window, summary_note = select_context({**state, **summary_updates}, "medhist_turn")
+
+    msgs = build_prompt(MEDICAL_HISTORY_TURN_PROMPT, window, medhist_context(state, summary_note))
+
+    parsed: MedHistoryTurn = await medhist_turn_llm.ainvoke(msgs)
+    updates = {"medhist_sufficient": parsed.is_sufficient, **summary_updates, **merge_medhist(state, parsed.facts)}
+
+    if not parsed.is_sufficient and parsed.next_question:
+        updates["messages"] = [AIMessage(content=parsed.next_question)]
+    return updates
+
+def route_after_medhist_turn(state: AgentState) -> str:
+    """Route on the fused-turn verdict: triage, wait for the patient, or ask explicitly"""
+    if state.get("medhist_sufficient"):
+        return "triage_summary"
+    if isinstance(state["messages"][-1], AIMessage):
+        # Next question was generated in the same call
+        return "human_medhist_node"
+    return "ask_medhist"
\ No newline at end of file
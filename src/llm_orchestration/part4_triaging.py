@@ -1,27 +1,29 @@
 from models import AgentState, TriageSummary
-from prompts import BASE_PROMPT, TRIAGE_SUMMARY_PROMPT, ACKNOWLEDGEMENT_PROMPT
-from langchain_core.messages import SystemMessage
+from prompts import TRIAGE_SUMMARY_PROMPT, ACKNOWLEDGEMENT_PROMPT, build_prompt
 from llm_orchestration.llm import llm
+from llm_orchestration.context_manager import select_context
+from llm_orchestration.red_flags import red_flag_context
 
 from dotenv import load_dotenv
 load_dotenv()
 
 final_llm = llm.with_structured_output(TriageSummary)
 
-def triage_summary(state: AgentState) -> AgentState:
-    msgs = [
-        SystemMessage(content=BASE_PROMPT),
-        SystemMessage(content=TRIAGE_SUMMARY_PROMPT),
-        *state["messages"],
-    ]
-    parsed = final_llm.invoke(msgs)
+async def triage_summary(state: AgentState) -> AgentState:
+    # Triage needs the full transcript (default budget is None)
+    window, _ = select_context(state, "triage_summary")
+    msgs = build_prompt(TRIAGE_SUMMARY_PROMPT, window, red_flag_context(state))
+    parsed = await final_llm.ainvoke(msgs)
     return {"generated_summary": parsed}
 
-def acknowledgement(state: AgentState) -> AgentState:
-    msgs = [
-        SystemMessage(content=BASE_PROMPT),
-        SystemMessage(content=ACKNOWLEDGEMENT_PROMPT),
-        *state["messages"],
-    ]
-    resp = llm.invoke(msgs)
-    return {"messages": [resp]}
\ No newline at end of file
+async def acknowledgement(state: AgentState) -> AgentState:
+    window, _ = select_context(state, "acknowledgement")
+    msgs = build_prompt(ACKNOWLEDGEMENT_PROMPT, window)
+    resp = await llm.ainvoke(msgs)
+    return {"messages": [resp]}
+
+def route_red_flags(next_node: str):
+    """Router for after a patient reply: expedited triage on a red flag, else the usual next node"""
+    def route(state: AgentState) -> str:
+        return "triage_summary" if state.get("red_flags") else next_node
+    return route
@@ -0,0 +1,55 @@
+from collections import defaultdict
+from threading import Lock
+from langchain_core.callbacks import BaseCallbackHandler
+
+class PromptCacheStats(BaseCallbackHandler):
+    """Tracks how much of each prompt was served from the provider's prefix cache.
+
+    OpenAI reports cached prompt tokens in `usage_metadata.input_token_details.cache_read`;
+    the cached-prefix ratio is cached tokens over total input tokens, per graph node.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._node_by_run = {}
+        self._stats = defaultdict(lambda: {"calls": 0, "input_tokens": 0, "cached_tokens": 0})
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, metadata=None, **kwargs):
+        node = (metadata or {}).get("langgraph_node", "unknown")
+        with self._lock:
+            self._node_by_run[run_id] = node
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        with self._lock:
+            node = self._node_by_run.pop(run_id, "unknown")
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                if not usage:
+                    continue
+                cached = (usage.get("input_token_details") or {}).get("cache_read", 0) or 0
+                with self._lock:
+                    stats = self._stats[node]
+                    stats["calls"] += 1
+                    stats["input_tokens"] += usage.get("input_tokens", 0)
+                    stats["cached_tokens"] += cached
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        with self._lock:
+            self._node_by_run.pop(run_id, None)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            nodes = {node: dict(stats) for node, stats in self._stats.items()}
+        total_input = sum(s["input_tokens"] for s in nodes.values())
+        total_cached = sum(s["cached_tokens"] for s in nodes.values())
+        for stats in nodes.values():
+            stats["cached_prefix_ratio"] = stats["cached_tokens"] / stats["input_tokens"] if stats["input_tokens"] else 0.0
+        return {
+            "input_tokens": total_input,
+            "cached_tokens": total_cached,
+            "cached_prefix_ratio": total_cached / total_input if total_input else 0.0,
+            "nodes": nodes,
+        }
+
+prompt_cache_stats = PromptCacheStats()
@@ -0,0 +1,145 @@
+import re
+from collections import defaultdict
+
+# Rule-based red-flag screen run on every Phase 2/3 patient reply. A match sends the session
+# straight to triage instead of through the remaining symptom and history loops, so it only
+# lists presentations that warrant emergency assessment on their own.
+
+RED_FLAG_LEXICON = {
+    "chest_pain": ("Chest pain", [
+        "chest pain", "chest pains", "chest tightness", "tight chest", "chest pressure", "pressure in my chest",
+        "crushing chest", "pain in my chest", "heart attack",
+    ]),
+    "breathing": ("Difficulty breathing", [
+        "short of breath", "shortness of breath", "can't breathe", "cannot breathe", "cant breathe",
+        "difficulty breathing", "trouble breathing", "struggling to breathe", "gasping for air", "choking",
+        "lips turning blue", "turning blue",
+    ]),
+    "stroke": ("Possible stroke", [
+        "face drooping", "face is drooping", "facial droop", "slurred speech", "slurring my words",
+        "can't move my arm", "can't move my leg", "weakness on one side", "numbness on one side",
+        "one side of my body", "sudden confusion", "can't speak",
+    ]),
+    "consciousness": ("Loss of consciousness", [
+        "passed out", "fainted", "blacked out", "lost consciousness", "unconscious", "unresponsive",
+    ]),
+    "seizure": ("Seizure", ["seizure", "seizures", "convulsion", "convulsions", "convulsing"]),
+    "bleeding": ("Severe bleeding", [
+        "bleeding heavily", "heavy bleeding", "won't stop bleeding", "can't stop the bleeding",
+        "coughing up blood", "vomiting blood", "throwing up blood", "blood in my vomit", "black stool",
+    ]),
+    "anaphylaxis": ("Possible anaphylaxis", [
+        "throat swelling", "throat is swelling", "throat closing", "swollen tongue", "tongue swelling",
+        "lips swelling", "swollen lips", "anaphylaxis", "anaphylactic",
+    ]),
+    "headache": ("Sudden severe headache", [
+        "worst headache", "thunderclap headache", "sudden severe headache", "stiff neck and fever",
+    ]),
+    "self_harm": ("Risk of self-harm", [
+        "kill myself", "suicidal", "end my life", "want to die", "hurt myself", "overdose", "overdosed",
+    ]),
+}
+
+# A cue up to this many words before a phrase negates it ("no chest pain", "never fainted")
+NEGATION_CUES = {"no", "not", "never", "denies", "deny", "without", "don't", "dont", "didn't", "didnt", "haven't", "havent"}
+NEGATION_WINDOW = 3
+
+# Past-history phrasing ending up to HISTORY_WINDOW words before a phrase makes it a past problem
+# ("history of seizures", "used to faint"); temporal phrasing after it in the same clause does too
+# ("chest pains as a teenager", "a seizure years ago")
+HISTORY_CUES = [
+    ("history", "of"), ("used", "to"), ("in", "the", "past"), ("previous",), ("previously",), ("childhood",),
+]
+PAST_TIME_CUES = [
+    ("years", "ago"), ("as", "a", "child"), ("as", "a", "kid"), ("as", "a", "teenager"), ("when", "i", "was"),
+    ("in", "childhood"),
+]
+HISTORY_WINDOW = 4
+
+# A relative who is the subject of the phrase makes it someone else's problem ("my father had a
+# heart attack"), unless the patient is named in between ("my mum noticed I passed out")
+RELATIVES = {
+    "family", "father", "mother", "dad", "mum", "mom", "brother", "sister", "uncle", "aunt", "son", "daughter",
+    "husband", "wife", "grandfather", "grandmother", "grandpa", "grandma",
+}
+RELATIVE_VERBS = {"had", "has", "have", "got", "gets", "died", "suffered", "suffers"}
+FIRST_PERSON = {"i", "i'm", "im", "i've", "ive", "me", "myself"}
+
+TOKEN = re.compile(r"[a-z]+(?:'[a-z]+)?")
+# Cues only reach within a clause, so "no appetite, chest pain" still flags chest pain. "and" also
+# ends a clause for cues ("no appetite and chest pain"), but phrases may span it ("stiff neck and fever")
+CLAUSE_BREAK = re.compile(r"[.,;!?]|\bbut\b")
+
+def tokenize(text: str) -> list:
+    return TOKEN.findall(text.lower())
+
+def build_index(lexicon: dict) -> dict:
+    """Phrases keyed by their first token, longest first: (tokens, flag id)."""
+    index = defaultdict(list)
+    for flag, (_, phrases) in lexicon.items():
+        for phrase in phrases:
+            tokens = tokenize(phrase)
+            index[tokens[0]].append((tokens, flag))
+    for candidates in index.values():
+        candidates.sort(key=lambda c: -len(c[0]))
+    return dict(index)
+
+PHRASE_INDEX = build_index(RED_FLAG_LEXICON)
+
+red_flag_stats = {"messages_scanned": 0, "messages_flagged": 0}
+
+def _cued(tokens: list, start: int, cues: set, window: int) -> bool:
+    return any(t in cues for t in tokens[max(0, start - window):start])
+
+def _phrase_in(tokens: list, lo: int, hi: int, phrases: list) -> bool:
+    """Whether one of `phrases` lies entirely within tokens[lo:hi]."""
+    lo = max(0, lo)
+    return any(
+        tuple(tokens[i:i + len(phrase)]) == phrase
+        for phrase in phrases for i in range(lo, hi - len(phrase) + 1)
+    )
+
+def _relative_subject(tokens: list, start: int) -> bool:
+    for j in range(max(0, start - HISTORY_WINDOW), start - 1):
+        if tokens[j] in RELATIVES and tokens[j + 1] in RELATIVE_VERBS and not FIRST_PERSON & set(tokens[j + 1:start]):
+            return True
+    return False
+
+def _suppressed(tokens: list, start: int, end: int) -> bool:
+    """Whether the phrase at tokens[start:end] is negated, past history or someone else's."""
+    before = tokens[:start]
+    lo = len(before) - before[::-1].index("and") if "and" in before else 0
+    hi = tokens.index("and", end) if "and" in tokens[end:] else len(tokens)
+    clause, start, end = tokens[lo:hi], start - lo, end - lo
+    return (
+        _cued(clause, start, NEGATION_CUES, NEGATION_WINDOW)
+        or _phrase_in(clause, start - HISTORY_WINDOW, start, HISTORY_CUES)
+        or _phrase_in(clause, end, len(clause), PAST_TIME_CUES)
+        or _relative_subject(clause, start)
+    )
+
+def detect_red_flags(text: str) -> list:
+    """Red flags mentioned (and not negated) in a patient message, one entry per flag."""
+    red_flag_stats["messages_scanned"] += 1
+    found = {}
+    for clause in CLAUSE_BREAK.split(text.lower().replace("\u2019", "'")):
+        tokens = tokenize(clause)
+        for i, token in enumerate(tokens):
+            for phrase, flag in PHRASE_INDEX.get(token, ()):
+                if flag not in found and tokens[i:i + len(phrase)] == phrase and not _suppressed(tokens, i, i + len(phrase)):
+                    found[flag] = {"id": flag, "label": RED_FLAG_LEXICON[flag][0], "phrase": " ".join(phrase)}
+                    break
+    if found:
+        red_flag_stats["messages_flagged"] += 1
+    return list(found.values())
+
+def red_flag_context(state: dict) -> str:
+    """Triage prompt context naming the red flags that expedited the session, if any."""
+    flags = state.get("red_flags") or []
+    if not flags:
+        return ""
+    listed = ", ".join(f"{f['label']} (\"{f['phrase']}\")" for f in flags)
+    return (
+        f"Red flags detected by the intake screen: {listed}. Intake was cut short so the patient can be "
+        f"assessed immediately; some history may be missing."
+    )
@@ -0,0 +1,196 @@
+import asyncio
+import functools
+import os
+import random
+import time
+from collections import defaultdict, deque
+
+from llm_orchestration.llm_cache import current_node
+from llm_orchestration.instrumentation import LLM_DEADLINE_MISSES, LLM_HEDGES, LLM_RETRIES
+
+from dotenv import load_dotenv
+load_dotenv()
+
+@functools.cache
+def retryable_errors() -> tuple:
+    """Errors worth another attempt: dropped connections, timeouts, rate limits and 5xx responses."""
+    import openai  # slow to import, and only needed once a call has failed
+    return (
+        openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError, ConnectionError, TimeoutError,
+    )
+
+# Seconds a node's LLM call may take, retries and queueing included. Triage writes the
+# longest output on the strong model; calls outside a graph node are batch work.
+DEFAULT_DEADLINE = float(os.getenv("LLM_DEADLINE_SECONDS", "30"))
+NODE_DEADLINES = {
+    "triage_summary": 60.0,
+    "unknown": 60.0,
+}
+MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+RETRY_BASE_DELAY = float(os.getenv("LLM_RETRY_BASE_DELAY", "0.5"))
+RETRY_MAX_DELAY = float(os.getenv("LLM_RETRY_MAX_DELAY", "8"))
+
+# A structured call still running past its node's observed p95 gets a duplicate request
+HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+HEDGE_MIN_DELAY = float(os.getenv("LLM_HEDGE_MIN_DELAY", "0.5"))
+LATENCY_WINDOW = 200
+
+def hedging_enabled() -> bool:
+    return os.getenv("LLM_HEDGING", "false").lower() == "true"
+
+def deadline_for(node: str) -> float:
+    """LLM_DEADLINE_<NODE> overrides the node's default deadline."""
+    override = os.getenv(f"LLM_DEADLINE_{node.upper()}")
+    if override:
+        return float(override)
+    return NODE_DEADLINES.get(node, DEFAULT_DEADLINE)
+
+def backoff(attempt: int) -> float:
+    """Full-jitter exponential backoff before retry number `attempt` (0-based)."""
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt))
+
+
+class LLMUnavailable(Exception):
+    """Raised when a chat model call still fails after its retries."""
+
+    def __init__(self, detail: str, retry_after: int = 5):
+        super().__init__(detail)
+        self.retry_after = retry_after
+
+class LLMDeadlineExceeded(LLMUnavailable):
+    """Raised when a chat model call runs past its node's deadline."""
+
+
+class ResilienceStats:
+    """Per-node retries, hedges and deadline misses, plus recent latencies for the hedge delay."""
+
+    def __init__(self):
+        self._nodes = defaultdict(lambda: defaultdict(int))
+        self._latencies = defaultdict(lambda: deque(maxlen=LATENCY_WINDOW))
+
+    def count(self, node: str, key: str):
+        self._nodes[node][key] += 1
+
+    def observe(self, node: str, seconds: float):
+        self._latencies[node].append(seconds)
+
+    def p95(self, node: str):
+        samples = self._latencies[node]
+        if len(samples) < HEDGE_MIN_SAMPLES:
+            return None
+        return sorted(samples)[int(0.95 * (len(samples) - 1))]
+
+    def snapshot(self) -> dict:
+        nodes = {}
+        for node, counts in self._nodes.items():
+            p95 = self.p95(node)
+            nodes[node] = {
+                **counts,
+                "deadline_seconds": deadline_for(node),
+                "p95_seconds": round(p95, 3) if p95 is not None else None,
+            }
+        return {"hedging": hedging_enabled(), "max_retries": MAX_RETRIES, "nodes": nodes}
+
+resilience_stats = ResilienceStats()
+
+
+class ResilientRunnable:
+    """Wraps a chat model (or structured-output runnable) with a deadline, retries and hedging.
+
+    Each call gets its node's deadline. Transient errors are retried with jittered exponential
+    backoff while the deadline allows. With LLM_HEDGING=true, a structured call that outlives
+    its node's p95 latency is duplicated and the first result wins. Text calls are never
+    hedged, since they may be streaming to the patient.
+    """
+
+    def __init__(self, runnable, structured: bool = False):
+        self.runnable = runnable
+        self.structured = structured
+
+    def _hedge_delay(self, node: str):
+        if not self.structured or not hedging_enabled():
+            return None
+        p95 = resilience_stats.p95(node)
+        return max(p95, HEDGE_MIN_DELAY) if p95 is not None else None
+
+    async def _attempt(self, node: str, messages, config, kwargs):
+        started = time.monotonic()
+        delay = self._hedge_delay(node)
+        if delay is None:
+            result = await self.runnable.ainvoke(messages, config, **kwargs)
+            resilience_stats.observe(node, time.monotonic() - started)
+            return result
+
+        primary = asyncio.ensure_future(self.runnable.ainvoke(messages, config, **kwargs))
+        hedge = None
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=delay)
+            if not done:
+                resilience_stats.count(node, "hedges")
+                hedge = asyncio.ensure_future(self.runnable.ainvoke(messages, config, **kwargs))
+            pending = {primary} if hedge is None else {primary, hedge}
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        error = task.exception()
+                        continue
+                    if hedge is not None:
+                        outcome = "won" if task is hedge else "lost"
+                        resilience_stats.count(node, f"hedges_{outcome}")
+                        LLM_HEDGES.labels(node, outcome).inc()
+                    resilience_stats.observe(node, time.monotonic() - started)
+                    return task.result()
+            raise error
+        finally:
+            for task in (primary, hedge):
+                if task is not None and not task.done():
+                    task.cancel()
+
+    def _missed(self, node: str) -> LLMDeadlineExceeded:
+        resilience_stats.count(node, "deadline_misses")
+        LLM_DEADLINE_MISSES.labels(node).inc()
+        return LLMDeadlineExceeded(f"{node} did not get a model response within {deadline_for(node):g}s")
+
+    async def ainvoke(self, messages, config=None, **kwargs):
+        node = current_node()
+        deadline = time.monotonic() + deadline_for(node)
+        resilience_stats.count(node, "calls")
+        attempt = 0
+        while True:
+            try:
+                remaining = deadline - time.monotonic()
+                return await asyncio.wait_for(self._attempt(node, messages, config, kwargs), timeout=remaining)
+            except retryable_errors() as e:
+                if time.monotonic() >= deadline:
+                    raise self._missed(node) from e
+                if attempt >= MAX_RETRIES:
+                    resilience_stats.count(node, "failures")
+                    raise LLMUnavailable(f"{node} failed after {attempt + 1} attempts: {type(e).__name__}") from e
+                delay = backoff(attempt)
+                if time.monotonic() + delay >= deadline:
+                    raise self._missed(node) from e
+                attempt += 1
+                resilience_stats.count(node, "retries")
+                LLM_RETRIES.labels(node).inc()
+                print(f"Retrying {node} in {delay:.2f}s after {type(e).__name__} (attempt {attempt + 1})")
+                await asyncio.sleep(delay)
+
+    def invoke(self, messages, config=None, **kwargs):
+        node = current_node()
+        for attempt in range(MAX_RETRIES + 1):
+            try:
+                return self.runnable.invoke(messages, config, **kwargs)
+            except retryable_errors() as e:
+                if attempt == MAX_RETRIES:
+                    raise LLMUnavailable(f"{node} failed after {attempt + 1} attempts: {type(e).__name__}") from e
+                resilience_stats.count(node, "retries")
+                LLM_RETRIES.labels(node).inc()
+                time.sleep(backoff(attempt))
+
+    def with_structured_output(self, schema, **kwargs):
+        return ResilientRunnable(self.runnable.with_structured_output(schema, **kwargs), structured=True)
+
+    def __getattr__(self, name):
+        return getattr(self.runnable, name)
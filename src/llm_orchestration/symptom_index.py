@@ -0,0 +1,182 @@
+import os
+import re
+
+# Local symptom deduplication. Extracted terms are mapped to a canonical symptom id through a
+# synonym/lemma dictionary, with typos in long terms ("haedache") caught by a deletion index, so
+# each lookup costs a handful of dict probes regardless of the lexicon size. The id is only a
+# dedupe key: state keeps the patient's own wording. Synonyms are restricted to spelling and lay
+# variants of the same symptom; more specific terms ("productive cough", "migraine", "vertigo")
+# are clinically distinct and stay unmatched, so they are kept as said.
+
+SYMPTOM_LEXICON = {
+    "headache": ("headache", ["head ache", "head pain", "cephalalgia", "cephalgia", "sore head"]),
+    "fever": ("fever", ["pyrexia", "high temperature", "temperature", "febrile", "feverish", "running a fever"]),
+    "chills": ("chills", ["chill", "shivering", "rigors", "shivers"]),
+    "cough": ("cough", ["coughing"]),
+    "sore_throat": ("sore throat", ["throat pain", "painful throat", "throat ache"]),
+    "runny_nose": ("runny nose", ["rhinorrhea", "rhinorrhoea", "running nose", "nasal discharge", "drippy nose"]),
+    "nasal_congestion": ("nasal congestion", ["blocked nose", "stuffy nose", "congested nose", "stuffed nose"]),
+    "sneezing": ("sneezing", ["sneeze", "sneezes"]),
+    "shortness_of_breath": ("shortness of breath", [
+        "short of breath", "breathlessness", "breathless", "dyspnea", "dyspnoea", "difficulty breathing",
+        "trouble breathing", "sob",
+    ]),
+    "chest_tightness": ("chest tightness", ["tight chest", "chest pressure", "tightness in chest"]),
+    "chest_pain": ("chest pain", ["pain in chest", "chest ache", "sore chest"]),
+    "palpitations": ("palpitations", ["racing heart", "heart racing", "pounding heart", "fluttering heart"]),
+    "nausea": ("nausea", ["nauseous", "nauseated", "feeling sick", "queasy", "queasiness"]),
+    "vomiting": ("vomiting", ["vomit", "throwing up", "being sick", "emesis", "puking"]),
+    "diarrhoea": ("diarrhoea", ["diarrhea", "loose stools", "loose stool", "watery stools", "runny stools"]),
+    "constipation": ("constipation", ["constipated", "hard stools", "unable to pass stool"]),
+    "abdominal_pain": ("abdominal pain", [
+        "stomach pain", "stomach ache", "stomachache", "tummy ache", "tummy pain", "belly pain", "belly ache",
+    ]),
+    "back_pain": ("back pain", ["backache", "back ache", "sore back"]),
+    "joint_pain": ("joint pain", ["arthralgia", "aching joints", "sore joints", "painful joints"]),
+    "muscle_aches": ("muscle aches", ["myalgia", "body aches", "body ache", "aching muscles", "sore muscles"]),
+    "dizziness": ("dizziness", ["dizzy", "giddy"]),
+    "fatigue": ("fatigue", ["tiredness", "tired", "exhaustion", "exhausted", "lethargy", "lethargic", "no energy"]),
+    "rash": ("rash", ["skin rash"]),
+    "itching": ("itching", ["itchy", "itch", "pruritus", "itchiness"]),
+    "ear_pain": ("ear pain", ["earache", "ear ache", "sore ear", "otalgia"]),
+    "dysuria": ("dysuria", ["painful urination", "burning urination", "burning when urinating", "burning when i pee", "pain when peeing"]),
+    "poor_appetite": ("poor appetite", ["loss of appetite", "reduced appetite", "eating less", "no appetite"]),
+    "swelling": ("swelling", ["swollen", "oedema", "edema"]),
+}
+
+# A new detail sharing at least this fraction of its words with a stored one is the same detail
+INFO_SIMILARITY_THRESHOLD = float(os.getenv("SYMPTOM_INFO_SIMILARITY", "0.8"))
+# Most recent details kept in state; older ones are dropped once the cap is reached
+MAX_ADDITIONAL_INFO = int(os.getenv("SYMPTOM_INFO_MAX_ITEMS", "20"))
+# Shorter terms are only matched exactly: one edit away from a short symptom word is usually
+# another ordinary word ("never"/"fever", "tough"/"cough", "tried"/"tired")
+FUZZY_MIN_LENGTH = 8
+
+WORD = re.compile(r"[a-z0-9]+")
+INFO_STOPWORDS = {"a", "an", "the", "and", "or", "of", "in", "on", "at", "to", "is", "it", "my", "i", "when", "with", "has", "have", "been"}
+
+def lemma(word: str) -> str:
+    """Crude singular form, enough to line up "headaches"/"headache" and "allergies"/"allergy"."""
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 3 and word.endswith("s") and not word.endswith(("ss", "us", "is")):
+        return word[:-1]
+    return word
+
+def normalize_term(term: str) -> str:
+    """Lookup key for a symptom term: lowercased, lemmatized words with spacing removed."""
+    return "".join(lemma(w) for w in WORD.findall(term.lower()))
+
+def _deletes(key: str) -> set:
+    return {key[:i] + key[i + 1:] for i in range(len(key))}
+
+def build_index(lexicon: dict) -> tuple:
+    """Exact index (key -> symptom id) and single-deletion index of the long keys for fuzzy lookups.
+
+    A deletion shared by keys of different symptoms is ambiguous and maps to None.
+    """
+    exact = {}
+    for symptom_id, (label, synonyms) in lexicon.items():
+        for term in [label, *synonyms]:
+            exact[normalize_term(term)] = symptom_id
+    deletions = {}
+    for key, symptom_id in exact.items():
+        if len(key) < FUZZY_MIN_LENGTH:
+            continue
+        for deleted in _deletes(key):
+            if deletions.get(deleted, symptom_id) != symptom_id:
+                deletions[deleted] = None
+            else:
+                deletions[deleted] = symptom_id
+    return exact, deletions
+
+EXACT_INDEX, DELETION_INDEX = build_index(SYMPTOM_LEXICON)
+
+symptom_index_stats = {"lookups": 0, "exact": 0, "fuzzy": 0, "unmatched": 0}
+
+KEYS_BY_ID = {}
+for _key, _symptom_id in EXACT_INDEX.items():
+    KEYS_BY_ID.setdefault(_symptom_id, []).append(_key)
+
+def _one_edit(a: str, b: str) -> bool:
+    """Whether `a` is one inserted, dropped or swapped-adjacent character away from `b`.
+
+    Substitutions are not accepted: they are how ordinary words collide with symptom words.
+    """
+    if abs(len(a) - len(b)) == 1:
+        short, long = sorted((a, b), key=len)
+        return any(long[:i] + long[i + 1:] == short for i in range(len(long)))
+    if len(a) == len(b):
+        diff = [i for i in range(len(a)) if a[i] != b[i]]
+        return len(diff) == 2 and diff[1] == diff[0] + 1 and a[diff[0]] == b[diff[1]] and a[diff[1]] == b[diff[0]]
+    return False
+
+def _fuzzy(key: str):
+    """Symptom id of a long lexicon key one typo away from `key`."""
+    if len(key) < FUZZY_MIN_LENGTH - 1:
+        return None
+    candidates = {DELETION_INDEX.get(key)}  # a character missing from the query
+    for deleted in _deletes(key):
+        candidates.add(EXACT_INDEX.get(deleted))  # an extra character
+        candidates.add(DELETION_INDEX.get(deleted))  # swapped characters
+    for symptom_id in candidates - {None}:
+        if any(len(k) >= FUZZY_MIN_LENGTH and _one_edit(key, k) for k in KEYS_BY_ID[symptom_id]):
+            return symptom_id
+    return None
+
+def canonicalize(term: str) -> str:
+    """Canonical symptom id for an extracted term; terms outside the lexicon get an id derived from their wording."""
+    symptom_index_stats["lookups"] += 1
+    key = normalize_term(term)
+    symptom_id = EXACT_INDEX.get(key)
+    if symptom_id:
+        symptom_index_stats["exact"] += 1
+        return symptom_id
+    symptom_id = _fuzzy(key)
+    if symptom_id:
+        symptom_index_stats["fuzzy"] += 1
+        return symptom_id
+    symptom_index_stats["unmatched"] += 1
+    return f"term:{key}"
+
+def merge_terms(existing: list, new: list, exclude: set = frozenset()) -> list:
+    """Existing terms plus the new ones whose canonical id is not present yet (or in `exclude`).
+
+    Terms are kept in the patient's wording; the first wording recorded for an id wins.
+    """
+    merged, seen = [], set(exclude)
+    for term in [*existing, *new]:
+        symptom_id = canonicalize(term)
+        if symptom_id not in seen:
+            seen.add(symptom_id)
+            merged.append(" ".join(term.split()))
+    return merged
+
+def symptom_ids(terms: list) -> set:
+    return {canonicalize(term) for term in terms}
+
+def _info_words(text: str) -> set:
+    return {lemma(w) for w in WORD.findall(text.lower())} - INFO_STOPWORDS
+
+def merge_info(existing: list, new: list) -> list:
+    """Merge free-text symptom details, folding near-duplicates together.
+
+    A new detail that mostly overlaps an existing one is dropped if it adds no words, and
+    otherwise replaces it: it either says more ("chest pain for 2 days" -> "chest pain for
+    2 days, worse on deep breathing") or corrects it ("chest pain for 2 days" -> "chest pain
+    for 3 days"). Only the latest MAX_ADDITIONAL_INFO details are kept.
+    """
+    merged = [(text, _info_words(text)) for text in existing]
+    for text in new:
+        words = _info_words(text)
+        if not words:
+            continue
+        for i, (kept, kept_words) in enumerate(merged):
+            overlap = len(words & kept_words) / min(len(words), len(kept_words) or 1)
+            if overlap >= INFO_SIMILARITY_THRESHOLD:
+                if not words <= kept_words:
+                    merged[i] = (text, words)
+                break
+        else:
+            merged.append((text, words))
+    return [text for text, _ in merged][-MAX_ADDITIONAL_INFO:]
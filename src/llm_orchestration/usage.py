@@ -0,0 +1,159 @@
+import functools
+import inspect
+import json
+import os
+from contextvars import ContextVar
+from langchain_core.callbacks import BaseCallbackHandler
+
+from dotenv import load_dotenv
+load_dotenv()
+
+# USD per 1M tokens: (input, cached input, output). Matched on the longest model-name prefix;
+# LLM_PRICES_JSON='{"my-model": [1.0, 0.25, 4.0]}' adds or overrides entries.
+PRICES_PER_MILLION = {
+    "gpt-4.1": (2.00, 0.50, 8.00),
+    "gpt-4.1-mini": (0.40, 0.10, 1.60),
+    "gpt-4.1-nano": (0.10, 0.025, 0.40),
+    "gpt-4o": (2.50, 1.25, 10.00),
+    "gpt-4o-mini": (0.15, 0.075, 0.60),
+}
+PRICES_PER_MILLION.update({k: tuple(v) for k, v in json.loads(os.getenv("LLM_PRICES_JSON", "{}")).items()})
+
+# Usage collected by the node currently running in this context (see track_usage)
+_collector: ContextVar = ContextVar("usage_collector", default=None)
+
+def price_for(model: str):
+    matches = [name for name in PRICES_PER_MILLION if model and model.startswith(name)]
+    return PRICES_PER_MILLION[max(matches, key=len)] if matches else None
+
+def empty_usage() -> dict:
+    return {"input_tokens": 0, "cached_tokens": 0, "output_tokens": 0, "total_tokens": 0,
+            "llm_calls": 0, "iterations": 0, "cost_usd": 0.0}
+
+def call_usage(model: str, usage_metadata: dict) -> dict:
+    """Token counts and cost of one chat model call."""
+    usage = empty_usage()
+    usage["input_tokens"] = usage_metadata.get("input_tokens", 0)
+    usage["output_tokens"] = usage_metadata.get("output_tokens", 0)
+    usage["total_tokens"] = usage_metadata.get("total_tokens", usage["input_tokens"] + usage["output_tokens"])
+    usage["cached_tokens"] = (usage_metadata.get("input_token_details") or {}).get("cache_read", 0)
+    usage["llm_calls"] = 1
+    price = price_for(model)
+    if price is not None:
+        input_price, cached_price, output_price = price
+        uncached = usage["input_tokens"] - usage["cached_tokens"]
+        usage["cost_usd"] = (
+            uncached * input_price + usage["cached_tokens"] * cached_price + usage["output_tokens"] * output_price
+        ) / 1_000_000
+    return usage
+
+def add_counts(left: dict, right: dict) -> dict:
+    return {k: left.get(k, 0) + right.get(k, 0) for k in {**left, **right}}
+
+def merge_usage(left: dict, right: dict) -> dict:
+    """AgentState reducer: sums the per-phase and total counters of two usage updates"""
+    left, right = left or {}, right or {}
+    phases = dict(left.get("phases", {}))
+    for phase, counts in right.get("phases", {}).items():
+        phases[phase] = add_counts(phases.get(phase, {}), counts)
+    return {"phases": phases, "total": add_counts(left.get("total", {}), right.get("total", {}))}
+
+
+class UsageHandler(BaseCallbackHandler):
+    """Adds each chat model call's usage to the collector of the node making it."""
+
+    run_inline = True
+
+    def __init__(self):
+        self._models = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, metadata=None, **kwargs):
+        self._models[run_id] = (metadata or {}).get("ls_model_name", "")
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        model = self._models.pop(run_id, "")
+        collector = _collector.get()
+        if collector is None:
+            return
+        for generations in response.generations:
+            for generation in generations:
+                usage_metadata = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                if usage_metadata:
+                    collector.append(call_usage(model, usage_metadata))
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._models.pop(run_id, None)
+
+
+# Usage of LLM calls made by routers, which cannot write state: held per thread and
+# merged into the update of the node that runs next in the same run
+_pending_router_usage = {}
+
+def _thread_id() -> str:
+    from langgraph.config import get_config
+    return get_config().get("configurable", {}).get("thread_id")
+
+def _usage_update(entries: list, phase: str, iterations: int) -> dict:
+    phases = {phase: {**empty_usage(), "iterations": iterations}} if iterations else {}
+    for call_phase, call in entries:
+        phases[call_phase] = add_counts(phases.get(call_phase, empty_usage()), call)
+    if not phases:
+        return {}
+    total = empty_usage()
+    for counts in phases.values():
+        total = add_counts(total, counts)
+    return {"usage": {"phases": phases, "total": total}}
+
+def _wrap(fn, on_done):
+    """Run fn with a fresh usage collector and pass the collected calls to on_done."""
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def wrapped(state):
+            calls = []
+            token = _collector.set(calls)
+            try:
+                result = await fn(state)
+            finally:
+                _collector.reset(token)
+            return on_done(result, calls)
+        return wrapped
+
+    @functools.wraps(fn)
+    def wrapped(state):
+        calls = []
+        token = _collector.set(calls)
+        try:
+            result = fn(state)
+        finally:
+            _collector.reset(token)
+        return on_done(result, calls)
+    return wrapped
+
+def track_usage(node: str, phase: str, fn):
+    """Wrap a graph node so the LLM usage of its run is merged into its state update.
+
+    Human input nodes count one iteration of their phase per patient reply.
+    """
+    iterations = 1 if node.startswith("human_") else 0
+
+    def on_done(result, calls):
+        entries = _pending_router_usage.pop(_thread_id(), []) + [(phase, call) for call in calls]
+        return {**(result or {}), **_usage_update(entries, phase, iterations)}
+    return _wrap(fn, on_done)
+
+def track_router_usage(phase: str, fn):
+    """Wrap a routing function so the LLM calls it makes (sufficiency checks) are not lost."""
+    def on_done(result, calls):
+        if calls:
+            _pending_router_usage.setdefault(_thread_id(), []).extend((phase, call) for call in calls)
+        return result
+    return _wrap(fn, on_done)
+
+def session_usage(values: dict) -> dict:
+    """The usage channel of a session's state, with costs rounded for display."""
+    usage = values.get("usage") or {"phases": {}, "total": empty_usage()}
+    rounded = lambda counts: {**counts, "cost_usd": round(counts.get("cost_usd", 0.0), 6)}
+    return {
+        "phases": {phase: rounded(counts) for phase, counts in usage.get("phases", {}).items()},
+        "total": rounded(usage.get("total", empty_usage())),
+    }
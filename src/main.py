@@ -1,28 +1,108 @@
+import asyncio
 import os
+import time
 from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
 from langgraph.types import Command
 from contextlib import asynccontextmanager
+import hashlib
+from datetime import datetime, timedelta, timezone
+import json
 import uuid
 import uvicorn
+from psycopg_pool import PoolTimeout
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 
-from llm_orchestration.clinical_assistant_graph import build_clinical_assistant_graph, thread_config
-from models import StartResponse, ChatRequest, ChatResponse
-from langgraph.checkpoint.postgres import PostgresSaver
+from llm_orchestration.clinical_assistant_graph import build_clinical_assistant_graph, thread_config, PHASE_BY_NODE
+from models import StartResponse, ChatRequest, ChatResponse, QueueTicket, RetriageRequest, extract_view
+from checkpointer import create_checkpointer_pool, build_checkpointer, pool_stats
+from llm_orchestration.prompt_cache import prompt_cache_stats
+from llm_orchestration.usage import session_usage
+from llm_orchestration.demographics_parser import fast_path_stats
+from llm_orchestration.red_flags import red_flag_stats
+from llm_orchestration.symptom_index import symptom_index_stats
+from llm_orchestration.llm import get_llm, llm_ready, response_cache
+from llm_orchestration.model_tiers import tier_stats
+from llm_orchestration.admission import LLMBusy, background_priority, llm_scheduler
+from llm_orchestration.resilience import LLMUnavailable, resilience_stats
+from session_pool import create_session_pool
+from retention import RetentionJob, retention_policy, archive_session
+from usage_report import usage_summary
+from export import EXPORT_FORMATS, ExportUnavailable, create_export_pool, export_batch_size, export_filters, export_stream, load_pyarrow
+from retriage import RetriageRunner, create_job, job_report, job_results, retriage_config, set_status
+from migrate import check_schema, migrate, schema_status
+from session_lock import SessionBusy, create_lock_pool, create_session_locks
+from idempotency import IdempotencyStore
+from clinic_queue import create_clinic_queue
+from session_cache import SessionSnapshot, create_session_cache, new_run, collect_run_event
 
 load_dotenv()
 
 clinical_assistant_graph = None
+checkpointer_pool = None
+session_pool = None
+retention_job = None
+retriage_runner = None
+export_pool = None
+session_cache = create_session_cache()
+# Replaced by Postgres-backed versions at startup; in-process only until then (e.g. the benchmark)
+session_locks = create_session_locks(None)
+idempotency_store = IdempotencyStore(None)
+clinic_queue = create_clinic_queue(None)
+
+# Stream modes needed to rebuild the latest state from the run itself (see collect_run_event)
+RUN_STREAM_MODES = ["updates", "values", "tasks"]
+
+# Startup progress reported by /readyz; requests are only routed here once all are true
+readiness = {"schema": False, "graph": False}
+
+async def warm_up(saver):
+    """Build the LLM clients off the event loop, then start pre-warming sessions"""
+    global session_pool
+    started = time.perf_counter()
+    await asyncio.to_thread(get_llm)
+    print(f"LLM clients ready in {time.perf_counter() - started:.2f}s")
+    session_pool = create_session_pool(prewarm_session, saver.adelete_thread)
+    await session_pool.start()
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    global clinical_assistant_graph
+    global clinical_assistant_graph, checkpointer_pool, retention_job, retriage_runner, session_locks, idempotency_store, clinic_queue, export_pool
     db_url = os.environ["DATABASE_URL"]
-    with PostgresSaver.from_conn_string(db_url) as saver:
-        saver.setup()  # creates tables if needed
-        clinical_assistant_graph = build_clinical_assistant_graph(checkpointer=saver)
+    async with (
+        create_checkpointer_pool(db_url) as pool,
+        create_lock_pool(db_url) as lock_pool,
+        create_export_pool(db_url) as reporting_pool,
+    ):
+        checkpointer_pool = pool
+        export_pool = reporting_pool
+        saver = build_checkpointer(pool)
+        # DDL runs once per deploy (`python migrate.py`); workers only check the version
+        if os.getenv("MIGRATE_ON_STARTUP", "false").lower() == "true":
+            await migrate(pool)
+        await check_schema(pool)
+        readiness["schema"] = True
+        session_locks = create_session_locks(lock_pool)
+        idempotency_store = IdempotencyStore(pool)
+        clinic_queue = create_clinic_queue(pool)
+        clinical_assistant_graph = build_clinical_assistant_graph(
+            checkpointer=saver,
+            fused_turns=os.getenv("FUSED_TURNS", "false").lower() == "true",
+        )
+        readiness["graph"] = True
+        warm_up_task = asyncio.create_task(warm_up(saver))
+        retention_job = RetentionJob(pool, retention_policy(), clinical_assistant_graph)
+        await retention_job.start()
+        retriage_runner = RetriageRunner(pool, saver)
         yield
+        warm_up_task.cancel()
+        await retriage_runner.stop()
+        await retention_job.stop()
+        if session_pool is not None:
+            await session_pool.stop()
 
 app = FastAPI(lifespan=lifespan)
 app.add_middleware(
@@ -31,26 +111,9 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Retry-After"],
 )
 
-PHASE_BY_NODE = {
-    # Phase 1
-    "ask_patient_info": "Gathering patient demographic details",
-    "human_patient_info_node": "Gathering patient demographic details",
-    "extract_patient_info": "Gathering patient demographic details",
-    # Phase 2
-    "ask_symptoms": "Symptoms collection",
-    "human_symptoms_node": "Symptoms collection",
-    "extract_symptoms": "Symptoms collection",
-    # Phase 3
-    "ask_medhist": "Medical/health history",
-    "human_medhist_node": "Medical/health history",
-    "extract_medhist": "Medical/health history",
-    # Phase 4
-    "triage_summary": "Triage & summary",
-    "acknowledgement": "Triage & summary",
-}
-
 def phase_from_next(snapshot) -> str:
     if not snapshot.next:
         return "Complete"
@@ -60,88 +123,470 @@ def phase_from_next(snapshot) -> str:
             return PHASE_BY_NODE[node]
     return "Unknown"
 
-def extract_view(state: dict) -> dict:
-    return {
-        "patient_name": state.get("patient_name"),
-        "patient_age": state.get("patient_age"),
-        "patient_sex": state.get("patient_sex"),
-        "main_symptoms": state.get("main_symptoms", []),
-        "symptom_onset": state.get("symptom_onset"),
-        "associated_symptoms": state.get("associated_symptoms", []),
-        "additional_symptom_info": state.get("additional_symptom_info", []),
-        "medical_history": state.get("medical_history", []),
-        "generated_summary": state.get("generated_summary"),
-    }
-
-# def last_ai_from_stream(stream_iter):
-#     last = None
-#     for message, meta in stream_iter:
-#         if message.content:
-#             # Filter to user-facing nodes only
-#             node = meta.get("langgraph_node")
-#             if node in {"ask_patient_info", "ask_symptoms", "ask_medhist", "acknowledgement"}:
-#                 last = message.content
-#                 yield last
-#     return last
+# Nodes whose LLM output is shown to the patient; everything else is structured extraction
+USER_FACING_NODES = {"ask_patient_info", "ask_symptoms", "ask_medhist", "acknowledgement"}
+# Fused-turn nodes produce their question inside a structured call, so it can only be sent whole
+FUSED_TURN_NODES = {"symptoms_turn", "medhist_turn"}
 
-@app.post("/api/chat/start", response_model=StartResponse)
-def start_chat():
-    session_id = str(uuid.uuid4())
-    config = thread_config(session_id)
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
 
-    for events in clinical_assistant_graph.stream({"messages": []}, config, stream_mode="updates"):
-        for key, value in events.items():
-            if key != '__interrupt__' and isinstance(value, dict) and 'messages' in value:
-                messages = value['messages']
-                break
-    
-    snapshot = clinical_assistant_graph.get_state(config)
-    
-    return StartResponse(
-        session_id=session_id, 
-        assistant_message=messages[-1].content, 
-        state=extract_view(snapshot.values), 
-        phase=phase_from_next(snapshot), 
-        is_complete=not snapshot.next
-    )
-
-@app.post("/api/chat/reply", response_model=ChatResponse)
-def chat_reply(request: ChatRequest):
-    config = thread_config(request.session_id)
+async def run_snapshot(session_id: str, run: dict):
+    """Latest state after a run, written through to the session cache"""
+    if run["values"] is None:
+        return await load_snapshot(session_id)
+    snapshot = SessionSnapshot(values=run["values"], next=tuple(run["next"]))
+    session_cache.put(session_id, snapshot)
+    return snapshot
 
-    messages = None
-    for events in clinical_assistant_graph.stream(Command(resume=request.message), config, stream_mode="updates"):
-        for key, value in events.items():
-            if key != '__interrupt__' and isinstance(value, dict) and 'messages' in value:
-                messages = value['messages'] 
-                break
+async def load_snapshot(session_id: str):
+    """Latest state from the session cache, falling back to the checkpointer"""
+    snapshot = session_cache.get(session_id)
+    if snapshot is None:
+        snapshot = await clinical_assistant_graph.aget_state(thread_config(session_id))
+        if snapshot.values:
+            session_cache.put(session_id, snapshot)
+    return snapshot
 
-    snapshot = clinical_assistant_graph.get_state(config)
+async def build_reply_response(session_id: str, messages, snapshot) -> ChatResponse:
     is_complete = not snapshot.next
 
     if is_complete:
         final_state = extract_view(snapshot.values)
-        # clinical_assistant_graph.checkpointer.delete_thread(request.session_id)
-        
-        closing = (
-            f"Thank you for using ClinicAssist. Your information has been captured and will be sent to the doctor. "
-            f"Your queue number is XX."
-        )
+        # Keep the outcome; the retention job compacts this thread's checkpoints later
+        if checkpointer_pool is not None:
+            await archive_session(
+                checkpointer_pool, session_id, jsonable_encoder(final_state), session_usage(snapshot.values)
+            )
+        ticket = await clinic_queue.enqueue(session_id, jsonable_encoder(final_state))
+
+        if snapshot.values.get("red_flags"):
+            closing = (
+                f"Some of what you described needs urgent attention. Please tell the clinic staff right away. "
+                f"Your information has been sent to the doctor as a priority. "
+                f"Your queue number is {ticket['ticket_number']}."
+            )
+        else:
+            closing = (
+                f"Thank you for using ClinicAssist. Your information has been captured and will be sent to the doctor. "
+                f"Your queue number is {ticket['ticket_number']}, and you are number {ticket['position']} in line."
+            )
         return ChatResponse(
-            session_id=request.session_id,
+            session_id=session_id,
             assistant_message=closing,
             state=final_state,
             phase="Complete",
             is_complete=True,
+            expedited=bool(snapshot.values.get("red_flags")),
+            queue=QueueTicket(**ticket),
+            usage=session_usage(snapshot.values),
         )
 
     return ChatResponse(
-        session_id=request.session_id,
+        session_id=session_id,
         assistant_message=messages[-1].content if messages else None,
         state=extract_view(snapshot.values),
         phase=phase_from_next(snapshot),
         is_complete=False,
+        expedited=bool(snapshot.values.get("red_flags")),
+        usage=session_usage(snapshot.values),
+    )
+
+async def start_session() -> StartResponse:
+    """Create a session and run it up to the first patient-info interrupt"""
+    session_id = str(uuid.uuid4())
+    config = thread_config(session_id)
+
+    run = new_run()
+    async for mode, payload in clinical_assistant_graph.astream({"messages": []}, config, stream_mode=RUN_STREAM_MODES):
+        collect_run_event(run, mode, payload)
+    
+    snapshot = await run_snapshot(session_id, run)
+    
+    return StartResponse(
+        session_id=session_id, 
+        assistant_message=run["messages"][-1].content, 
+        state=extract_view(snapshot.values), 
+        phase=phase_from_next(snapshot), 
+        is_complete=not snapshot.next,
+        usage=session_usage(snapshot.values),
+    )
+
+async def prewarm_session() -> StartResponse:
+    # Pre-warming yields to patients already waiting on the LLM
+    with background_priority():
+        return await start_session()
+
+def admit():
+    """Fail fast with 503 + Retry-After while the LLM queue is past its threshold"""
+    try:
+        llm_scheduler.check_admission()
+    except LLMBusy as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+@app.post("/api/chat/start", response_model=StartResponse)
+async def start_chat():
+    pooled = session_pool.take() if session_pool is not None else None
+    if pooled is not None:
+        return pooled
+    admit()
+    try:
+        return await start_session()
+    except LLMUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+async def replayed_response(request: ChatRequest):
+    """The stored response for a repeated idempotency_key, if any"""
+    if request.idempotency_key is None:
+        return None
+    stored = await idempotency_store.get(request.session_id, request.idempotency_key)
+    return ChatResponse.model_validate(stored) if stored is not None else None
+
+async def remember_response(request: ChatRequest, response: ChatResponse):
+    if request.idempotency_key is not None:
+        await idempotency_store.put(request.session_id, request.idempotency_key, response.model_dump(mode="json"))
+
+@app.post("/api/chat/reply", response_model=ChatResponse)
+async def chat_reply(request: ChatRequest):
+    config = thread_config(request.session_id)
+    admit()
+
+    # One run per session at a time, across workers; a duplicate waits, then gets the stored reply
+    try:
+        async with session_locks.hold(request.session_id):
+            stored = await replayed_response(request)
+            if stored is not None:
+                return stored
+
+            session_cache.invalidate(request.session_id)
+            run = new_run()
+            async for mode, payload in clinical_assistant_graph.astream(Command(resume=request.message), config, stream_mode=RUN_STREAM_MODES):
+                collect_run_event(run, mode, payload)
+
+            snapshot = await run_snapshot(request.session_id, run)
+            response = await build_reply_response(request.session_id, run["messages"], snapshot)
+            await remember_response(request, response)
+            return response
+    except SessionBusy as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    except LLMUnavailable as e:
+        # The reply is already saved; sending it again resumes from the failed step
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+@app.post("/api/chat/reply/stream")
+async def chat_reply_stream(request: ChatRequest):
+    """Server-Sent Events variant of /api/chat/reply.
+
+    Emits `token` events as user-facing nodes generate, a `phase` event whenever
+    a node finishes, a `red_flag` event as soon as a reply is screened as an emergency,
+    and a final `done` event carrying the full ChatResponse.
+    """
+    config = thread_config(request.session_id)
+    admit()
+
+    async def event_stream():
+        try:
+            async with session_locks.hold(request.session_id):
+                stored = await replayed_response(request)
+                if stored is not None:
+                    yield sse_event("done", stored.model_dump(mode="json"))
+                    return
+
+                session_cache.invalidate(request.session_id)
+                run = new_run()
+                async for mode, payload in clinical_assistant_graph.astream(
+                    Command(resume=request.message), config, stream_mode=["messages", *RUN_STREAM_MODES]
+                ):
+                    collect_run_event(run, mode, payload)
+                    if mode == "messages":
+                        chunk, meta = payload
+                        node = meta.get("langgraph_node")
+                        if node in USER_FACING_NODES and chunk.content:
+                            yield sse_event("token", {"id": chunk.id, "node": node, "content": chunk.content})
+                        continue
+                    if mode != "updates":
+                        continue
+
+                    for key, value in payload.items():
+                        if key == '__interrupt__':
+                            continue
+                        if isinstance(value, dict) and value.get('red_flags'):
+                            # Flag the case before expedited triage has finished
+                            yield sse_event("red_flag", {"node": key, "red_flags": value['red_flags']})
+                        if isinstance(value, dict) and 'messages' in value:
+                            messages = value['messages']
+                            if key in FUSED_TURN_NODES:
+                                last = messages[-1]
+                                yield sse_event("token", {"id": last.id, "node": key, "content": last.content})
+                        yield sse_event("phase", {"node": key, "phase": PHASE_BY_NODE.get(key, "Unknown")})
+
+                snapshot = await run_snapshot(request.session_id, run)
+                response = await build_reply_response(request.session_id, run["messages"], snapshot)
+                await remember_response(request, response)
+                yield sse_event("done", response.model_dump(mode="json"))
+        except SessionBusy as e:
+            yield sse_event("error", {"detail": str(e), "busy": True})
+        except LLMUnavailable as e:
+            yield sse_event("error", {"detail": str(e), "busy": True, "retry_after": e.retry_after})
+        except Exception as e:
+            yield sse_event("error", {"detail": str(e)})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.get("/api/chat/{session_id}", response_model=ChatResponse)
+async def get_chat(session_id: str, request: Request, response: Response):
+    """Current session state, served from the session cache with ETag revalidation"""
+    snapshot = await load_snapshot(session_id)
+    if not snapshot.values:
+        raise HTTPException(status_code=404, detail="Session not found")
+
+    ai_messages = [m for m in snapshot.values.get("messages", []) if m.type == "ai"]
+    # Completed sessions report their live queue position
+    ticket = await clinic_queue.ticket(session_id) if not snapshot.next else None
+    body = ChatResponse(
+        session_id=session_id,
+        assistant_message=ai_messages[-1].content if ai_messages else None,
+        state=extract_view(snapshot.values),
+        phase=phase_from_next(snapshot),
+        is_complete=not snapshot.next,
+        expedited=bool(snapshot.values.get("red_flags")),
+        queue=QueueTicket(**ticket) if ticket else None,
+        usage=session_usage(snapshot.values),
     )
+    etag = '"' + hashlib.sha256(body.model_dump_json().encode()).hexdigest()[:32] + '"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"
+    return body
+
+@app.post("/api/queue/next")
+async def call_next_patient():
+    """Call the most urgent waiting patient, removing them from the queue"""
+    patient = await clinic_queue.pop()
+    if patient is None:
+        raise HTTPException(status_code=404, detail="No patients waiting")
+    return patient
+
+@app.get("/api/queue/peek")
+async def peek_queue(limit: int = 1):
+    """The next patients to be called, without calling them"""
+    return {"patients": await clinic_queue.peek(min(max(limit, 1), 100))}
+
+@app.get("/api/queue")
+async def list_queue(after: int = None, limit: int = 50):
+    """Waiting patients in call order; pass the previous page's next_after to continue"""
+    return await clinic_queue.page(after, min(max(limit, 1), 500))
+
+@app.get("/api/queue/{session_id}", response_model=QueueTicket)
+async def get_queue_ticket(session_id: str):
+    ticket = await clinic_queue.ticket(session_id)
+    if ticket is None:
+        raise HTTPException(status_code=404, detail="Session is not in the queue")
+    return ticket
+
+@app.get("/healthz")
+async def healthz():
+    """Liveness: the process is up and serving"""
+    return {"status": "ok"}
+
+@app.get("/readyz")
+async def readyz(response: Response):
+    """Readiness: schema checked, graph built, LLM clients warmed up and the database reachable"""
+    checks = {**readiness, "llm": llm_ready(), "database": False}
+    if checkpointer_pool is not None:
+        try:
+            async with checkpointer_pool.connection(timeout=2) as conn:
+                await conn.execute("SELECT 1")
+            checks["database"] = True
+        except Exception as e:
+            print(f"Readiness database check failed: {e}")
+    ready = all(checks.values())
+    if not ready:
+        response.status_code = 503
+    return {"status": "ready" if ready else "starting", "checks": checks}
+
+@app.get("/api/schema")
+async def get_schema_status():
+    if checkpointer_pool is None:
+        raise HTTPException(status_code=503, detail="Checkpointer pool not initialised")
+    return await schema_status(checkpointer_pool)
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Prometheus exposition of node, LLM and checkpointer metrics"""
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+@app.get("/api/metrics/session-cache")
+async def session_cache_metrics():
+    return session_cache.snapshot()
+
+@app.get("/api/checkpointer/pool")
+async def checkpointer_pool_stats():
+    if checkpointer_pool is None:
+        raise HTTPException(status_code=503, detail="Checkpointer pool not initialised")
+    return pool_stats(checkpointer_pool)
+
+@app.get("/api/metrics/prompt-cache")
+async def prompt_cache_metrics():
+    return prompt_cache_stats.snapshot()
+
+@app.get("/api/metrics/demographics-parser")
+async def demographics_parser_metrics():
+    total = fast_path_stats["hits"] + fast_path_stats["fallbacks"]
+    return {**fast_path_stats, "coverage": fast_path_stats["hits"] / total if total else 0.0}
+
+@app.get("/api/metrics/red-flags")
+async def red_flag_metrics():
+    scanned = red_flag_stats["messages_scanned"]
+    return {**red_flag_stats, "flag_rate": red_flag_stats["messages_flagged"] / scanned if scanned else 0.0}
+
+@app.get("/api/metrics/symptom-index")
+async def symptom_index_metrics():
+    lookups = symptom_index_stats["lookups"]
+    matched = symptom_index_stats["exact"] + symptom_index_stats["fuzzy"]
+    return {**symptom_index_stats, "match_rate": matched / lookups if lookups else 0.0}
+
+@app.get("/api/metrics/clinic-queue")
+async def clinic_queue_metrics():
+    return clinic_queue.snapshot()
+
+@app.get("/api/metrics/llm-cache")
+async def llm_cache_metrics():
+    return response_cache.snapshot()
+
+@app.get("/api/metrics/llm-scheduler")
+async def llm_scheduler_metrics():
+    return llm_scheduler.snapshot()
+
+@app.get("/api/metrics/llm-resilience")
+async def llm_resilience_metrics():
+    return resilience_stats.snapshot()
+
+@app.get("/api/metrics/model-tiers")
+async def model_tier_metrics():
+    return tier_stats.snapshot()
+
+@app.get("/api/metrics/session-locks")
+async def session_lock_metrics():
+    return {**session_locks.snapshot(), "idempotency": idempotency_store.stats}
+
+@app.get("/api/metrics/session-pool")
+async def session_pool_metrics():
+    if session_pool is None:
+        raise HTTPException(status_code=503, detail="Session pool not initialised")
+    return session_pool.snapshot()
+
+@app.get("/api/usage")
+async def usage_report(hours: float = 24, top: int = 10):
+    """Token/cost totals, per-phase breakdown and most expensive sessions completed in the last `hours`"""
+    if checkpointer_pool is None:
+        raise HTTPException(status_code=503, detail="Checkpointer pool not initialised")
+    since = datetime.now(timezone.utc) - timedelta(hours=hours)
+    return await usage_summary(checkpointer_pool, since, top)
+
+@app.get("/api/retention")
+async def retention_status():
+    if retention_job is None:
+        raise HTTPException(status_code=503, detail="Retention job not initialised")
+    return retention_job.snapshot()
+
+@app.post("/api/retention/run")
+async def run_retention_now():
+    if retention_job is None:
+        raise HTTPException(status_code=503, detail="Retention job not initialised")
+    return await retention_job.run_once()
+
+@app.get("/api/export")
+async def export_sessions(format: str = "ndjson", since: str = None, until: str = None, urgency: str = None,
+                          after: str = None, transcript: bool = True):
+    """Stream completed sessions as NDJSON or Parquet, oldest first; `after` resumes past a record"""
+    if export_pool is None:
+        raise HTTPException(status_code=503, detail="Export pool not initialised")
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(EXPORT_FORMATS)}")
+    try:
+        filters = export_filters(since, until, urgency, after)
+        if format == "parquet":
+            load_pyarrow()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ExportUnavailable as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    # Taken before responding, so a full export pool is a 503 rather than a broken stream
+    try:
+        conn = await export_pool.getconn(timeout=5)
+    except PoolTimeout:
+        raise HTTPException(status_code=503, detail="Too many exports in progress", headers={"Retry-After": "30"})
+
+    async def body():
+        try:
+            async for chunk in export_stream(conn, filters, format, transcript, export_batch_size()):
+                yield chunk
+        finally:
+            await export_pool.putconn(conn)
+
+    return StreamingResponse(
+        body(),
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="clinicassist-sessions.{format}"'},
+    )
+
+@app.post("/api/retriage")
+async def start_retriage(request: RetriageRequest):
+    """Start re-running triage_summary over completed sessions in the background"""
+    if retriage_runner is None:
+        raise HTTPException(status_code=503, detail="Retriage runner not initialised")
+    overrides = request.model_dump()
+    if request.since is not None:
+        overrides["since"] = request.since.isoformat()
+    job_id = await create_job(checkpointer_pool, retriage_config(**overrides))
+    retriage_runner.start(job_id)
+    return await job_report(checkpointer_pool, job_id)
+
+@app.get("/api/retriage/{job_id}")
+async def retriage_status(job_id: str):
+    """Progress of a re-triage job and the urgency diff against the original summaries"""
+    if checkpointer_pool is None:
+        raise HTTPException(status_code=503, detail="Checkpointer pool not initialised")
+    report = await job_report(checkpointer_pool, job_id)
+    if report is None:
+        raise HTTPException(status_code=404, detail="Retriage job not found")
+    return {**report, "running_here": retriage_runner.running(job_id)}
+
+@app.get("/api/retriage/{job_id}/results")
+async def retriage_results(job_id: str, changed_only: bool = True, after: str = None, limit: int = 100):
+    """Per-session results in thread_id order; pass the last thread_id as `after` for the next page"""
+    if checkpointer_pool is None:
+        raise HTTPException(status_code=503, detail="Checkpointer pool not initialised")
+    return await job_results(checkpointer_pool, job_id, changed_only, after, min(limit, 1000))
+
+@app.post("/api/retriage/{job_id}/resume")
+async def resume_retriage(job_id: str):
+    """Continue a cancelled, failed or interrupted job from its last committed page"""
+    if retriage_runner is None:
+        raise HTTPException(status_code=503, detail="Retriage runner not initialised")
+    report = await job_report(checkpointer_pool, job_id)
+    if report is None:
+        raise HTTPException(status_code=404, detail="Retriage job not found")
+    if report["status"] == "completed":
+        raise HTTPException(status_code=409, detail="Retriage job already completed")
+    retriage_runner.start(job_id)
+    return {**report, "running_here": True}
+
+@app.post("/api/retriage/{job_id}/cancel")
+async def cancel_retriage(job_id: str):
+    """Stop a job after its current page; it can be resumed later"""
+    if checkpointer_pool is None:
+        raise HTTPException(status_code=503, detail="Checkpointer pool not initialised")
+    if await job_report(checkpointer_pool, job_id) is None:
+        raise HTTPException(status_code=404, detail="Retriage job not found")
+    await set_status(checkpointer_pool, job_id, "cancelled")
+    return await job_report(checkpointer_pool, job_id)
 
 # # Manual end checkpoint
 # @app.post("/api/chat/end", response_model=ChatResponse)
@@ -0,0 +1,109 @@
+import argparse
+import asyncio
+import os
+from psycopg_pool import AsyncConnectionPool
+
+from checkpointer import create_checkpointer_pool, build_checkpointer
+from llm_orchestration.clinical_assistant_graph import build_clinical_assistant_graph
+from retention import setup_retention, backfill_archive
+from export import setup_export
+from retriage import setup_retriage
+from idempotency import IdempotencyStore
+from clinic_queue import ClinicQueue
+from session_lock import LOCK_NAMESPACE
+
+from dotenv import load_dotenv
+load_dotenv()
+
+# Bump whenever a setup step below adds or changes DDL, so workers refuse to serve an old schema
+SCHEMA_VERSION = 3
+
+SETUP_SQL = """
+CREATE TABLE IF NOT EXISTS clinicassist_schema (
+    id INT PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+    version INT NOT NULL,
+    migrated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+"""
+
+class SchemaOutOfDate(Exception):
+    """Raised at startup when the database has not been migrated to this build's schema."""
+
+async def migrate(pool: AsyncConnectionPool):
+    """Create or upgrade every table the service uses, backfill session_archive, then record SCHEMA_VERSION.
+
+    Serialized with an advisory lock, so concurrent deploys migrate once.
+    """
+    async with pool.connection() as conn:
+        await conn.execute("SELECT pg_advisory_lock(%s, hashtext('schema-migration'))", (LOCK_NAMESPACE,))
+        try:
+            await build_checkpointer(pool).setup()
+            await setup_retention(pool)
+            await setup_export(pool)
+            await setup_retriage(pool)
+            await IdempotencyStore(pool).setup()
+            await ClinicQueue(pool).setup()
+            await conn.execute(SETUP_SQL)
+            # Sessions completed before they were archived on completion (or whose archive write
+            # failed) are archived from their checkpoints, so retention compacts them instead of purging
+            archived = await backfill_archive(pool, build_clinical_assistant_graph(build_checkpointer(pool)))
+            if archived:
+                print(f"Archived {archived} completed sessions found only in the checkpointer")
+            await conn.execute(
+                "INSERT INTO clinicassist_schema (version) VALUES (%s) "
+                "ON CONFLICT (id) DO UPDATE SET version = EXCLUDED.version, migrated_at = now()",
+                (SCHEMA_VERSION,),
+            )
+        finally:
+            await conn.execute("SELECT pg_advisory_unlock(%s, hashtext('schema-migration'))", (LOCK_NAMESPACE,))
+
+async def schema_status(pool: AsyncConnectionPool) -> dict:
+    """Schema version recorded in the database against the one this build expects."""
+    async with pool.connection() as conn:
+        cur = await conn.execute(
+            "SELECT to_regclass('clinicassist_schema') IS NOT NULL AS has_schema, "
+            "to_regclass('checkpoint_migrations') IS NOT NULL AS has_checkpoints"
+        )
+        tables = await cur.fetchone()
+        version = checkpoint_version = None
+        if tables["has_schema"]:
+            cur = await conn.execute("SELECT version FROM clinicassist_schema")
+            row = await cur.fetchone()
+            version = row["version"] if row else None
+        if tables["has_checkpoints"]:
+            cur = await conn.execute("SELECT max(v) AS v FROM checkpoint_migrations")
+            checkpoint_version = (await cur.fetchone())["v"]
+    from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver  # kept off the API's import path
+    expected_checkpoint_version = len(AsyncPostgresSaver.MIGRATIONS) - 1
+    return {
+        "version": version,
+        "expected_version": SCHEMA_VERSION,
+        "checkpoint_version": checkpoint_version,
+        "expected_checkpoint_version": expected_checkpoint_version,
+        "up_to_date": version == SCHEMA_VERSION and checkpoint_version == expected_checkpoint_version,
+    }
+
+async def check_schema(pool: AsyncConnectionPool) -> dict:
+    status = await schema_status(pool)
+    if not status["up_to_date"]:
+        raise SchemaOutOfDate(
+            f"Database schema is at version {status['version']} (checkpoints {status['checkpoint_version']}), "
+            f"this build needs {status['expected_version']} (checkpoints {status['expected_checkpoint_version']}). "
+            f"Run `python migrate.py` or set MIGRATE_ON_STARTUP=true."
+        )
+    return status
+
+async def main(argv=None):
+    parser = argparse.ArgumentParser(description="Create or upgrade the ClinicAssist database schema.")
+    parser.add_argument("--check", action="store_true", help="Only report whether the schema is up to date")
+    args = parser.parse_args(argv)
+
+    async with create_checkpointer_pool(os.environ["DATABASE_URL"]) as pool:
+        if not args.check:
+            await migrate(pool)
+        status = await schema_status(pool)
+    print(status)
+    return 0 if status["up_to_date"] else 1
+
+if __name__ == "__main__":
+    raise SystemExit(asyncio.run(main()))
@@ -1,6 +1,8 @@
 from pydantic import BaseModel, Field
-from typing import Literal, Optional, List, Dict, Any
+from datetime import datetime
+from typing import Annotated, Literal, Optional, List, Dict, Any
 from langgraph.graph import MessagesState
+from llm_orchestration.usage import merge_usage
 
 # Models for building langgraph worflow
 class PatientInfoPartial(BaseModel):
@@ -17,6 +19,14 @@ class SymptomsPartial(BaseModel):
 class SymptomSufficiencyCheck(BaseModel):
     is_sufficient: bool = Field(description="Whether the information provided is sufficient for first assessment by doctor")
     reason: Optional[str] = Field(description="Why more info is needed, or None if sufficient")
+    confidence: Optional[float] = Field(default=None, description="Your confidence in this verdict, from 0 (guessing) to 1 (certain)")
+
+class SymptomsTurn(SymptomsPartial):
+    """Fused Phase 2 turn: extraction, sufficiency verdict and next question in one call"""
+    is_sufficient: bool = Field(description="Whether the information collected so far is sufficient for first assessment by doctor")
+    reason: Optional[str] = Field(description="Why more info is needed, or None if sufficient")
+    next_question: Optional[str] = Field(description="Next question to ask the patient, or None if sufficient")
+    confidence: Optional[float] = Field(default=None, description="Your confidence in this verdict, from 0 (guessing) to 1 (certain)")
 
 class MedHistoryFact(BaseModel):
     category: Literal["allergy","medication","past_condition","surgery",
@@ -25,9 +35,45 @@ class MedHistoryFact(BaseModel):
     answer: str
     additional_details: Optional[str] = None
 
+class MedHistoryFacts(BaseModel):
+    """Every medical history fact stated in the patient's latest reply"""
+    facts: List[MedHistoryFact] = Field(default_factory=list, description="One entry per distinct fact; empty if the reply has none")
+
 class MedHistorySufficiencyCheck(BaseModel):
     is_sufficient: bool
     reason: Optional[str] = None
+    confidence: Optional[float] = Field(default=None, description="Your confidence in this verdict, from 0 (guessing) to 1 (certain)")
+
+class MedHistoryTurn(BaseModel):
+    """Fused Phase 3 turn: extraction, sufficiency verdict and next question in one call"""
+    facts: List[MedHistoryFact] = Field(default_factory=list, description="Every new fact stated in the patient's latest reply; empty if none")
+    is_sufficient: bool = Field(description="Whether the medical and health history collected so far is sufficient")
+    reason: Optional[str] = None
+    next_question: Optional[str] = Field(default=None, description="Next question to ask the patient, or None if sufficient")
+    confidence: Optional[float] = Field(default=None, description="Your confidence in this verdict, from 0 (guessing) to 1 (certain)")
+
+# Higher is more urgent
+URGENCY_RANK = {"NON-URGENT": 0, "SEMI-URGENT": 1, "URGENT": 2, "EMERGENCY": 3}
+
+PHASE_BY_NODE = {
+    # Phase 1
+    "ask_patient_info": "Gathering patient demographic details",
+    "human_patient_info_node": "Gathering patient demographic details",
+    "extract_patient_info": "Gathering patient demographic details",
+    # Phase 2
+    "ask_symptoms": "Symptoms collection",
+    "human_symptoms_node": "Symptoms collection",
+    "extract_symptoms": "Symptoms collection",
+    "symptoms_turn": "Symptoms collection",
+    # Phase 3
+    "ask_medhist": "Medical/health history",
+    "human_medhist_node": "Medical/health history",
+    "extract_medhist": "Medical/health history",
+    "medhist_turn": "Medical/health history",
+    # Phase 4
+    "triage_summary": "Triage & summary",
+    "acknowledgement": "Triage & summary",
+}
 
 class TriageSummary(BaseModel):
     probable_diagnosis: str = Field(description="The likely diagnosis for the patient based on the conversation and medical history.")
@@ -47,6 +93,16 @@ class AgentState(MessagesState):
     additional_symptom_info: list[str]
     medical_history: List[MedHistoryFact]
     generated_summary: TriageSummary
+    # Rolling summary of turns dropped from prompts, covering messages[:summarized_upto]
+    conversation_summary: str
+    summarized_upto: int
+    # Verdicts from the fused-turn nodes, used for routing
+    symptoms_sufficient: bool
+    medhist_sufficient: bool
+    # Emergency red flags found in the patient's replies; any sends the session straight to triage
+    red_flags: List[Dict[str, str]]
+    # Tokens, LLM calls, patient turns and cost per phase and in total (see llm_orchestration/usage.py)
+    usage: Annotated[dict, merge_usage]
 
 
 # Models for FastAPI endpoints
@@ -56,14 +112,50 @@ class StartResponse(BaseModel):
     state: Dict[str, Any]
     phase: str
     is_complete: bool
+    usage: Optional[Dict[str, Any]] = None
 
 class ChatRequest(BaseModel):
     session_id: str
     message: str
+    # Client-generated per message; a repeat returns the stored response instead of re-running the graph
+    idempotency_key: Optional[str] = None
+
+class QueueTicket(BaseModel):
+    ticket_number: int
+    position: int = Field(description="1 for the next patient to be seen")
+    urgency: str
 
 class ChatResponse(BaseModel):
     session_id: str
     assistant_message: Optional[str]
     state: Dict[str, Any]
     phase: str
-    is_complete: bool
\ No newline at end of file
+    is_complete: bool
+    # True once a red flag has sent the session to expedited triage
+    expedited: bool = False
+    usage: Optional[Dict[str, Any]] = None
+    # Set on the closing response: the patient's ticket and place in the clinic queue
+    queue: Optional[QueueTicket] = None
+
+class RetriageRequest(BaseModel):
+    # Unset fields fall back to RETRIAGE_* settings (see retriage.py)
+    concurrency: Optional[int] = Field(default=None, ge=1)
+    requests_per_second: Optional[float] = Field(default=None, ge=0)
+    batch_size: Optional[int] = Field(default=None, ge=1)
+    limit: Optional[int] = Field(default=None, ge=1)
+    since: Optional[datetime] = None
+
+# Session fields returned by the API and archived when a session completes
+def extract_view(state: dict) -> dict:
+    return {
+        "patient_name": state.get("patient_name"),
+        "patient_age": state.get("patient_age"),
+        "patient_sex": state.get("patient_sex"),
+        "main_symptoms": state.get("main_symptoms", []),
+        "symptom_onset": state.get("symptom_onset"),
+        "associated_symptoms": state.get("associated_symptoms", []),
+        "additional_symptom_info": state.get("additional_symptom_info", []),
+        "medical_history": state.get("medical_history", []),
+        "generated_summary": state.get("generated_summary"),
+        "red_flags": state.get("red_flags", []),
+    }
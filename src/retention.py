@@ -0,0 +1,257 @@
+import asyncio
+import os
+from dataclasses import dataclass
+from fastapi.encoders import jsonable_encoder
+from psycopg.types.json import Jsonb
+from psycopg_pool import AsyncConnectionPool
+
+from models import extract_view
+from idempotency import purge_idempotency_keys
+from llm_orchestration.usage import session_usage
+from llm_orchestration.clinical_assistant_graph import thread_config
+
+from dotenv import load_dotenv
+load_dotenv()
+
+# Completed sessions are archived here with their final extract_view payload, so their
+# intermediate checkpoints can be deleted without losing the outcome.
+SETUP_SQL = """
+CREATE TABLE IF NOT EXISTS session_archive (
+    thread_id TEXT PRIMARY KEY,
+    completed_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    payload JSONB NOT NULL,
+    compacted BOOLEAN NOT NULL DEFAULT false
+);
+CREATE INDEX IF NOT EXISTS session_archive_pending_idx ON session_archive (completed_at) WHERE NOT compacted;
+ALTER TABLE session_archive ADD COLUMN IF NOT EXISTS usage JSONB;
+"""
+
+CHECKPOINT_TABLES = ("checkpoints", "checkpoint_blobs", "checkpoint_writes")
+
+@dataclass
+class RetentionPolicy:
+    idle_ttl_seconds: float = 24 * 3600        # purge unfinished sessions idle for longer than this
+    keep_final_checkpoint: bool = True         # keep the last checkpoint (transcript) of completed sessions
+    batch_size: int = 100                      # threads handled per batch/transaction
+    interval_seconds: float = 15 * 60          # how often the background job runs
+    idempotency_ttl_seconds: float = 24 * 3600 # how long replies are kept for idempotent retries
+
+def retention_policy() -> RetentionPolicy:
+    return RetentionPolicy(
+        idle_ttl_seconds=float(os.getenv("RETENTION_IDLE_TTL_SECONDS", str(24 * 3600))),
+        keep_final_checkpoint=os.getenv("RETENTION_KEEP_FINAL_CHECKPOINT", "true").lower() == "true",
+        batch_size=int(os.getenv("RETENTION_BATCH_SIZE", "100")),
+        interval_seconds=float(os.getenv("RETENTION_INTERVAL_SECONDS", str(15 * 60))),
+        idempotency_ttl_seconds=float(os.getenv("IDEMPOTENCY_TTL_SECONDS", str(24 * 3600))),
+    )
+
+async def setup_retention(pool: AsyncConnectionPool):
+    async with pool.connection() as conn:
+        await conn.execute(SETUP_SQL)
+
+async def archive_session(pool: AsyncConnectionPool, thread_id: str, payload: dict, usage: dict = None,
+                          completed_at: str = None):
+    """Record a completed session's final payload and usage; its checkpoints are compacted later.
+
+    `completed_at` defaults to now; backfilled sessions pass their final checkpoint's timestamp.
+    """
+    async with pool.connection() as conn:
+        await conn.execute(
+            "INSERT INTO session_archive (thread_id, completed_at, payload, usage) "
+            "VALUES (%s, coalesce(%s::timestamptz, now()), %s, %s) "
+            "ON CONFLICT (thread_id) DO UPDATE SET payload = EXCLUDED.payload, usage = EXCLUDED.usage, "
+            "completed_at = EXCLUDED.completed_at, compacted = false",
+            (thread_id, completed_at, Jsonb(payload), Jsonb(usage) if usage is not None else None),
+        )
+
+async def archive_finished(pool: AsyncConnectionPool, graph, thread_ids: list) -> list:
+    """Archive the threads whose latest checkpoint is terminal (nothing left to run); returns the others.
+
+    A session can complete without an archive row: it finished before archiving existed, or its
+    archive_session call failed. Its state is still in the checkpointer, so it is archived from there.
+    """
+    unfinished = []
+    for thread_id in thread_ids:
+        snapshot = await graph.aget_state(thread_config(thread_id))
+        if snapshot.values and not snapshot.next:
+            await archive_session(
+                pool, thread_id, jsonable_encoder(extract_view(snapshot.values)), session_usage(snapshot.values),
+                completed_at=snapshot.created_at,
+            )
+        else:
+            unfinished.append(thread_id)
+    return unfinished
+
+async def backfill_archive(pool: AsyncConnectionPool, graph, batch_size: int = 100) -> int:
+    """Archive every completed session that has checkpoints but no session_archive row.
+
+    Run by migrate.py, so completed sessions from before archiving are compacted rather than
+    purged, and re-triage and export see them. Returns the number of sessions archived.
+    """
+    after, archived = "", 0
+    while True:
+        async with pool.connection() as conn:
+            cur = await conn.execute(
+                """
+                SELECT DISTINCT c.thread_id FROM checkpoints c
+                WHERE c.thread_id > %s AND c.checkpoint_ns = ''
+                  AND NOT EXISTS (SELECT 1 FROM session_archive a WHERE a.thread_id = c.thread_id)
+                ORDER BY c.thread_id
+                LIMIT %s
+                """,
+                (after, batch_size),
+            )
+            thread_ids = [r["thread_id"] for r in await cur.fetchall()]
+        if not thread_ids:
+            return archived
+        unfinished = await archive_finished(pool, graph, thread_ids)
+        archived += len(thread_ids) - len(unfinished)
+        after = thread_ids[-1]
+
+# Rows of each checkpoint table that are NOT part of the thread's latest checkpoint
+INTERMEDIATE_ROWS = {
+    "checkpoints": """
+        FROM checkpoints t WHERE t.thread_id = ANY(%(ids)s) AND t.checkpoint_id <> (
+            SELECT max(c.checkpoint_id) FROM checkpoints c
+            WHERE c.thread_id = t.thread_id AND c.checkpoint_ns = t.checkpoint_ns)
+    """,
+    "checkpoint_writes": """
+        FROM checkpoint_writes t WHERE t.thread_id = ANY(%(ids)s) AND t.checkpoint_id <> (
+            SELECT max(c.checkpoint_id) FROM checkpoints c
+            WHERE c.thread_id = t.thread_id AND c.checkpoint_ns = t.checkpoint_ns)
+    """,
+    # Blobs not referenced by the latest checkpoint's channel_versions (run after checkpoints are pruned)
+    "checkpoint_blobs": """
+        FROM checkpoint_blobs t WHERE t.thread_id = ANY(%(ids)s) AND NOT EXISTS (
+            SELECT 1 FROM checkpoints c
+            WHERE c.thread_id = t.thread_id AND c.checkpoint_ns = t.checkpoint_ns
+              AND c.checkpoint -> 'channel_versions' ->> t.channel = t.version)
+    """,
+}
+
+ALL_ROWS = {table: f"FROM {table} t WHERE t.thread_id = ANY(%(ids)s)" for table in CHECKPOINT_TABLES}
+
+async def _delete_rows(conn, selectors: dict, thread_ids: list, report: dict):
+    """Delete the selected rows table by table, measuring rows and bytes reclaimed."""
+    for table in ("checkpoint_writes", "checkpoints", "checkpoint_blobs"):
+        where = selectors[table]
+        cur = await conn.execute(
+            f"SELECT count(*) AS n, coalesce(sum(pg_column_size(t.*)), 0) AS bytes {where}", {"ids": thread_ids}
+        )
+        row = await cur.fetchone()
+        cur = await conn.execute(f"DELETE {where}", {"ids": thread_ids})
+        report["rows_deleted"][table] = report["rows_deleted"].get(table, 0) + cur.rowcount
+        report["bytes_reclaimed"] += int(row["bytes"])
+
+async def compact_completed(pool: AsyncConnectionPool, policy: RetentionPolicy, report: dict):
+    """Delete the checkpoints of archived sessions (all, or all but the final one)."""
+    while True:
+        async with pool.connection() as conn:
+            async with conn.transaction():
+                cur = await conn.execute(
+                    "SELECT thread_id FROM session_archive WHERE NOT compacted "
+                    "ORDER BY completed_at LIMIT %s FOR UPDATE SKIP LOCKED",
+                    (policy.batch_size,),
+                )
+                thread_ids = [r["thread_id"] for r in await cur.fetchall()]
+                if not thread_ids:
+                    return
+                selectors = INTERMEDIATE_ROWS if policy.keep_final_checkpoint else ALL_ROWS
+                await _delete_rows(conn, selectors, thread_ids, report)
+                await conn.execute(
+                    "UPDATE session_archive SET compacted = true WHERE thread_id = ANY(%s)", (thread_ids,)
+                )
+        report["completed_threads_compacted"] += len(thread_ids)
+        if len(thread_ids) < policy.batch_size:
+            return
+
+async def purge_idle(pool: AsyncConnectionPool, policy: RetentionPolicy, graph, report: dict):
+    """Delete every checkpoint of unfinished sessions idle for longer than the TTL.
+
+    Idle threads without an archive row are only purged if their latest checkpoint still has work
+    pending (waiting on the patient, or failed mid-run); finished ones are archived instead.
+    """
+    while True:
+        async with pool.connection() as conn:
+            cur = await conn.execute(
+                """
+                SELECT c.thread_id FROM checkpoints c
+                WHERE NOT EXISTS (SELECT 1 FROM session_archive a WHERE a.thread_id = c.thread_id)
+                GROUP BY c.thread_id
+                HAVING max((c.checkpoint ->> 'ts')::timestamptz) < now() - make_interval(secs => %s)
+                LIMIT %s
+                """,
+                (policy.idle_ttl_seconds, policy.batch_size),
+            )
+            thread_ids = [r["thread_id"] for r in await cur.fetchall()]
+        if not thread_ids:
+            return
+        unfinished = await archive_finished(pool, graph, thread_ids)
+        report["idle_threads_archived"] += len(thread_ids) - len(unfinished)
+        if unfinished:
+            async with pool.connection() as conn:
+                async with conn.transaction():
+                    await _delete_rows(conn, ALL_ROWS, unfinished, report)
+        report["idle_threads_purged"] += len(unfinished)
+        if len(thread_ids) < policy.batch_size:
+            return
+
+async def run_retention(pool: AsyncConnectionPool, policy: RetentionPolicy, graph) -> dict:
+    report = {
+        "completed_threads_compacted": 0,
+        "idle_threads_archived": 0,
+        "idle_threads_purged": 0,
+        "idempotency_keys_purged": 0,
+        "rows_deleted": {},
+        "bytes_reclaimed": 0,
+    }
+    await compact_completed(pool, policy, report)
+    await purge_idle(pool, policy, graph, report)
+    report["idempotency_keys_purged"] = await purge_idempotency_keys(pool, policy.idempotency_ttl_seconds)
+    report["rows_deleted_total"] = sum(report["rows_deleted"].values())
+    return report
+
+class RetentionJob:
+    """Runs checkpoint retention periodically in the background."""
+
+    def __init__(self, pool: AsyncConnectionPool, policy: RetentionPolicy, graph):
+        self.pool = pool
+        self.policy = policy
+        self.graph = graph  # tells finished sessions from unfinished ones before a purge
+        self.last_report = None
+        self.totals = {"runs": 0, "rows_deleted": 0, "bytes_reclaimed": 0}
+        self._lock = asyncio.Lock()
+        self._task = None
+
+    async def run_once(self) -> dict:
+        async with self._lock:
+            report = await run_retention(self.pool, self.policy, self.graph)
+        self.last_report = report
+        self.totals["runs"] += 1
+        self.totals["rows_deleted"] += report["rows_deleted_total"]
+        self.totals["bytes_reclaimed"] += report["bytes_reclaimed"]
+        print(f"Retention: {report}")
+        return report
+
+    async def start(self):
+        if self.policy.interval_seconds > 0:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.policy.interval_seconds)
+            try:
+                await self.run_once()
+            except Exception as e:
+                print(f"Retention run failed: {e}")
+
+    def snapshot(self) -> dict:
+        return {"policy": vars(self.policy), "totals": self.totals, "last_report": self.last_report}
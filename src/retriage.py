@@ -0,0 +1,361 @@
+import argparse
+import asyncio
+import hashlib
+import os
+import uuid
+from dataclasses import asdict, dataclass, fields
+from datetime import datetime
+from typing import Optional
+from langchain_core.rate_limiters import InMemoryRateLimiter
+from langchain_core.runnables import RunnableLambda
+from psycopg.types.json import Jsonb
+from psycopg_pool import AsyncConnectionPool
+
+from models import URGENCY_RANK
+from prompts import TRIAGE_SUMMARY_PROMPT, build_prompt
+from llm_orchestration.model_tiers import model_for
+from llm_orchestration.part4_triaging import final_llm
+from llm_orchestration.context_manager import select_context
+from llm_orchestration.red_flags import red_flag_context
+from llm_orchestration.usage import UsageHandler, _collector, add_counts, empty_usage
+from llm_orchestration.clinical_assistant_graph import thread_config
+
+from dotenv import load_dotenv
+load_dotenv()
+
+# Re-runs triage_summary over the transcripts of completed sessions (e.g. after a change to
+# TRIAGE_SUMMARY_PROMPT or the model) and records the new summary next to the original urgency.
+# Sessions are taken from session_archive in thread_id order (migrate.py backfills it with sessions
+# that completed before archiving existed) and their transcripts read from the checkpointer one page at a time; each page's results and the job cursor are committed together,
+# so an interrupted job resumes after the last committed page. A job covers the sessions archived
+# before it was created.
+SETUP_SQL = """
+CREATE TABLE IF NOT EXISTS retriage_jobs (
+    job_id TEXT PRIMARY KEY,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    status TEXT NOT NULL DEFAULT 'pending',
+    config JSONB NOT NULL,
+    prompt_fingerprint TEXT NOT NULL,
+    cursor TEXT,
+    processed INT NOT NULL DEFAULT 0,
+    failed INT NOT NULL DEFAULT 0,
+    usage JSONB,
+    error TEXT
+);
+CREATE TABLE IF NOT EXISTS retriage_results (
+    job_id TEXT NOT NULL REFERENCES retriage_jobs (job_id) ON DELETE CASCADE,
+    thread_id TEXT NOT NULL,
+    original_urgency TEXT,
+    new_urgency TEXT,
+    summary JSONB,
+    error TEXT,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (job_id, thread_id)
+);
+CREATE INDEX IF NOT EXISTS retriage_results_changed_idx ON retriage_results (job_id, thread_id)
+    WHERE original_urgency IS DISTINCT FROM new_urgency;
+"""
+
+@dataclass
+class RetriageConfig:
+    concurrency: int = 8                      # triage calls in flight
+    requests_per_second: float = 5.0          # call rate limit, 0 for none
+    batch_size: int = 50                      # threads per committed page
+    limit: Optional[int] = None               # stop after this many threads
+    since: Optional[str] = None               # only sessions completed at or after this ISO timestamp
+
+def retriage_config(**overrides) -> RetriageConfig:
+    config = RetriageConfig(
+        concurrency=int(os.getenv("RETRIAGE_CONCURRENCY", "8")),
+        requests_per_second=float(os.getenv("RETRIAGE_REQUESTS_PER_SECOND", "5")),
+        batch_size=int(os.getenv("RETRIAGE_BATCH_SIZE", "50")),
+    )
+    for name, value in overrides.items():
+        if value is not None:
+            setattr(config, name, value)
+    return config
+
+def prompt_fingerprint() -> str:
+    """Identifies the prompt and model a job ran with, so results can be told apart."""
+    return hashlib.sha256(f"{model_for('triage_summary')}\n{TRIAGE_SUMMARY_PROMPT}".encode()).hexdigest()[:16]
+
+def urgency_change(original: Optional[str], new: Optional[str]) -> str:
+    if original not in URGENCY_RANK or new not in URGENCY_RANK:
+        return "unknown"
+    if URGENCY_RANK[new] > URGENCY_RANK[original]:
+        return "escalated"
+    if URGENCY_RANK[new] < URGENCY_RANK[original]:
+        return "deescalated"
+    return "unchanged"
+
+def triage_prompt(values: dict) -> list:
+    """The prompt triage_summary builds for this state."""
+    window, _ = select_context(values, "triage_summary")
+    return build_prompt(TRIAGE_SUMMARY_PROMPT, window, red_flag_context(values))
+
+def triage_runnable(config: RetriageConfig):
+    """final_llm (on triage_summary's tier) behind the job's rate limiter, bypassing the response cache.
+
+    Calls still go through the resilience layer and the LLM scheduler, at background priority.
+    """
+    # Deliberately below the CachedRunnable and TieredRunnable layers: a cache hit would replay the
+    # summary the session got originally, so a job run after a model change would report every
+    # session as unchanged. Bulk calls would also swamp triage_summary's live tier stats.
+    model = final_llm.for_node("triage_summary").runnable
+    limiter = InMemoryRateLimiter(
+        requests_per_second=config.requests_per_second,
+        check_every_n_seconds=0.05,
+        max_bucket_size=max(1, config.concurrency),
+    ) if config.requests_per_second else None
+
+    async def call(msgs, config):
+        if limiter is not None:
+            await limiter.aacquire()
+        return await model.ainvoke(msgs, config)
+    return RunnableLambda(call)
+
+async def retriage_states(runnable, states: list, concurrency: int) -> tuple[list, dict]:
+    """Run triage over a list of session states with abatch. Returns outcomes and their usage."""
+    calls = []
+    token = _collector.set(calls)
+    try:
+        outcomes = await runnable.abatch(
+            [triage_prompt(values) for values in states],
+            config={"max_concurrency": concurrency, "callbacks": [UsageHandler()], "run_name": "retriage"},
+            return_exceptions=True,
+        )
+    finally:
+        _collector.reset(token)
+    usage = empty_usage()
+    for call in calls:
+        usage = add_counts(usage, call)
+    return outcomes, usage
+
+
+async def setup_retriage(pool: AsyncConnectionPool):
+    async with pool.connection() as conn:
+        await conn.execute(SETUP_SQL)
+
+async def create_job(pool: AsyncConnectionPool, config: RetriageConfig) -> str:
+    job_id = str(uuid.uuid4())
+    async with pool.connection() as conn:
+        await conn.execute(
+            "INSERT INTO retriage_jobs (job_id, config, prompt_fingerprint) VALUES (%s, %s, %s)",
+            (job_id, Jsonb(asdict(config)), prompt_fingerprint()),
+        )
+    return job_id
+
+async def set_status(pool: AsyncConnectionPool, job_id: str, status: str, error: str = None):
+    async with pool.connection() as conn:
+        await conn.execute(
+            "UPDATE retriage_jobs SET status = %s, error = %s, updated_at = now() WHERE job_id = %s",
+            (status, error, job_id),
+        )
+
+async def completed_threads(pool: AsyncConnectionPool, after: Optional[str], limit: int, since, until) -> list:
+    """Next page of sessions archived between since and until after the cursor, with their original urgency.
+
+    session_archive is the one record of completed sessions, shared with export.py; sessions that
+    completed without an archive row are added by migrate.py and the retention job.
+    """
+    async with pool.connection() as conn:
+        cur = await conn.execute(
+            """
+            SELECT thread_id, payload->'generated_summary'->>'urgency' AS urgency
+            FROM session_archive
+            WHERE (%(after)s::text IS NULL OR thread_id > %(after)s)
+              AND (%(since)s::timestamptz IS NULL OR completed_at >= %(since)s)
+              AND completed_at <= %(until)s
+            ORDER BY thread_id
+            LIMIT %(limit)s
+            """,
+            {"after": after, "since": since, "until": until, "limit": limit},
+        )
+        return await cur.fetchall()
+
+async def load_states(saver, thread_ids: list) -> dict:
+    """Latest checkpointed state per thread, or None if its checkpoints were purged."""
+    async def load(thread_id):
+        checkpoint = await saver.aget_tuple(thread_config(thread_id))
+        return checkpoint.checkpoint["channel_values"] if checkpoint else None
+    values = await asyncio.gather(*(load(thread_id) for thread_id in thread_ids))
+    return dict(zip(thread_ids, values))
+
+async def run_job(pool: AsyncConnectionPool, saver, job_id: str) -> dict:
+    """Process a job from its cursor to the end (or its limit), one committed page at a time."""
+    async with pool.connection() as conn:
+        job = await (await conn.execute("SELECT * FROM retriage_jobs WHERE job_id = %s", (job_id,))).fetchone()
+    if job is None:
+        raise KeyError(job_id)
+    config = RetriageConfig(**{f.name: job["config"].get(f.name) for f in fields(RetriageConfig)})
+    runnable = triage_runnable(config)
+    cursor, processed = job["cursor"], job["processed"]
+    await set_status(pool, job_id, "running")
+
+    try:
+        while True:
+            async with pool.connection() as conn:
+                status = (await (await conn.execute(
+                    "SELECT status FROM retriage_jobs WHERE job_id = %s", (job_id,)
+                )).fetchone())["status"]
+            if status == "cancelled":
+                break
+            page_size = config.batch_size if config.limit is None else min(config.batch_size, config.limit - processed)
+            threads = await completed_threads(pool, cursor, page_size, config.since, job["created_at"]) if page_size > 0 else []
+            if not threads:
+                await set_status(pool, job_id, "completed")
+                break
+
+            states = await load_states(saver, [t["thread_id"] for t in threads])
+            runnable_threads = [t for t in threads if states[t["thread_id"]] is not None]
+            outcomes, usage = await retriage_states(
+                runnable, [states[t["thread_id"]] for t in runnable_threads], config.concurrency
+            )
+            outcome_by_thread = {t["thread_id"]: o for t, o in zip(runnable_threads, outcomes)}
+
+            rows, failed = [], 0
+            for t in threads:
+                outcome = outcome_by_thread.get(t["thread_id"], LookupError("no checkpoint left for this session"))
+                if isinstance(outcome, Exception):
+                    failed += 1
+                    rows.append((job_id, t["thread_id"], t["urgency"], None, None, f"{type(outcome).__name__}: {outcome}"))
+                else:
+                    rows.append((job_id, t["thread_id"], t["urgency"], outcome.urgency, Jsonb(outcome.model_dump()), None))
+
+            next_cursor = threads[-1]["thread_id"]
+            async with pool.connection() as conn:
+                async with conn.transaction():
+                    current = await (await conn.execute(
+                        "SELECT cursor, usage FROM retriage_jobs WHERE job_id = %s FOR UPDATE", (job_id,)
+                    )).fetchone()
+                    # Only advance from the cursor this page started at: a second runner on the same job stops here
+                    if current["cursor"] != cursor:
+                        raise RuntimeError(f"Retriage job {job_id} was advanced by another runner")
+                    async with conn.cursor() as cur:
+                        await cur.executemany(
+                            "INSERT INTO retriage_results "
+                            "(job_id, thread_id, original_urgency, new_urgency, summary, error) "
+                            "VALUES (%s, %s, %s, %s, %s, %s) ON CONFLICT (job_id, thread_id) DO UPDATE SET "
+                            "new_urgency = EXCLUDED.new_urgency, summary = EXCLUDED.summary, error = EXCLUDED.error",
+                            rows,
+                        )
+                    await conn.execute(
+                        "UPDATE retriage_jobs SET cursor = %s, processed = processed + %s, failed = failed + %s, "
+                        "usage = %s, updated_at = now() WHERE job_id = %s",
+                        (next_cursor, len(threads), failed, Jsonb(add_counts(current["usage"] or empty_usage(), usage)), job_id),
+                    )
+            cursor, processed = next_cursor, processed + len(threads)
+            print(f"Retriage {job_id}: {processed} sessions processed ({failed} failed in last page)")
+    except Exception as e:
+        await set_status(pool, job_id, "failed", str(e))
+        raise
+    return await job_report(pool, job_id)
+
+async def job_report(pool: AsyncConnectionPool, job_id: str) -> Optional[dict]:
+    """Job progress and the urgency diff of its results so far."""
+    async with pool.connection() as conn:
+        job = await (await conn.execute("SELECT * FROM retriage_jobs WHERE job_id = %s", (job_id,))).fetchone()
+        if job is None:
+            return None
+        transitions = await (await conn.execute(
+            """
+            SELECT original_urgency, new_urgency, count(*) AS sessions
+            FROM retriage_results WHERE job_id = %s AND error IS NULL
+            GROUP BY original_urgency, new_urgency
+            ORDER BY sessions DESC
+            """,
+            (job_id,),
+        )).fetchall()
+    diff = {"unchanged": 0, "escalated": 0, "deescalated": 0, "unknown": 0}
+    for t in transitions:
+        diff[urgency_change(t["original_urgency"], t["new_urgency"])] += t["sessions"]
+    return {**job, "diff": diff, "transitions": transitions}
+
+async def job_results(pool: AsyncConnectionPool, job_id: str, changed_only: bool = True,
+                      after: Optional[str] = None, limit: int = 100) -> list:
+    """Results of a job in thread_id order, optionally only those whose urgency changed."""
+    async with pool.connection() as conn:
+        cur = await conn.execute(
+            """
+            SELECT thread_id, original_urgency, new_urgency, summary, error
+            FROM retriage_results
+            WHERE job_id = %(job_id)s
+              AND (NOT %(changed_only)s OR original_urgency IS DISTINCT FROM new_urgency)
+              AND (%(after)s::text IS NULL OR thread_id > %(after)s)
+            ORDER BY thread_id
+            LIMIT %(limit)s
+            """,
+            {"job_id": job_id, "changed_only": changed_only, "after": after, "limit": limit},
+        )
+        rows = await cur.fetchall()
+    return [{**r, "change": urgency_change(r["original_urgency"], r["new_urgency"])} for r in rows]
+
+
+class RetriageRunner:
+    """Runs re-triage jobs as background tasks of the API worker."""
+
+    def __init__(self, pool: AsyncConnectionPool, saver):
+        self.pool = pool
+        self.saver = saver
+        self._tasks = {}
+
+    def running(self, job_id: str) -> bool:
+        task = self._tasks.get(job_id)
+        return task is not None and not task.done()
+
+    def start(self, job_id: str):
+        if self.running(job_id):
+            return
+        task = asyncio.create_task(self._run(job_id))
+        self._tasks[job_id] = task
+
+    async def _run(self, job_id: str):
+        try:
+            report = await run_job(self.pool, self.saver, job_id)
+            print(f"Retriage {job_id} finished: {report['status']}, {report['diff']}")
+        except Exception as e:
+            print(f"Retriage {job_id} failed: {e}")
+        finally:
+            self._tasks.pop(job_id, None)
+
+    async def stop(self):
+        # Jobs keep their committed cursor and can be resumed after restart
+        for task in list(self._tasks.values()):
+            task.cancel()
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+
+
+async def main():
+    from checkpointer import create_checkpointer_pool, build_checkpointer
+
+    parser = argparse.ArgumentParser(description="Re-run triage_summary over completed sessions")
+    parser.add_argument("--resume", metavar="JOB_ID", help="continue an existing job from its cursor")
+    parser.add_argument("--concurrency", type=int)
+    parser.add_argument("--requests-per-second", type=float)
+    parser.add_argument("--batch-size", type=int)
+    parser.add_argument("--limit", type=int)
+    parser.add_argument("--since", help="only sessions completed at or after this ISO timestamp")
+    args = parser.parse_args()
+    if args.since:
+        datetime.fromisoformat(args.since)
+
+    from migrate import check_schema  # migrate imports this module's setup
+    async with create_checkpointer_pool(os.environ["DATABASE_URL"]) as pool:
+        await check_schema(pool)
+        job_id = args.resume or await create_job(pool, retriage_config(
+            concurrency=args.concurrency,
+            requests_per_second=args.requests_per_second,
+            batch_size=args.batch_size,
+            limit=args.limit,
+            since=args.since,
+        ))
+        print(f"Retriage job {job_id}")
+        report = await run_job(pool, build_checkpointer(pool), job_id)
+        print(f"Status: {report['status']}, processed: {report['processed']}, failed: {report['failed']}")
+        print(f"Urgency diff: {report['diff']}")
+        for t in report["transitions"]:
+            print(f"  {t['original_urgency']} -> {t['new_urgency']}: {t['sessions']}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,84 @@
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from dotenv import load_dotenv
+load_dotenv()
+
+@dataclass
+class SessionSnapshot:
+    """The parts of a StateSnapshot the API reads: `values` and `next`."""
+    values: dict
+    next: tuple
+
+class SessionStateCache:
+    """Per-worker LRU of the latest state per thread_id.
+
+    Entries are written through from the graph stream at the end of each run and
+    invalidated when a run starts, so a reader never sees state older than the last
+    run this worker made. Runs on other workers are not visible here, hence the TTL.
+    """
+
+    def __init__(self, max_entries: int = 1000, ttl: float = 30):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self.stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    def get(self, thread_id: str):
+        entry = self._entries.get(thread_id)
+        if entry is not None and time.monotonic() - entry[1] <= self.ttl:
+            self._entries.move_to_end(thread_id)
+            self.stats["hits"] += 1
+            return entry[0]
+        if entry is not None:
+            del self._entries[thread_id]
+        self.stats["misses"] += 1
+        return None
+
+    def put(self, thread_id: str, snapshot):
+        self._entries[thread_id] = (snapshot, time.monotonic())
+        self._entries.move_to_end(thread_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, thread_id: str):
+        if self._entries.pop(thread_id, None) is not None:
+            self.stats["invalidations"] += 1
+
+    def snapshot(self) -> dict:
+        total = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "hit_ratio": self.stats["hits"] / total if total else 0.0,
+        }
+
+def new_run() -> dict:
+    return {"messages": None, "values": None, "next": []}
+
+def collect_run_event(run: dict, mode: str, payload):
+    """Track the last node messages, latest values and interrupted nodes from a graph stream.
+
+    Expects stream_mode to include "updates", "values" and "tasks".
+    """
+    if mode == "values":
+        run["values"] = payload
+    elif mode == "tasks":
+        # A task result with interrupts is the node the thread is now waiting in
+        if payload.get("interrupts"):
+            run["next"].append(payload["name"])
+    elif mode == "updates":
+        for key, value in payload.items():
+            if key != '__interrupt__' and isinstance(value, dict) and 'messages' in value:
+                run["messages"] = value['messages']
+                break
+
+def create_session_cache() -> SessionStateCache:
+    return SessionStateCache(
+        max_entries=int(os.getenv("SESSION_CACHE_MAX_ENTRIES", "1000")),
+        ttl=float(os.getenv("SESSION_CACHE_TTL", "30")),
+    )
@@ -0,0 +1,117 @@
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+from psycopg.rows import dict_row
+from psycopg_pool import AsyncConnectionPool, PoolTimeout
+
+from dotenv import load_dotenv
+load_dotenv()
+
+# First key of the two-key advisory lock form, so session locks cannot collide with
+# other advisory lock users of the same database ("CLNC")
+LOCK_NAMESPACE = 0x434C4E43
+
+class SessionBusy(Exception):
+    """Raised when a session's lock cannot be acquired within the timeout."""
+
+    def __init__(self, detail: str, status_code: int = 409):
+        super().__init__(detail)
+        self.status_code = status_code
+
+class SessionLocks:
+    """Serializes graph runs per session_id.
+
+    Within a worker an asyncio.Lock queues contenders; across workers a Postgres
+    advisory lock does. The advisory lock is held on a connection from a dedicated
+    pool for the duration of the run, so it never competes with checkpoint writes;
+    that pool's size caps the replies in flight per worker. Without a pool only the
+    in-process lock applies.
+    """
+
+    def __init__(self, pool: AsyncConnectionPool, timeout: float):
+        self.pool = pool
+        self.timeout = timeout
+        self._local = {}  # session_id -> [asyncio.Lock, waiters]
+        self.stats = {"acquired": 0, "contended": 0, "timeouts": 0}
+
+    @asynccontextmanager
+    async def hold(self, session_id: str):
+        deadline = time.monotonic() + self.timeout
+        entry = self._local.setdefault(session_id, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            if entry[0].locked():
+                self.stats["contended"] += 1
+            try:
+                await asyncio.wait_for(entry[0].acquire(), timeout=self.timeout)
+            except asyncio.TimeoutError:
+                self.stats["timeouts"] += 1
+                raise SessionBusy(f"Session {session_id} is busy with another reply")
+            try:
+                if self.pool is None:
+                    self.stats["acquired"] += 1
+                    yield
+                    return
+                try:
+                    conn = await self.pool.getconn(timeout=max(deadline - time.monotonic(), 0.1))
+                except PoolTimeout:
+                    self.stats["timeouts"] += 1
+                    raise SessionBusy("Too many replies in progress, retry shortly", status_code=503)
+                held = False
+                try:
+                    await self._acquire_advisory(conn, session_id, deadline)
+                    held = True
+                    self.stats["acquired"] += 1
+                    try:
+                        yield
+                    finally:
+                        await conn.execute("SELECT pg_advisory_unlock(%s, hashtext(%s))", (LOCK_NAMESPACE, session_id))
+                        held = False
+                finally:
+                    if held:
+                        # Never return a connection that may still hold the lock
+                        await conn.close()
+                    await self.pool.putconn(conn)
+            finally:
+                entry[0].release()
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._local[session_id]
+
+    async def _acquire_advisory(self, conn, session_id: str, deadline: float):
+        # Polled with pg_try_advisory_lock so a waiter never blocks a connection indefinitely
+        delay, contended = 0.05, False
+        while True:
+            cur = await conn.execute(
+                "SELECT pg_try_advisory_lock(%s, hashtext(%s)) AS locked", (LOCK_NAMESPACE, session_id)
+            )
+            if (await cur.fetchone())["locked"]:
+                return
+            if time.monotonic() + delay > deadline:
+                self.stats["timeouts"] += 1
+                raise SessionBusy(f"Session {session_id} is busy with another reply")
+            if not contended:
+                contended = True
+                self.stats["contended"] += 1
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.5)
+
+    def snapshot(self) -> dict:
+        return {**self.stats, "held_or_waiting": len(self._local), "timeout_seconds": self.timeout}
+
+def create_lock_pool(db_url: str) -> AsyncConnectionPool:
+    """Connections that hold session advisory locks while a reply runs."""
+    return AsyncConnectionPool(
+        conninfo=db_url,
+        open=False,
+        check=AsyncConnectionPool.check_connection,
+        kwargs={"autocommit": True, "row_factory": dict_row},
+        name="session-locks",
+        min_size=1,
+        max_size=int(os.getenv("SESSION_LOCK_POOL_MAX_SIZE", "20")),
+    )
+
+def create_session_locks(pool: AsyncConnectionPool) -> SessionLocks:
+    return SessionLocks(pool, timeout=float(os.getenv("SESSION_LOCK_TIMEOUT", "60")))
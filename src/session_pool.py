@@ -0,0 +1,109 @@
+import asyncio
+import os
+import time
+from collections import deque
+
+from dotenv import load_dotenv
+load_dotenv()
+
+class SessionPool:
+    """Keeps sessions pre-advanced to the first interrupt so /api/chat/start is O(1).
+
+    `prepare` starts a fresh session (persisted in the checkpointer) and returns its
+    StartResponse; `discard` removes an expired session's checkpoints. Sessions older
+    than `ttl` seconds are never handed out.
+    """
+
+    def __init__(self, prepare, discard, size: int, ttl: float):
+        self.prepare = prepare
+        self.discard = discard
+        self.size = size
+        self.ttl = ttl
+        self._ready = deque()
+        self._expired = []
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self.stats = {"hits": 0, "misses": 0, "prepared": 0, "expired": 0, "errors": 0}
+
+    def take(self):
+        """Hand out a pre-warmed StartResponse, or None if the pool is empty."""
+        now = time.monotonic()
+        while self._ready:
+            created_at, response = self._ready.popleft()
+            if now - created_at > self.ttl:
+                self._expired.append(response.session_id)
+                continue
+            self.stats["hits"] += 1
+            self._wakeup.set()
+            return response
+        self.stats["misses"] += 1
+        self._wakeup.set()
+        return None
+
+    async def start(self):
+        if self.size > 0:
+            self._task = asyncio.create_task(self._refill_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    def _expire_stale(self):
+        now = time.monotonic()
+        while self._ready and now - self._ready[0][0] > self.ttl:
+            _, response = self._ready.popleft()
+            self._expired.append(response.session_id)
+
+    async def _purge_expired(self):
+        while self._expired:
+            session_id = self._expired.pop()
+            self.stats["expired"] += 1
+            try:
+                await self.discard(session_id)
+            except Exception as e:
+                print(f"Failed to discard expired pooled session {session_id}: {e}")
+
+    async def _refill_loop(self):
+        while True:
+            # Cleared before refilling so a take() during the refill is not missed
+            self._wakeup.clear()
+            self._expire_stale()
+            await self._purge_expired()
+            while len(self._ready) < self.size:
+                try:
+                    response = await self.prepare()
+                except Exception as e:
+                    self.stats["errors"] += 1
+                    print(f"Failed to pre-warm session: {e}")
+                    await asyncio.sleep(5)
+                    break
+                self._ready.append((time.monotonic(), response))
+                self.stats["prepared"] += 1
+
+            # Sleep until a session is taken, or until the oldest one is due to expire
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.ttl / 2)
+            except asyncio.TimeoutError:
+                pass
+
+    def snapshot(self) -> dict:
+        total = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "size": self.size,
+            "ready": len(self._ready),
+            "ttl_seconds": self.ttl,
+            "hit_ratio": self.stats["hits"] / total if total else 0.0,
+        }
+
+def create_session_pool(prepare, discard) -> SessionPool:
+    return SessionPool(
+        prepare,
+        discard,
+        size=int(os.getenv("SESSION_POOL_SIZE", "2")),
+        ttl=float(os.getenv("SESSION_POOL_TTL", "600")),
+    )
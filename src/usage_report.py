@@ -0,0 +1,48 @@
+from datetime import datetime
+from psycopg_pool import AsyncConnectionPool
+
+# Aggregates over the per-session usage archived with each completed session
+# (session_archive.usage, see retention.archive_session).
+
+TOTALS_SQL = """
+    SELECT count(*) AS sessions,
+           coalesce(sum((usage->'total'->>'total_tokens')::bigint), 0) AS total_tokens,
+           coalesce(sum((usage->'total'->>'llm_calls')::bigint), 0) AS llm_calls,
+           coalesce(sum((usage->'total'->>'cost_usd')::numeric), 0)::float AS cost_usd,
+           coalesce(avg((usage->'total'->>'total_tokens')::bigint), 0)::float AS avg_tokens,
+           coalesce(avg((usage->'total'->>'cost_usd')::numeric), 0)::float AS avg_cost_usd,
+           coalesce(percentile_cont(0.95) WITHIN GROUP (ORDER BY (usage->'total'->>'total_tokens')::bigint), 0)
+               AS p95_tokens
+    FROM session_archive
+    WHERE usage IS NOT NULL AND completed_at >= %(since)s
+"""
+
+PHASES_SQL = """
+    SELECT p.key AS phase,
+           sum((p.value->>'total_tokens')::bigint) AS total_tokens,
+           sum((p.value->>'llm_calls')::bigint) AS llm_calls,
+           sum((p.value->>'cost_usd')::numeric)::float AS cost_usd,
+           avg((p.value->>'iterations')::int)::float AS avg_iterations,
+           max((p.value->>'iterations')::int) AS max_iterations
+    FROM session_archive a, jsonb_each(a.usage->'phases') p
+    WHERE a.usage IS NOT NULL AND a.completed_at >= %(since)s
+    GROUP BY p.key
+    ORDER BY total_tokens DESC
+"""
+
+TOP_SESSIONS_SQL = """
+    SELECT thread_id, completed_at, usage->'total' AS total
+    FROM session_archive
+    WHERE usage IS NOT NULL AND completed_at >= %(since)s
+    ORDER BY (usage->'total'->>'total_tokens')::bigint DESC
+    LIMIT %(top)s
+"""
+
+async def usage_summary(pool: AsyncConnectionPool, since: datetime, top: int = 10) -> dict:
+    """Totals, per-phase breakdown and most expensive sessions completed since `since`."""
+    params = {"since": since, "top": top}
+    async with pool.connection() as conn:
+        totals = await (await conn.execute(TOTALS_SQL, params)).fetchone()
+        phases = await (await conn.execute(PHASES_SQL, params)).fetchall()
+        top_sessions = await (await conn.execute(TOP_SESSIONS_SQL, params)).fetchall()
+    return {"since": since, "totals": totals, "phases": phases, "top_sessions": top_sessions}
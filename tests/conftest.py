@@ -0,0 +1,29 @@
+import asyncio
+
+import pytest
+from langchain_core.runnables import RunnableLambda
+
+from benchmark.fake_llm import FakeChatModel
+from llm_orchestration.llm import build_llm
+from llm_orchestration.llm_cache import ResponseCache
+
+
+def run_in_node(node: str, runnable, messages):
+    """Invoke `runnable` as if from inside graph node `node`, so tiers, deadlines and stats see that node."""
+    async def call(msgs):
+        return await runnable.ainvoke(msgs)
+    return asyncio.run(RunnableLambda(call).ainvoke(messages, {"metadata": {"langgraph_node": node}}))
+
+
+@pytest.fixture
+def fake_models():
+    """A strong and a fast FakeChatModel with no latency."""
+    return FakeChatModel(model_name="strong-model"), FakeChatModel(model_name="fast-model")
+
+
+@pytest.fixture
+def tiered_llm(fake_models, monkeypatch):
+    """The production wrapper stack around the fake models, without a response cache."""
+    monkeypatch.setenv("LLM_TIERING", "true")
+    strong, fast = fake_models
+    return build_llm({"strong": (strong, "fake:strong-model"), "fast": (fast, "fake:fast-model")}, ResponseCache(None))
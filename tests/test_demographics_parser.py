@@ -0,0 +1,59 @@
+import pytest
+from langchain_core.messages import HumanMessage
+from langchain_core.runnables import RunnableLambda
+
+from models import PatientInfoPartial
+from llm_orchestration import part1_patient_demo
+from llm_orchestration.demographics_parser import parse_patient_info
+
+from conftest import run_in_node
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("John Tan, 45, male", ("John Tan", 45, "M")),
+    ("my name is john", ("John", None, None)),
+    ("name:jo", ("Jo", None, None)),
+    ("My name is Siti Rahman and I'm 32", ("Siti Rahman", 32, None)),
+    ("45", (None, 45, None)),
+    ("I'm 45", (None, 45, None)),
+    ("female, 29", (None, 29, "F")),
+    ("29 yo f", (None, 29, "F")),
+])
+def test_parses_unambiguous_replies(text, expected):
+    info = parse_patient_info(text)
+    assert (info.name, info.age, info.sex) == expected
+
+
+@pytest.mark.parametrize("text", [
+    "I am Diabetic",
+    "Call me maybe",
+    "Mother",
+    "Singapore",
+    "John Tan",  # a bare name needs a cue, or age and sex alongside it
+    "I'm not sure",
+    "45 and 50",
+    "age 150",
+    "I have a headache since yesterday",
+])
+def test_leaves_ambiguous_replies_to_the_llm(text):
+    assert parse_patient_info(text) is None
+
+
+def extract(tiered_llm, monkeypatch, text: str) -> dict:
+    monkeypatch.setattr(part1_patient_demo, "extract_llm", tiered_llm.with_structured_output(PatientInfoPartial))
+    state = {"messages": [HumanMessage(content=text)]}
+    return run_in_node("extract_patient_info", RunnableLambda(part1_patient_demo.extract_patient_info), state)
+
+
+def test_extract_patient_info_skips_the_llm_on_the_fast_path(tiered_llm, fake_models, monkeypatch):
+    updates = extract(tiered_llm, monkeypatch, "John Tan, 45, male")
+    assert updates == {"patient_name": "JOHN TAN", "patient_age": 45, "patient_sex": "M"}
+    assert all(not model.calls for model in fake_models)
+
+
+def test_extract_patient_info_falls_back_to_the_llm(tiered_llm, fake_models, monkeypatch):
+    strong, fast = fake_models
+    updates = extract(tiered_llm, monkeypatch, "I am Diabetic")
+    assert updates == {}
+    assert fast.calls == {"extract_patient_info:PatientInfoPartial": 1}
+    assert not strong.calls
@@ -0,0 +1,40 @@
+import asyncio
+
+import pytest
+from langchain_core.messages import HumanMessage
+
+from benchmark.fake_llm import FakeChatModel, LatencyModel
+
+MESSAGES = [HumanMessage(content="I have had a cough for three days")]
+
+
+@pytest.mark.parametrize("spec", ["fixed:0.25", "uniform:0.1:0.3", "normal:0.2:0.05", "lognormal:0.2:0.5", "off"])
+def test_latency_model_is_seeded(spec):
+    first, second = LatencyModel(spec, seed=7), LatencyModel(spec, seed=7)
+    samples = [first.sample() for _ in range(20)]
+    assert samples == [second.sample() for _ in range(20)]
+    assert all(sample >= 0 for sample in samples)
+
+
+def test_latency_model_distributions():
+    assert LatencyModel("fixed:0.25").sample() == 0.25
+    assert LatencyModel("off").sample() == 0.0
+    assert all(0.1 <= LatencyModel("uniform:0.1:0.3", seed=i).sample() <= 0.3 for i in range(50))
+
+
+@pytest.mark.parametrize("spec", ["fixed", "uniform:0.1", "gamma:1:2", "fixed:abc"])
+def test_latency_model_rejects_bad_specs(spec):
+    with pytest.raises(ValueError):
+        LatencyModel(spec)
+
+
+def test_streamed_reply_reports_the_same_usage_as_a_plain_call():
+    model = FakeChatModel()
+
+    async def stream():
+        chunks = [chunk async for chunk in model.astream(MESSAGES)]
+        return chunks, await model.ainvoke(MESSAGES)
+    chunks, reply = asyncio.run(stream())
+    assert [c.usage_metadata for c in chunks[:-1]] == [None] * (len(chunks) - 1)
+    assert chunks[-1].usage_metadata == reply.usage_metadata
+    assert "".join(c.content for c in chunks) == reply.content
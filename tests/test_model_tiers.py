@@ -0,0 +1,77 @@
+from langchain_core.messages import HumanMessage
+from prometheus_client import REGISTRY
+
+from models import PHASE_BY_NODE, SymptomSufficiencyCheck, TriageSummary
+from llm_orchestration.model_tiers import tier_for
+
+from conftest import run_in_node
+
+MESSAGES = [HumanMessage(content="I have had a cough for three days")]
+
+
+def calls(model) -> int:
+    return sum(count for key, count in model.calls.items() if not key.endswith(":error"))
+
+
+def structured_failures(node: str) -> float:
+    labels = {"node": node, "phase": PHASE_BY_NODE[node]}
+    return REGISTRY.get_sample_value("clinicassist_structured_output_failures_total", labels) or 0.0
+
+
+def test_nodes_default_to_fast_tier_except_triage(monkeypatch):
+    monkeypatch.setenv("LLM_TIERING", "true")
+    assert tier_for("extract_symptoms") == "fast"
+    assert tier_for("triage_summary") == "strong"
+    assert tier_for("unknown") == "strong"
+
+
+def test_tier_override_and_tiering_off(monkeypatch):
+    monkeypatch.setenv("LLM_TIER_EXTRACT_SYMPTOMS", "strong")
+    assert tier_for("extract_symptoms") == "strong"
+    monkeypatch.delenv("LLM_TIER_EXTRACT_SYMPTOMS")
+    monkeypatch.setenv("LLM_TIERING", "false")
+    assert tier_for("extract_symptoms") == "strong"
+
+
+def test_valid_fast_output_is_used(tiered_llm, fake_models):
+    strong, fast = fake_models
+    result = run_in_node("extract_symptoms", tiered_llm.with_structured_output(SymptomSufficiencyCheck), MESSAGES)
+    assert isinstance(result, SymptomSufficiencyCheck)
+    assert (calls(fast), calls(strong)) == (1, 0)
+
+
+def test_invalid_fast_output_falls_back_to_strong(tiered_llm, fake_models):
+    strong, fast = fake_models
+    fast.invalid_rate = 1.0
+    failures = structured_failures("extract_symptoms")
+    result = run_in_node("extract_symptoms", tiered_llm.with_structured_output(SymptomSufficiencyCheck), MESSAGES)
+    assert result.is_sufficient is True
+    assert (calls(fast), calls(strong)) == (1, 1)
+    assert structured_failures("extract_symptoms") == failures + 1
+
+
+def test_low_confidence_fast_output_falls_back_to_strong(tiered_llm, fake_models):
+    strong, fast = fake_models
+    fast.low_confidence_rate = 1.0
+    failures = structured_failures("extract_symptoms")
+    result = run_in_node("extract_symptoms", tiered_llm.with_structured_output(SymptomSufficiencyCheck), MESSAGES)
+    assert result.confidence is None
+    assert (calls(fast), calls(strong)) == (1, 1)
+    # A low-confidence verdict parsed fine, so it is not a structured-output failure
+    assert structured_failures("extract_symptoms") == failures
+
+
+def test_strong_tier_node_never_calls_fast_model(tiered_llm, fake_models):
+    strong, fast = fake_models
+    fast.invalid_rate = 1.0
+    result = run_in_node("triage_summary", tiered_llm.with_structured_output(TriageSummary), MESSAGES)
+    assert result.urgency == "NON-URGENT"
+    assert (calls(fast), calls(strong)) == (0, 1)
+
+
+def test_free_text_calls_are_not_retried_on_strong(tiered_llm, fake_models):
+    strong, fast = fake_models
+    fast.low_confidence_rate = 1.0
+    reply = run_in_node("ask_symptoms", tiered_llm, MESSAGES)
+    assert reply.content
+    assert (calls(fast), calls(strong)) == (1, 0)
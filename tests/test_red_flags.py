@@ -0,0 +1,53 @@
+import pytest
+
+from llm_orchestration.red_flags import detect_red_flags, red_flag_context
+
+
+def flag_ids(text: str) -> set:
+    return {flag["id"] for flag in detect_red_flags(text)}
+
+
+@pytest.mark.parametrize("text, expected", [
+    # Current emergencies next to unrelated history, negations or family mentions
+    ("I have had chest pain for 2 hours, my mum has diabetes", {"chest_pain"}),
+    ("No history of heart problems, I have chest pain now", {"chest_pain"}),
+    ("I have crushing chest pain and my family drove me here", {"chest_pain"}),
+    ("I have chest pain since my father died", {"chest_pain"}),
+    ("I have no appetite and chest pain", {"chest_pain"}),
+    ("I passed out this morning but my sister says I'm fine", {"consciousness"}),
+    ("My throat is swelling and I'm short of breath", {"anaphylaxis", "breathing"}),
+    # Someone else reporting the patient's symptom
+    ("My mum noticed I passed out", {"consciousness"}),
+    ("My husband said I had a seizure last night", {"seizure"}),
+    ("My sister had a seizure and I fainted", {"consciousness"}),
+    # Phrases may span "and"
+    ("I have a stiff neck and fever", {"headache"}),
+])
+def test_flags_current_emergencies(text, expected):
+    assert flag_ids(text) == expected
+
+
+@pytest.mark.parametrize("text", [
+    "No chest pain",
+    "I have never fainted",
+    "I don't have trouble breathing, just a cough",
+    "My father had a heart attack last year",
+    "There is a family history of seizures",
+    "I used to get chest pains as a teenager",
+    "I had a seizure as a child",
+    "I passed out years ago",
+    "I get winded more easily when I climb stairs",
+])
+def test_ignores_negated_past_and_family_history(text):
+    assert flag_ids(text) == set()
+
+
+def test_one_entry_per_flag_with_the_matched_phrase():
+    flags = detect_red_flags("Chest pain, and my chest pain is crushing")
+    assert flags == [{"id": "chest_pain", "label": "Chest pain", "phrase": "chest pain"}]
+
+
+def test_red_flag_context_names_the_flags():
+    assert red_flag_context({}) == ""
+    context = red_flag_context({"red_flags": detect_red_flags("I passed out")})
+    assert 'Loss of consciousness ("passed out")' in context
@@ -0,0 +1,56 @@
+import pytest
+
+from llm_orchestration.symptom_index import canonicalize, merge_info, merge_terms, symptom_ids
+
+
+@pytest.mark.parametrize("term, symptom_id", [
+    ("headache", "headache"),
+    ("Chest Pain", "chest_pain"),
+    ("breathlessness", "shortness_of_breath"),
+    ("SOB", "shortness_of_breath"),
+    ("high temperature", "fever"),
+    ("tiredness", "fatigue"),
+    ("diarrhea", "diarrhoea"),
+    # Typos in long terms: a dropped, extra or swapped letter
+    ("diarhea", "diarrhoea"),
+    ("vomitting", "vomiting"),
+    ("haedache", "headache"),
+])
+def test_synonyms_and_typos_share_an_id(term, symptom_id):
+    assert canonicalize(term) == symptom_id
+
+
+@pytest.mark.parametrize("term", ["never", "tough", "tried", "fired", "fatigeu"])
+def test_short_or_substituted_words_are_not_fuzzy_matched(term):
+    assert canonicalize(term) == f"term:{term}"
+
+
+@pytest.mark.parametrize("term", ["productive cough", "migraine", "vertigo", "hives", "lower back pain", "anorexia"])
+def test_specific_symptoms_are_not_folded_into_generic_ones(term):
+    assert canonicalize(term).startswith("term:")
+
+
+def test_merge_terms_keeps_the_patients_wording_and_dedupes_by_id():
+    merged = merge_terms(["Breathlessness", "cough"], ["short of breath", "coughing", "runny  nose"])
+    assert merged == ["Breathlessness", "cough", "runny nose"]
+
+
+def test_merge_terms_excludes_ids():
+    assert merge_terms([], ["fever", "chills"], exclude=symptom_ids(["pyrexia"])) == ["chills"]
+
+
+def test_merge_info_drops_a_detail_that_adds_nothing():
+    assert merge_info(["chest pain for 2 days"], ["chest pain"]) == ["chest pain for 2 days"]
+
+
+def test_merge_info_replaces_a_detail_that_says_more():
+    merged = merge_info(["chest pain for 2 days"], ["chest pain for 2 days, worse on deep breathing"])
+    assert merged == ["chest pain for 2 days, worse on deep breathing"]
+
+
+def test_merge_info_replaces_a_same_length_correction():
+    assert merge_info(["chest pain for 2 days"], ["chest pain for 3 days"]) == ["chest pain for 3 days"]
+
+
+def test_merge_info_keeps_unrelated_details():
+    assert merge_info(["sharp chest pain"], ["worse at night"]) == ["sharp chest pain", "worse at night"]